@@ -8,18 +8,23 @@ from routes.dashboard import dashboard_bp
 from routes.admin import admin_bp
 from routes.trainer import trainer_bp
 from routes.payments import payments_bp
-from routes.classes import class_schedule_bp
+from routes.classes import class_schedule_bp, reconcile_booked_counts
+from schedule_index import schedule_index
 from middleware import (
     authenticate, add_security_headers, verify_token, get_user_data, 
-    create_token, AuthenticationError, refresh_token as refresh_token_func
+    create_token, AuthenticationError, refresh_token as refresh_token_func,
+    public, compile_access_policies, access_policy_report, PUBLIC, decode_token
 )
 import jwt
-from config import SECRET_KEY
+from config import SECRET_KEY, RATE_LIMIT_CONFIG
+from db import init_app as init_db, db_manager, get_db, PoolTimeoutError, CircuitOpenError
 import logging
+import math
 from logging.handlers import RotatingFileHandler
 import os
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+import rate_limit  # registers the shm:// limiter storage
 from datetime import datetime, timedelta
 from routes.attendance import attendance_bp
 from routes.equipment import equipment_bp
@@ -30,12 +35,19 @@ app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HT
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
+# Only send Set-Cookie when the session actually changed
+app.config['SESSION_REFRESH_EACH_REQUEST'] = False
+# Token-authenticated /api/ requests never write the session
+app.config['STATELESS_API_AUTH'] = os.getenv('STATELESS_API_AUTH', 'true').lower() == 'true'
 
 # Track if this is the first request to the app
 app.config['FIRST_REQUEST'] = True
 
 csrf = CSRFProtect(app)
 
+# Return the request-scoped database connection to the pool on teardown
+init_db(app)
+
 # Exempt API routes from CSRF protection
 csrf.exempt(auth_bp)
 csrf.exempt(users_bp)
@@ -66,16 +78,43 @@ file_handler = RotatingFileHandler('logs/gym_management.log', maxBytes=10240, ba
 file_handler.setFormatter(logging.Formatter(
     '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
 ))
-file_handler.setLevel(logging.WARNING)
+file_handler.setLevel(logging.INFO)
 app.logger.addHandler(file_handler)
 app.logger.setLevel(logging.WARNING)
-app.logger.info('Gym Management System startup')
+
+# Startup reports go to the same file at INFO, below app.logger's level
+startup_logger = logging.getLogger('startup')
+startup_logger.addHandler(file_handler)
+startup_logger.setLevel(logging.INFO)
+
+# Statements over QUERY_STATS_CONFIG['slow_query_ms'], with parameters redacted.
+# The file is only created once there is a slow query to write.
+slow_query_handler = RotatingFileHandler('logs/slow_queries.log', maxBytes=1024 * 1024, backupCount=5,
+                                         delay=True)
+slow_query_handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+slow_query_logger = logging.getLogger('slow_queries')
+slow_query_logger.addHandler(slow_query_handler)
+slow_query_logger.setLevel(logging.WARNING)
+startup_logger.info('Gym Management System startup')
+
+def rate_limit_key():
+    """Count authenticated requests per user and anonymous ones per client IP"""
+    if 'user_id' in session:
+        return f"user:{session['user_id']}"
+    token = get_token_from_request()
+    if token:
+        try:
+            return f"user:{decode_token(token)['user_id']}"
+        except (jwt.InvalidTokenError, KeyError):
+            pass
+    return f"ip:{get_remote_address()}"
 
 # Initialize rate limiter
 limiter = Limiter(
     app=app,
-    key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"]
+    key_func=rate_limit_key,
+    storage_uri=RATE_LIMIT_CONFIG['storage_uri'],
+    default_limits=[l for l in RATE_LIMIT_CONFIG['default_limits'].split(';') if l.strip()]
 )
 
 # ✅ Register API Routes
@@ -90,6 +129,21 @@ app.register_blueprint(attendance_bp, url_prefix="/api")
 app.register_blueprint(equipment_bp, url_prefix="/api/equipment")
 app.register_blueprint(admin_bp, url_prefix="/api")
 
+# Each worker loads the class schedule before serving its first request, after
+# any fork, so no pooled connection is opened at import time
+@app.before_first_request
+def load_schedule_index():
+    try:
+        schedule_index.load()
+    except Exception as e:
+        # The first /api/classes read loads it instead
+        app.logger.warning(f"Class schedule not loaded at startup: {e}")
+
+# Per-blueprint limits from config
+for blueprint_name, blueprint_limit in RATE_LIMIT_CONFIG['blueprint_limits'].items():
+    if blueprint_limit and blueprint_name in app.blueprints:
+        limiter.limit(blueprint_limit)(app.blueprints[blueprint_name])
+
 
 # Add security headers to all responses
 @app.after_request
@@ -111,45 +165,55 @@ def after_request(response):
 
 # Public routes
 @app.route("/")
+@public
 def home():
     return render_template("home.html")
 
 @app.route("/login")
+@public
 def login():
     return render_template("signin.html")
 
 @app.route("/signup")
+@public
 def signup_page():
     return render_template("join.html")
 
 @app.route("/memberships")
+@public
 def memberships():
     return render_template("memberships.html")
 
 @app.route("/contact")
+@public
 def contact():
     return render_template("contact.html")
 
 @app.route("/calendar")
+@public
 def calendar():
     token = request.args.get('token', '')
     return render_template("calendar.html", token=token)
 
 # Membership type routes
 @app.route("/membership/monthly")
+@public
 def monthly_membership():
     return render_template("monthly.html")
 
 @app.route("/membership/annual")
+@public
 def annual_membership():
     return render_template("annual.html")
 
 @app.route("/membership/student")
+@public
 def student_membership():
     return render_template("student.html")
 
 # Protected routes
 @app.route("/dashboard")
+@public
 def dashboard():
     # Get token using the utility function
     token = get_token_from_request()
@@ -179,6 +243,7 @@ def dashboard():
         return redirect(url_for("login"))
 
 @app.route("/admin/dashboard")
+@public
 def admin_dashboard():
     # Get token using the utility function
     token = get_token_from_request()
@@ -198,6 +263,7 @@ def admin_dashboard():
         return redirect(url_for("login"))
 
 @app.route("/trainer/dashboard")
+@public
 def trainer_dashboard():
     # Get token using the utility function
     token = get_token_from_request()
@@ -221,6 +287,7 @@ def trainer_dashboard():
         return redirect(url_for("login"))
 
 @app.route("/profile")
+@public
 def profile():
     # Get token using the utility function
     token = get_token_from_request()
@@ -242,6 +309,7 @@ def profile():
         return redirect(url_for("login"))
 
 @app.route("/classes")
+@public
 def classes():
     # Get token using the utility function
     token = get_token_from_request()
@@ -263,6 +331,7 @@ def classes():
         return redirect(url_for("login"))
 
 @app.route("/payment-methods")
+@public
 def payment_methods():
     # Get token using the utility function
     token = get_token_from_request()
@@ -284,6 +353,7 @@ def payment_methods():
         return redirect(url_for("login"))
 
 @app.route("/attendance")
+@public
 def attendance():
     # Get token using the utility function
     token = get_token_from_request()
@@ -305,10 +375,20 @@ def attendance():
         return redirect(url_for("login"))
 
 @app.route("/health")
+@public
 def health_check():
     return jsonify({"status": "healthy"}), 200
 
+# Readiness for the load balancer: 503 while the database is unreachable
+@app.route("/ready")
+@public
+def readiness_check():
+    ready, details = db_manager.check_ready()
+    details['status'] = 'ready' if ready else 'unavailable'
+    return jsonify(details), 200 if ready else 503
+
 @app.route('/redirect-dashboard')
+@public
 def redirect_dashboard_with_token():
     token = get_token_from_request()
     if not token:
@@ -324,34 +404,14 @@ def redirect_dashboard_with_token():
 def before_request():
     # Clear sessions on the first request after server restart
     if app.config.get('FIRST_REQUEST', True):
-        session.clear()
+        if session:
+            session.clear()
         app.config['FIRST_REQUEST'] = False
         app.logger.info("Server restarted: Cleared all sessions")
     
-    # List of public routes that don't require authentication
-    public_routes = [
-        'home', 'login', 'signup_page', 'memberships', 'contact', 'calendar',
-        'monthly_membership', 'annual_membership', 'student_membership',
-        'health_check', 'static', 'register_user', 'dashboard', 'admin_dashboard', 
-        'trainer_dashboard', 'redirect_dashboard_with_token'  # Added dashboard routes
-    ]
-    
-    # Public API routes that don't require authentication
-    public_api_routes = [
-        '/api/auth/register',
-        '/api/auth/login',
-        '/api/auth/refresh-token'
-    ]
-    
-    # Skip token verification for public routes, static files, and auth endpoints
-    if (request.endpoint in public_routes or 
-        request.path.startswith('/static/') or 
-        request.path == '/favicon.ico' or
-        request.path in public_api_routes):
-        return
-    
-    # Skip token verification for OPTIONS requests (CORS preflight)
-    if request.method == 'OPTIONS':
+    # Skip unknown endpoints (404s), public endpoints and CORS preflight requests
+    policy = access_policies.get(request.endpoint)
+    if policy is None or policy.level == PUBLIC or request.method == 'OPTIONS':
         return
     
     # Check if user is authenticated in the session
@@ -363,7 +423,9 @@ def before_request():
                 'email': user['email'],
                 'role': user['role']
             }
-            return
+            return check_roles(policy, user)
+        except PoolTimeoutError:
+            raise
         except Exception:
             # If session is invalid, clear it completely
             session.clear()
@@ -384,19 +446,32 @@ def before_request():
             decoded = verify_token(token)
             g.user = decoded
             
-            # Store user in session for future requests
-            session['user_id'] = decoded['user_id']
-            session['email'] = decoded.get('email')
-            session['role'] = decoded.get('role')
-            session.permanent = True
+            # Store user in session for future page requests; API clients
+            # send their token every time and do not need a session cookie
+            if not (app.config['STATELESS_API_AUTH'] and request.path.startswith('/api/')):
+                store_user_in_session(decoded)
             
         except AuthenticationError as e:
             return jsonify({'error': str(e)}), 401
+
+        # Load the user once and hand it to the view's authenticate decorator
+        user = get_user_data(decoded['user_id'])
+        if not user:
+            return jsonify({'error': 'Authentication failed: User not found'}), 401
+        g.auth_token = token
+        g.current_user = user
+        return check_roles(policy, user)
     else:
         # Only require token for protected endpoints
         if request.path.startswith('/api/'):
             return jsonify({'error': 'No token provided'}), 401
 
+def check_roles(policy, user):
+    """Reject the request if the endpoint is restricted to other roles"""
+    if policy.roles and user.get('role') not in policy.roles:
+        app.logger.warning(f"Role {user.get('role')} denied access to {request.endpoint}")
+        return jsonify({'error': f"Unauthorized - {', '.join(sorted(policy.roles))} only"}), 403
+
 # Error handlers
 @app.errorhandler(401)
 def unauthorized_error(error):
@@ -422,11 +497,39 @@ def too_many_requests_error(error):
     app.logger.warning(f"Rate limit exceeded for IP: {request.remote_addr}")
     return jsonify({"error": "Too many requests. Please try again later."}), 429
 
+@app.errorhandler(PoolTimeoutError)
+def pool_timeout_error(error):
+    app.logger.warning(f"Database pool exhausted: {str(error)}")
+    response = jsonify({"error": "Server is busy. Please try again shortly."})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(CircuitOpenError)
+def circuit_open_error(error):
+    # Not logged: the breaker already logged when it opened, and this path
+    # has to stay fast while every request is failing
+    response = jsonify({"error": "Database is temporarily unavailable. Please try again shortly."})
+    response.headers['Retry-After'] = str(math.ceil(error.retry_after))
+    return response, 503
+
 @app.errorhandler(500)
 def internal_error(error):
     app.logger.error(f"Internal server error: {str(error)}")
     return jsonify({"error": "Internal server error"}), 500
 
+def store_user_in_session(claims):
+    """Mirror token claims into the session, touching only values that changed"""
+    values = {
+        'user_id': claims['user_id'],
+        'email': claims.get('email'),
+        'role': claims.get('role')
+    }
+    for key, value in values.items():
+        if session.get(key) != value:
+            session[key] = value
+    if not session.permanent:
+        session.permanent = True
+
 def get_token_from_request():
     """Extract token from request in order of: cookies, URL query param, Authorization header"""
     token = None
@@ -450,11 +553,13 @@ def get_token_from_request():
     return token
 
 @app.route('/favicon.ico')
+@public
 def favicon():
     return send_from_directory(os.path.join(app.root_path, 'static'),
                                'favicon.ico', mimetype='image/vnd.microsoft.icon')
 
 @app.route('/clear-session')
+@public
 def clear_session():
     # Clear session data
     session.clear()
@@ -463,5 +568,23 @@ def clear_session():
     # Redirect to home page
     return redirect(url_for('home'))
 
+# Resolve every endpoint's access policy once, after all routes are registered
+access_policies = compile_access_policies(app)
+startup_logger.info("Endpoint access policies:\n" + access_policy_report(access_policies))
+
+@app.cli.command("access-report")
+def access_report_command():
+    """Print every endpoint with its resolved access policy."""
+    print(access_policy_report(access_policies))
+
+@app.cli.command("reconcile-bookings")
+def reconcile_bookings_command():
+    """Repair classes whose booked_count drifted from their bookings."""
+    with get_db() as conn:
+        repaired = reconcile_booked_counts(conn)
+    for class_id, old_count, new_count in repaired:
+        print(f"class {class_id}: booked_count {old_count} -> {new_count}")
+    print(f"{len(repaired)} classes repaired")
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5001, debug=True)
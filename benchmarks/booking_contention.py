@@ -0,0 +1,150 @@
+"""Fire simultaneous bookings at one class and check it is never overbooked.
+
+Every member books the same class at once from a pool of client threads,
+and some of them send their booking twice. Afterwards the class must hold
+exactly min(members, capacity) bookings, one per member, with booked_count
+matching them, and exactly that many requests must have succeeded. Runs on
+an embedded SQLite database by default; set DATABASE_BACKEND=mysql to run
+against a scratch MySQL database instead.
+
+    python benchmarks/booking_contention.py --members 2000 --capacity 100 --threads 32
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DB_PATH = os.path.join(tempfile.gettempdir(), 'gym-booking-benchmark.sqlite3')
+
+# Must be set before config is imported
+os.environ.setdefault('DATABASE_BACKEND', 'sqlite')
+os.environ.setdefault('DATABASE_SQLITE_PATH', DB_PATH)
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('RATE_LIMIT_STORAGE_URI', 'memory://')
+for name in ('RATE_LIMIT_DEFAULTS', 'RATE_LIMIT_AUTH', 'RATE_LIMIT_ADMIN'):
+    os.environ.setdefault(name, '')
+
+
+def seed(conn, members, capacity):
+    """Create the members and one upcoming class with ``capacity`` seats"""
+    cursor = conn.cursor()
+    password = '$2b$04$' + 'x' * 53
+    conn.start_transaction()
+    member_ids = []
+    for n in range(members):
+        cursor.execute(
+            "INSERT INTO users (name, email, password, role) VALUES (%s, %s, %s, 'member')",
+            (f"Member {n}", f"booker{n}@gym.com", password)
+        )
+        member_ids.append(cursor.lastrowid)
+    cursor.execute(
+        "INSERT INTO classes (class_name, schedule_time, capacity) VALUES (%s, %s, %s)",
+        ('Contended Spin', datetime.now() + timedelta(days=1), capacity)
+    )
+    class_id = cursor.lastrowid
+    conn.commit()
+    cursor.close()
+    return member_ids, class_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, default=2000)
+    parser.add_argument('--capacity', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--repeats', type=int, default=200, help="members that book twice")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if os.environ['DATABASE_BACKEND'] == 'sqlite':
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(os.environ['DATABASE_SQLITE_PATH'] + suffix):
+                os.remove(os.environ['DATABASE_SQLITE_PATH'] + suffix)
+
+    import logging
+    logging.disable(logging.WARNING)
+    from app import app
+    from db import get_db, transaction_stats
+    from middleware import create_token
+
+    with app.app_context():
+        with get_db() as conn:
+            member_ids, class_id = seed(conn, args.members, args.capacity)
+
+    rng = random.Random(args.seed)
+    requests = member_ids + rng.sample(member_ids, min(args.repeats, len(member_ids)))
+    rng.shuffle(requests)
+    headers = {
+        member_id: {'Authorization': 'Bearer ' + create_token(
+            {'id': member_id, 'email': f"booker{member_id}@gym.com", 'role': 'member'})}
+        for member_id in member_ids
+    }
+
+    statuses = Counter()
+    statuses_lock = threading.Lock()
+    start_line = threading.Barrier(args.threads + 1)
+
+    def book(requests):
+        client = app.test_client()
+        counts = Counter()
+        start_line.wait()
+        for member_id in requests:
+            response = client.post(f"/api/classes/{class_id}/book", headers=headers[member_id])
+            counts[response.status_code] += 1
+        with statuses_lock:
+            statuses.update(counts)
+
+    threads = [threading.Thread(target=book, args=(requests[n::args.threads],))
+               for n in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    start_line.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT booked_count, capacity FROM classes WHERE id = %s", (class_id,))
+            booked_count, capacity = cursor.fetchone()
+            cursor.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT member_id) FROM class_bookings WHERE class_id = %s",
+                (class_id,)
+            )
+            bookings, members = cursor.fetchone()
+            cursor.close()
+
+    print(f"{len(requests)} booking requests from {args.threads} threads in {elapsed:.2f}s "
+          f"({len(requests) / elapsed:.0f} requests/sec)")
+    print(f"responses: {dict(sorted(statuses.items()))}")
+    print(f"bookings: {bookings} of {capacity} seats, booked_count {booked_count}")
+    print(f"transactions: {transaction_stats()}")
+
+    expected = min(args.members, capacity)
+    problems = []
+    if bookings != expected:
+        problems.append(f"expected {expected} bookings, found {bookings}")
+    if members != bookings:
+        problems.append(f"{bookings - members} members booked twice")
+    if booked_count != bookings:
+        problems.append(f"booked_count {booked_count} does not match {bookings} bookings")
+    if statuses[200] != bookings:
+        problems.append(f"{statuses[200]} requests succeeded for {bookings} bookings")
+    if any(status >= 500 for status in statuses):
+        problems.append("some requests failed with a server error")
+    if problems:
+        raise SystemExit("FAILED: " + "; ".join(problems))
+    print("OK: no overbooking")
+
+
+if __name__ == "__main__":
+    main()
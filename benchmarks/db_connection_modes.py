@@ -0,0 +1,112 @@
+"""Compare per-query latency and row throughput for direct vs SSH-tunnel connections.
+
+Runs against the database in DATABASE_CONFIG. For a local comparison, point
+DATABASE_HOST at 127.0.0.1 and tunnel through the same machine, e.g.
+SSH_HOST=127.0.0.1 REMOTE_HOST=127.0.0.1 REMOTE_PORT=3306.
+
+    python benchmarks/db_connection_modes.py --modes direct ssh_tunnel
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector
+from sshtunnel import SSHTunnelForwarder
+from config import DATABASE_CONFIG, SSH_CONFIG
+
+# Generates N rows server-side so the result size does not depend on the schema
+ROWS_QUERY = """
+    WITH RECURSIVE seq (n) AS (
+        SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < %s
+    )
+    SELECT n, CONCAT('member-', n), NOW() FROM seq
+"""
+
+
+def open_connection(mode):
+    """Return (connection, tunnel) for the given mode; tunnel is None when direct"""
+    tunnel = None
+    if mode == 'ssh_tunnel':
+        tunnel = SSHTunnelForwarder(
+            (SSH_CONFIG['ssh_host'], 22),
+            ssh_username=SSH_CONFIG['ssh_username'],
+            ssh_pkey=SSH_CONFIG['ssh_private_key'],
+            remote_bind_address=SSH_CONFIG['remote_bind_address'],
+            local_bind_address=('127.0.0.1', 0)
+        )
+        tunnel.start()
+        host, port = '127.0.0.1', tunnel.local_bind_port
+    else:
+        host, port = DATABASE_CONFIG['host'], DATABASE_CONFIG['port']
+
+    conn = mysql.connector.connect(
+        host=host,
+        port=port,
+        user=DATABASE_CONFIG['user'],
+        password=DATABASE_CONFIG['password'],
+        database=DATABASE_CONFIG['database'],
+        ssl_disabled=DATABASE_CONFIG.get('ssl_disabled', False),
+        autocommit=True
+    )
+    return conn, tunnel
+
+
+def bench_latency(conn, queries):
+    cursor = conn.cursor()
+    timings = []
+    for _ in range(queries):
+        start = time.perf_counter()
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+        timings.append(time.perf_counter() - start)
+    cursor.close()
+    timings.sort()
+    return {
+        'p50_ms': statistics.median(timings) * 1000,
+        'p99_ms': timings[int(len(timings) * 0.99) - 1] * 1000,
+    }
+
+
+def bench_throughput(conn, rows, repeat):
+    cursor = conn.cursor()
+    cursor.execute("SET SESSION cte_max_recursion_depth = %s", (rows + 1,))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(ROWS_QUERY, (rows,))
+        fetched = len(cursor.fetchall())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    cursor.close()
+    return {'rows_per_sec': fetched / best}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=['direct', 'ssh_tunnel'],
+                        choices=['direct', 'ssh_tunnel'])
+    parser.add_argument('--queries', type=int, default=2000, help="round trips for the latency test")
+    parser.add_argument('--rows', type=int, default=100000, help="rows per throughput query")
+    parser.add_argument('--repeat', type=int, default=5, help="throughput runs; the best is reported")
+    args = parser.parse_args()
+
+    print(f"{'mode':<12}{'p50 ms':>10}{'p99 ms':>10}{'rows/sec':>14}")
+    for mode in args.modes:
+        conn, tunnel = open_connection(mode)
+        try:
+            latency = bench_latency(conn, args.queries)
+            throughput = bench_throughput(conn, args.rows, args.repeat)
+        finally:
+            conn.close()
+            if tunnel is not None:
+                tunnel.stop()
+        print(f"{mode:<12}{latency['p50_ms']:>10.3f}{latency['p99_ms']:>10.3f}"
+              f"{throughput['rows_per_sec']:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
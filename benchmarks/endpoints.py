@@ -0,0 +1,155 @@
+"""Time the main API endpoints against a seeded embedded SQLite database.
+
+Needs no MySQL server: the app runs with DATABASE_BACKEND=sqlite on a fresh
+database file that is filled with the same seeded data on every run, so
+results are comparable between runs and branches. Reports latency
+percentiles and queries per request for each endpoint.
+
+    python benchmarks/endpoints.py --members 2000 --classes 500 --requests 200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DB_PATH = os.path.join(tempfile.gettempdir(), 'gym-benchmark.sqlite3')
+
+# Must be set before config is imported
+os.environ.setdefault('DATABASE_BACKEND', 'sqlite')
+os.environ.setdefault('DATABASE_SQLITE_PATH', DB_PATH)
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('RATE_LIMIT_STORAGE_URI', 'memory://')
+for name in ('RATE_LIMIT_DEFAULTS', 'RATE_LIMIT_AUTH', 'RATE_LIMIT_ADMIN'):
+    os.environ.setdefault(name, '')
+
+
+def seed(conn, members, classes, seed_value):
+    """Fill the schema with deterministic users, classes, bookings and payments"""
+    rng = random.Random(seed_value)
+    now = datetime.now().replace(microsecond=0)
+    cursor = conn.cursor()
+    password = '$2b$04$' + 'x' * 53
+    conn.start_transaction()
+    cursor.execute(
+        "INSERT INTO users (name, email, password, role) VALUES (%s, %s, %s, 'admin')",
+        ('Admin', 'admin@gym.com', password)
+    )
+    trainer_ids = []
+    for n in range(max(1, classes // 20)):
+        cursor.execute(
+            "INSERT INTO users (name, email, password, role) VALUES (%s, %s, %s, 'trainer')",
+            (f"Trainer {n}", f"trainer{n}@gym.com", password)
+        )
+        trainer_ids.append(cursor.lastrowid)
+    member_ids = []
+    for n in range(members):
+        expiry = now + timedelta(days=rng.randint(-30, 365))
+        cursor.execute("""
+            INSERT INTO users (name, email, password, role, membership_expiry, auto_payment)
+            VALUES (%s, %s, %s, 'member', %s, %s)
+        """, (f"Member {n}", f"member{n}@gym.com", password, expiry, n % 2))
+        member_id = cursor.lastrowid
+        member_ids.append(member_id)
+        cursor.execute("""
+            INSERT INTO memberships (member_id, start_date, expiry_date, status)
+            VALUES (%s, %s, %s, 'active')
+        """, (member_id, (expiry - timedelta(days=365)).date(), expiry.date()))
+        cursor.execute("""
+            INSERT INTO payments (user_id, amount, status, membership_duration, membership_expiry)
+            VALUES (%s, %s, 'Completed', %s, %s)
+        """, (member_id, 30.00, 1, expiry.date()))
+    class_ids = []
+    for n in range(classes):
+        cursor.execute("""
+            INSERT INTO classes (class_name, trainer_id, schedule_time, capacity)
+            VALUES (%s, %s, %s, %s)
+        """, (f"Class {n}", rng.choice(trainer_ids),
+              now + timedelta(hours=rng.randint(1, 24 * 60)), rng.choice([10, 20, 30])))
+        class_ids.append(cursor.lastrowid)
+    for member_id in member_ids:
+        for class_id in rng.sample(class_ids, min(3, len(class_ids))):
+            cursor.execute(
+                "INSERT INTO class_bookings (member_id, class_id) VALUES (%s, %s)",
+                (member_id, class_id)
+            )
+            cursor.execute(
+                "UPDATE classes SET booked_count = booked_count + 1 WHERE id = %s",
+                (class_id,)
+            )
+    conn.commit()
+    cursor.close()
+    return member_ids, class_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, default=2000)
+    parser.add_argument('--classes', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=200, help="requests per endpoint")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if os.environ['DATABASE_BACKEND'] == 'sqlite' and os.path.exists(os.environ['DATABASE_SQLITE_PATH']):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(os.environ['DATABASE_SQLITE_PATH'] + suffix):
+                os.remove(os.environ['DATABASE_SQLITE_PATH'] + suffix)
+
+    import logging
+    logging.disable(logging.WARNING)
+    from app import app
+    from db import get_db, query_stats
+    from middleware import create_token
+
+    with app.app_context():
+        with get_db() as conn:
+            start = time.perf_counter()
+            member_ids, class_ids = seed(conn, args.members, args.classes, args.seed)
+            print(f"Seeded {args.members} members and {args.classes} classes "
+                  f"in {time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(args.seed)
+    admin = {'Authorization': 'Bearer ' + create_token({'id': 1, 'email': 'admin@gym.com', 'role': 'admin'})}
+
+    def member():
+        member_id = rng.choice(member_ids)
+        token = create_token({'id': member_id, 'email': f"member{member_id}@gym.com", 'role': 'member'})
+        return {'Authorization': 'Bearer ' + token}
+
+    endpoints = [
+        ('GET /api/classes', lambda: ('GET', '/api/classes', member())),
+        ('GET /api/dashboard/summary', lambda: ('GET', '/api/dashboard/summary', member())),
+        ('POST /api/classes/<id>/book', lambda: ('POST', f"/api/classes/{rng.choice(class_ids)}/book", member())),
+        ('GET /api/admin/overview', lambda: ('GET', '/api/admin/overview', admin)),
+        ('GET /api/admin/users', lambda: ('GET', '/api/admin/users', admin)),
+        ('GET /api/admin/classes', lambda: ('GET', '/api/admin/classes', admin)),
+    ]
+
+    print(f"{'endpoint':<32}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'queries':>10}")
+    for label, make_request in endpoints:
+        client = app.test_client()
+        timings = []
+        endpoint = None
+        for _ in range(args.requests):
+            method, path, headers = make_request()
+            start = time.perf_counter()
+            response = client.open(path, method=method, headers=headers)
+            response.get_data()
+            timings.append(time.perf_counter() - start)
+            if response.status_code >= 500:
+                raise SystemExit(f"{label} failed with {response.status_code}: {response.get_data(as_text=True)}")
+            endpoint = endpoint or app.url_map.bind('').match(path, method=method)[0]
+        timings.sort()
+        queries = query_stats()['endpoints'].get(endpoint, {}).get('avg_queries', 0)
+        print(f"{label:<32}{statistics.median(timings) * 1000:>10.2f}"
+              f"{timings[int(len(timings) * 0.95) - 1] * 1000:>10.2f}"
+              f"{timings[-1] * 1000:>10.2f}{queries:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Compare text-protocol queries with cached server-side prepared statements.
+
+Runs the hot user lookup from get_user_data both ways on one connection and
+reports per-query latency plus the statements MySQL had to prepare. Uses the
+same connection settings as db_connection_modes.py, so it can be run through
+the SSH tunnel to see the savings where round trips are most expensive.
+
+    python benchmarks/prepared_statements.py --mode ssh_tunnel --queries 5000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_connection_modes import open_connection
+from db_pool import PooledConnection
+from db_statements import query_prepared
+from middleware import USER_QUERY
+
+
+def session_counter(conn, name):
+    cursor = conn.cursor()
+    cursor.execute("SHOW SESSION STATUS LIKE %s", (name,))
+    value = int(cursor.fetchone()[1])
+    cursor.close()
+    return value
+
+
+def run(label, conn, queries, user_ids, query):
+    prepares_before = session_counter(conn, 'Com_stmt_prepare')
+    timings = []
+    for n in range(queries):
+        start = time.perf_counter()
+        query(user_ids[n % len(user_ids)])
+        timings.append(time.perf_counter() - start)
+    prepares = session_counter(conn, 'Com_stmt_prepare') - prepares_before
+    timings.sort()
+    print(f"{label:<10}{statistics.median(timings) * 1000:>10.3f}"
+          f"{timings[int(len(timings) * 0.99) - 1] * 1000:>10.3f}{prepares:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', default='direct', choices=['direct', 'ssh_tunnel'])
+    parser.add_argument('--queries', type=int, default=5000)
+    args = parser.parse_args()
+
+    raw, tunnel = open_connection(args.mode)
+    conn = PooledConnection(raw)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM users LIMIT 100")
+        user_ids = [row[0] for row in cursor.fetchall()] or [0]
+
+        def text_query(user_id):
+            cursor.execute(USER_QUERY, (user_id,))
+            cursor.fetchall()
+
+        def prepared_query(user_id):
+            query_prepared(conn, USER_QUERY, (user_id,))
+
+        print(f"{'protocol':<10}{'p50 ms':>10}{'p99 ms':>10}{'prepares':>12}")
+        run('text', conn, args.queries, user_ids, text_query)
+        run('prepared', conn, args.queries, user_ids, prepared_query)
+        cursor.close()
+    finally:
+        raw.close()
+        if tunnel is not None:
+            tunnel.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Compare dictionary cursors + jsonify with tuple rows + RowSet.to_json.
+
+Reads a users-shaped result of --rows rows and reports wall time and peak
+Python memory for fetching and serialising it both ways. With a database the
+rows come from a scratch table filled from a recursive CTE; --synthetic skips
+the database and measures decoding/serialisation only.
+
+    python benchmarks/row_decoding.py --rows 100000
+    python benchmarks/row_decoding.py --rows 100000 --synthetic
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask, jsonify
+from db_rows import RowSet, fetch_rowset, rowset_response
+
+COLUMNS = ('id', 'name', 'email', 'role', 'membership_expiry', 'auto_payment')
+QUERY = "SELECT id, name, email, role, membership_expiry, auto_payment FROM bench_users ORDER BY name"
+
+
+def fill_table(conn, rows):
+    cursor = conn.cursor()
+    cursor.execute("SET SESSION cte_max_recursion_depth = %s", (rows + 1,))
+    cursor.execute("""
+        CREATE TEMPORARY TABLE bench_users (
+            id INT PRIMARY KEY, name VARCHAR(255), email VARCHAR(255),
+            role VARCHAR(20), membership_expiry DATETIME, auto_payment BOOLEAN
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO bench_users
+        WITH RECURSIVE seq (n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < %s)
+        SELECT n, CONCAT('Member ', n), CONCAT('member', n, '@gym.com'), 'member',
+               NOW() + INTERVAL n MINUTE, n MOD 2
+        FROM seq
+    """, (rows,))
+    cursor.close()
+
+
+def synthetic_rows(rows):
+    start = datetime(2025, 1, 1)
+    return [(n, f"Member {n}", f"member{n}@gym.com", 'member', start + timedelta(minutes=n), n % 2)
+            for n in range(rows)]
+
+
+def measure(label, func):
+    start = time.perf_counter()
+    size = len(func().get_data())
+    elapsed = time.perf_counter() - start
+    # Separate run: tracing allocations distorts the timing
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<12}{elapsed:>10.3f}{peak / 2 ** 20:>12.1f}{size / 2 ** 20:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--synthetic', action='store_true', help="skip the database")
+    parser.add_argument('--mode', default='direct', choices=['direct', 'ssh_tunnel'])
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    print(f"{'decoder':<12}{'seconds':>10}{'peak MiB':>12}{'body MiB':>12}")
+    with app.app_context():
+        if args.synthetic:
+            data = synthetic_rows(args.rows)
+            measure('dict', lambda: jsonify([dict(zip(COLUMNS, row)) for row in data]))
+            measure('rowset', lambda: rowset_response(RowSet(COLUMNS, data)))
+            return
+
+        from db_connection_modes import open_connection
+        conn, tunnel = open_connection(args.mode)
+        try:
+            fill_table(conn, args.rows)
+
+            def dictionary():
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(QUERY)
+                rows = cursor.fetchall()
+                cursor.close()
+                return jsonify(rows)
+
+            def rowset():
+                cursor = conn.cursor()
+                cursor.execute(QUERY)
+                rows = fetch_rowset(cursor)
+                cursor.close()
+                return rowset_response(rows)
+
+            measure('dict', dictionary)
+            measure('rowset', rowset)
+        finally:
+            conn.close()
+            if tunnel is not None:
+                tunnel.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after a TTL.
+
+    Expired entries are dropped lazily when they are read, and the least
+    recently used entry is evicted once ``maxsize`` is reached.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """Store a value; ``ttl`` overrides the cache default for this entry"""
+        expires_at = time.monotonic() + (self._ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'max_size': self._maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def __len__(self):
+        return len(self._data)
@@ -8,7 +8,12 @@ SSH_CONFIG = {
     'ssh_host': os.getenv('SSH_HOST', ''),
     'ssh_username': os.getenv('SSH_USERNAME', ''),
     'ssh_private_key': os.getenv('SSH_KEY_PATH', ''),
-    'remote_bind_address': (os.getenv('REMOTE_HOST', ''), int(os.getenv('REMOTE_PORT', '3306')))
+    'remote_bind_address': (os.getenv('REMOTE_HOST', ''), int(os.getenv('REMOTE_PORT', '3306'))),
+    # Forwarders (separate SSH transports) that pooled connections are spread across
+    'tunnel_count': int(os.getenv('SSH_TUNNEL_COUNT', '2')),
+    # Seconds between SSH keepalives and between tunnel health checks
+    'keepalive': float(os.getenv('SSH_KEEPALIVE', '15')),
+    'check_interval': float(os.getenv('SSH_CHECK_INTERVAL', '10'))
 }
 
 # Database Configuration
@@ -17,7 +22,128 @@ DATABASE_CONFIG = {
     'user': os.getenv('DATABASE_USER', ''),
     'password': os.getenv('DATABASE_PASSWORD', ''),
     'database': os.getenv('DATABASE_NAME', ''),
-    'port': int(os.getenv('DATABASE_PORT', '3306'))
+    'port': int(os.getenv('DATABASE_PORT', '3306')),
+    # 'mysql', or 'sqlite' for an embedded stand-in (benchmarks and local tests)
+    'backend': os.getenv('DATABASE_BACKEND', 'mysql'),
+    # SQLite file, created with schema.sql on first use; ':memory:' for a throwaway one
+    'sqlite_path': os.getenv('DATABASE_SQLITE_PATH', '/tmp/gym-management.sqlite3'),
+    # 'direct' connects to host/port over TCP; 'ssh_tunnel' goes through SSH_CONFIG
+    'connection_mode': os.getenv('DATABASE_CONNECTION_MODE', 'direct'),
+    # TLS for direct connections: verify the server against this CA when set
+    'ssl_ca': os.getenv('DATABASE_SSL_CA', ''),
+    'ssl_verify_identity': os.getenv('DATABASE_SSL_VERIFY_IDENTITY', 'false').lower() == 'true',
+    'ssl_disabled': os.getenv('DATABASE_SSL_DISABLED', 'false').lower() == 'true',
+    # Seconds to wait for a new connection before counting it as failed
+    'connect_timeout': int(os.getenv('DATABASE_CONNECT_TIMEOUT', '10')),
+    # MySQL protocol compression; trades CPU for fewer bytes on large reports
+    'compress': os.getenv('DATABASE_COMPRESS', 'false').lower() == 'true'
+}
+
+# Connection pool configuration
+DB_POOL_CONFIG = {
+    'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),
+    # Seconds a request may queue for a busy pool before failing with 503
+    'checkout_timeout': float(os.getenv('DB_POOL_CHECKOUT_TIMEOUT', '5')),
+    'max_waiters': int(os.getenv('DB_POOL_MAX_WAITERS', '100')),
+    # Seconds before a connection is replaced, regardless of use
+    'max_lifetime': int(os.getenv('DB_POOL_MAX_LIFETIME', '3600')),
+    # Seconds an unused connection is kept open
+    'idle_timeout': int(os.getenv('DB_POOL_IDLE_TIMEOUT', '600')),
+    # Ping a connection on checkout only if it has been idle this long
+    'ping_after': int(os.getenv('DB_POOL_PING_AFTER', '30')),
+    # Prepared statements kept per connection for query_prepared()
+    'statement_cache_size': int(os.getenv('DB_STATEMENT_CACHE_SIZE', '32'))
+}
+
+# After failure_threshold consecutive connection failures, requests fail with
+# 503 straight away for reset_timeout seconds; then one probe is let through.
+CIRCUIT_BREAKER_CONFIG = {
+    'failure_threshold': int(os.getenv('DB_CIRCUIT_FAILURE_THRESHOLD', '5')),
+    'reset_timeout': float(os.getenv('DB_CIRCUIT_RESET_TIMEOUT', '30'))
+}
+
+# Deadlock / lock wait timeout retries for run_transaction()
+TRANSACTION_CONFIG = {
+    'max_retries': int(os.getenv('DB_TRANSACTION_MAX_RETRIES', '3')),
+    # Seconds; doubles per retry, with jitter, up to max_backoff
+    'base_backoff': float(os.getenv('DB_TRANSACTION_BASE_BACKOFF', '0.05')),
+    'max_backoff': float(os.getenv('DB_TRANSACTION_MAX_BACKOFF', '1'))
+}
+
+# Statement timings. Statements slower than slow_query_ms are logged (with
+# parameter values redacted) to logs/slow_queries.log; at most max_statements
+# distinct normalized statements are tracked per worker.
+QUERY_STATS_CONFIG = {
+    'slow_query_ms': float(os.getenv('DB_SLOW_QUERY_MS', '200')),
+    'max_statements': int(os.getenv('DB_QUERY_STATS_MAX_STATEMENTS', '500'))
+}
+
+# Read replica for get_db(readonly=True); leave DATABASE_REPLICA_HOST empty to
+# send every query to the primary. Connects directly, with the primary's TLS
+# settings, whatever the primary's connection mode.
+REPLICA_CONFIG = {
+    'host': os.getenv('DATABASE_REPLICA_HOST', ''),
+    'port': int(os.getenv('DATABASE_REPLICA_PORT', '3306')),
+    'pool_size': int(os.getenv('DB_REPLICA_POOL_SIZE', '10')),
+    # Reads fall back to the primary while the replica is further behind than this
+    'max_lag': float(os.getenv('DB_REPLICA_MAX_LAG', '5')),
+    'lag_check_interval': float(os.getenv('DB_REPLICA_LAG_CHECK_INTERVAL', '5')),
+    # Seconds after a user's write during which their reads stay on the primary
+    'read_your_writes_window': float(os.getenv('DB_REPLICA_READ_YOUR_WRITES', '10')),
+    # Shared by all workers so the write marker survives hopping between them
+    'recent_writes_path': os.getenv('DB_REPLICA_RECENT_WRITES_PATH', '/tmp/gym-recent-writes')
+}
+
+# In-process cache of the user records read on every authenticated request
+USER_CACHE_CONFIG = {
+    'max_size': int(os.getenv('USER_CACHE_MAX_SIZE', '4096')),
+    'ttl': int(os.getenv('USER_CACHE_TTL', '60'))
+}
+
+# Claims of already-verified JWTs, cached until each token expires
+TOKEN_CACHE_CONFIG = {
+    'max_size': int(os.getenv('TOKEN_CACHE_MAX_SIZE', '10000'))
+}
+
+# In-process index of upcoming classes that serves GET /api/classes
+SCHEDULE_INDEX_CONFIG = {
+    # Shared by all workers on the host to announce class and booking changes
+    'version_path': os.getenv('SCHEDULE_INDEX_VERSION_PATH', '/tmp/gym-schedule-version'),
+    # Seconds a worker may keep showing seat counts other workers have changed
+    'refresh_interval': float(os.getenv('SCHEDULE_INDEX_REFRESH_INTERVAL', '1')),
+    # Seconds before a full reload regardless, for changes made from other hosts
+    'max_age': float(os.getenv('SCHEDULE_INDEX_MAX_AGE', '60'))
+}
+
+# bcrypt settings; changing 'rounds' rehashes each password on its next login
+PASSWORD_HASH_CONFIG = {
+    'rounds': int(os.getenv('BCRYPT_ROUNDS', '12')),
+    # Hashes computed at once; further requests queue up to 'max_queue'
+    'max_concurrency': int(os.getenv('BCRYPT_MAX_CONCURRENCY', '2')),
+    'max_queue': int(os.getenv('BCRYPT_MAX_QUEUE', '32')),
+    'queue_timeout': float(os.getenv('BCRYPT_QUEUE_TIMEOUT', '5'))
+}
+
+# Login attempts allowed before bcrypt runs, per email and per client IP.
+# Repeated failures lock the email/IP out for base_backoff, doubling each time.
+LOGIN_THROTTLE_CONFIG = {
+    'email_attempts_per_minute': int(os.getenv('LOGIN_EMAIL_ATTEMPTS_PER_MINUTE', '5')),
+    'ip_attempts_per_minute': int(os.getenv('LOGIN_IP_ATTEMPTS_PER_MINUTE', '60')),
+    'free_failures': int(os.getenv('LOGIN_FREE_FAILURES', '3')),
+    'base_backoff': float(os.getenv('LOGIN_BASE_BACKOFF', '1')),
+    'max_backoff': float(os.getenv('LOGIN_MAX_BACKOFF', '300'))
+}
+
+# Request rate limits. Counters live in a memory-mapped file shared by every
+# worker on the host; authenticated requests are counted per user, anonymous
+# ones per client IP. Blueprint limits apply on top of the defaults.
+RATE_LIMIT_CONFIG = {
+    'storage_uri': os.getenv('RATE_LIMIT_STORAGE_URI', 'shm:///tmp/gym-rate-limits'),
+    'default_limits': os.getenv('RATE_LIMIT_DEFAULTS', '200 per day;50 per hour'),
+    'blueprint_limits': {
+        'auth': os.getenv('RATE_LIMIT_AUTH', '30 per minute'),
+        'admin': os.getenv('RATE_LIMIT_ADMIN', '600 per hour')
+    }
 }
 
 # Secret key for JWT and Flask sessions
@@ -1,7 +1,13 @@
-from db_connection import get_db, DatabaseConnectionManager
+from db_connection import get_db, close_db, release_db, init_app, DatabaseConnectionManager
+from db_pool import PoolTimeoutError, CircuitOpenError
+from db_statements import query_prepared, statement_stats
+from db_transactions import transaction, run_transaction, transaction_stats
+from db_queries import query_stats
 
 # Re-export get_db for backward compatibility
-__all__ = ['get_db', 'get_db_connection']
+__all__ = ['get_db', 'close_db', 'release_db', 'init_app', 'get_db_connection', 'PoolTimeoutError', 'CircuitOpenError',
+           'query_prepared', 'statement_stats', 'transaction', 'run_transaction',
+           'transaction_stats', 'query_stats']
 
 # Get the global database manager instance
 db_manager = DatabaseConnectionManager()
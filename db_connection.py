@@ -1,13 +1,17 @@
 import mysql.connector
-from mysql.connector import pooling
-from sshtunnel import SSHTunnelForwarder
-from config import DATABASE_CONFIG, SSH_CONFIG
-import paramiko
+from config import (DATABASE_CONFIG, SSH_CONFIG, DB_POOL_CONFIG, REPLICA_CONFIG, QUERY_STATS_CONFIG,
+                    CIRCUIT_BREAKER_CONFIG)
+from db_pool import ConnectionPool, PoolTimeoutError, CircuitBreaker, CircuitOpenError
+from tunnel_manager import TunnelManager
+from rate_limit import SharedMemoryStorage
+from db_sqlite import SQLiteDatabase
+import db_queries
 import threading
-import os
 import time
+import os
 import logging
 from contextlib import contextmanager
+from flask import g, has_app_context, has_request_context, request, session
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -16,6 +20,14 @@ if not logger.handlers:
     handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
     logger.addHandler(handler)
 
+BACKENDS = ('mysql', 'sqlite')
+CONNECTION_MODES = ('direct', 'ssh_tunnel')
+
+# Requests with these methods never mark their user as having written
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+db_queries.configure(**QUERY_STATS_CONFIG)
+
 class DatabaseConnectionManager:
     _instance = None
     _lock = threading.Lock()
@@ -29,103 +41,293 @@ class DatabaseConnectionManager:
         return cls._instance
 
     def _initialize(self):
-        self._tunnel = None
-        self._pool = None
-        self._pem_path = os.path.join(os.path.expanduser("~"), "Downloads", "main.pem")
-        self._last_connection_time = 0
-        self._connection_timeout = 3600
-        self._connections = []
-
-    def _create_ssh_tunnel(self):
-        if self._tunnel and self._tunnel.is_active:
-            return
-
-        logger.debug(f"Loading PEM key from {self._pem_path}")
-        if not os.path.exists(self._pem_path):
-            logger.error(f"PEM file not found at {self._pem_path}")
-            raise FileNotFoundError(f"PEM file not found: {self._pem_path}")
-
-        try:
-            key = paramiko.RSAKey.from_private_key_file(self._pem_path)
-            logger.debug("PEM key loaded successfully")
-        except Exception as e:
-            logger.error(f"Failed to load PEM key: {e}")
-            raise
-
-        try:
-            self._tunnel = SSHTunnelForwarder(
-                (SSH_CONFIG['ssh_host'], 22),
-                ssh_username=SSH_CONFIG['ssh_username'],
-                ssh_pkey=key,
-                remote_bind_address=SSH_CONFIG['remote_bind_address'],
-                local_bind_address=('127.0.0.1', 0),
-                allow_agent=False,
-                #look_for_keys=False
+        self._backend = DATABASE_CONFIG.get('backend', 'mysql')
+        if self._backend not in BACKENDS:
+            raise ValueError(f"Unknown database backend {self._backend!r}; expected one of {BACKENDS}")
+        self._mode = DATABASE_CONFIG.get('connection_mode', 'direct')
+        if self._mode not in CONNECTION_MODES:
+            raise ValueError(
+                f"Unknown database connection mode {self._mode!r}; expected one of {CONNECTION_MODES}"
             )
-            self._tunnel.start()
-            logger.info(f"SSH tunnel started on local port {self._tunnel.local_bind_port}")
-        except Exception as e:
-            logger.error(f"Failed to start SSH tunnel: {e}")
-            raise
+        self._tunnels = None
+        self._sqlite = None
+        if self._backend == 'sqlite':
+            self._sqlite = SQLiteDatabase(DATABASE_CONFIG['sqlite_path'])
+            logger.info(f"Database backend: sqlite at {DATABASE_CONFIG['sqlite_path']}")
+        else:
+            logger.info(f"Database connection mode: {self._mode}")
+        if self._mode == 'ssh_tunnel' and self._sqlite is None:
+            self._tunnels = TunnelManager(
+                SSH_CONFIG['ssh_host'],
+                SSH_CONFIG['ssh_username'],
+                SSH_CONFIG['ssh_private_key'] or os.path.join(os.path.expanduser("~"), "Downloads", "main.pem"),
+                SSH_CONFIG['remote_bind_address'],
+                count=SSH_CONFIG['tunnel_count'],
+                keepalive=SSH_CONFIG['keepalive'],
+                check_interval=SSH_CONFIG['check_interval']
+            )
+        self._breaker = CircuitBreaker(
+            failure_threshold=CIRCUIT_BREAKER_CONFIG['failure_threshold'],
+            reset_timeout=CIRCUIT_BREAKER_CONFIG['reset_timeout']
+        )
+        self._pool = ConnectionPool(
+            self._connect_primary,
+            size=DB_POOL_CONFIG['pool_size'],
+            checkout_timeout=DB_POOL_CONFIG['checkout_timeout'],
+            max_waiters=DB_POOL_CONFIG['max_waiters'],
+            max_lifetime=DB_POOL_CONFIG['max_lifetime'],
+            idle_timeout=DB_POOL_CONFIG['idle_timeout'],
+            ping_after=DB_POOL_CONFIG['ping_after']
+        )
+        self._initialize_replica()
 
-    def _create_connection_pool(self):
-        if self._pool:
+    def _initialize_replica(self):
+        self._replica_pool = None
+        self._replica_lock = threading.Lock()
+        self._lag_refresh = threading.Lock()
+        self._replica_lag = None
+        self._lag_checked_at = 0.0
+        self._routing = {
+            'replica_reads': 0,
+            'lag_fallbacks': 0,
+            'read_your_writes_fallbacks': 0,
+            'replica_errors': 0,
+        }
+        if not REPLICA_CONFIG['host'] or self._sqlite is not None:
             return
+        self._replica_pool = ConnectionPool(
+            self._connect_replica,
+            size=REPLICA_CONFIG['pool_size'],
+            checkout_timeout=DB_POOL_CONFIG['checkout_timeout'],
+            max_waiters=DB_POOL_CONFIG['max_waiters'],
+            max_lifetime=DB_POOL_CONFIG['max_lifetime'],
+            idle_timeout=DB_POOL_CONFIG['idle_timeout'],
+            ping_after=DB_POOL_CONFIG['ping_after']
+        )
+        self._recent_writes = SharedMemoryStorage(
+            f"shm://{REPLICA_CONFIG['recent_writes_path']}", slots=16384
+        )
+        logger.info(f"Read replica at {REPLICA_CONFIG['host']}:{REPLICA_CONFIG['port']}")
+
+    def _endpoint_params(self):
+        """Host, port and TLS arguments for the configured connection mode"""
+        if self._mode == 'ssh_tunnel':
+            host, port = self._tunnels.endpoint()
+            return {'host': host, 'port': port}
+        return self._direct_params(DATABASE_CONFIG['host'], DATABASE_CONFIG['port'])
+
+    def _direct_params(self, host, port):
+        params = {'host': host, 'port': port}
+        if DATABASE_CONFIG.get('ssl_disabled'):
+            params['ssl_disabled'] = True
+        elif DATABASE_CONFIG.get('ssl_ca'):
+            params['ssl_ca'] = DATABASE_CONFIG['ssl_ca']
+            params['ssl_verify_cert'] = True
+            params['ssl_verify_identity'] = DATABASE_CONFIG.get('ssl_verify_identity', False)
+        return params
 
+    def _connect(self, params=None):
+        """Open one new connection; used by the pool to fill and recycle"""
+        if self._sqlite is not None:
+            return self._sqlite.connect()
+        params = params or self._endpoint_params()
         try:
-            self._pool = mysql.connector.pooling.MySQLConnectionPool(
-                pool_name="mypool",
-                pool_size=10,
-                host='127.0.0.1',
-                port=self._tunnel.local_bind_port,
+            return mysql.connector.connect(
+                **params,
                 user=DATABASE_CONFIG['user'],
                 password=DATABASE_CONFIG['password'],
                 database=DATABASE_CONFIG['database'],
                 autocommit=True,
-                connect_timeout=10
+                compress=DATABASE_CONFIG.get('compress', False),
+                # A request-scoped connection is shared by several cursors,
+                # so drain any rows a previous cursor left unread.
+                consume_results=True,
+                connect_timeout=DATABASE_CONFIG.get('connect_timeout', 10)
             )
-            self._last_connection_time = time.time()
-            logger.info("MySQL connection pool created successfully")
         except mysql.connector.Error as e:
-            logger.error(f"Failed to create MySQL pool: {e}")
+            logger.error(f"Failed to open MySQL connection: {e}")
             raise
-        except Exception as e:
-            logger.error(f"Unexpected error creating MySQL pool: {e}")
+
+    def _connect_primary(self):
+        """Open a primary connection, feeding the outcome to the circuit breaker"""
+        try:
+            cnx = self._connect()
+        except Exception:
+            self._breaker.record_failure()
             raise
+        self._breaker.record_success()
+        return cnx
+
+    def _connect_replica(self):
+        return self._connect(self._direct_params(REPLICA_CONFIG['host'], REPLICA_CONFIG['port']))
+
+    def acquire(self):
+        """Check a connection out of the pool. Pair every call with release().
+
+        When every connection is busy the caller queues (FIFO) for up to the
+        configured checkout timeout before PoolTimeoutError is raised. While
+        the circuit breaker is open CircuitOpenError is raised at once instead,
+        so requests do not pile up behind connect timeouts. The first call
+        after the cool-down pings the database to decide whether to close it.
+        """
+        if not self._breaker.allow():
+            return self._pool.acquire()
+        conn = None
+        try:
+            conn = self._pool.acquire()
+            conn.ping()
+        except Exception:
+            if conn is not None:
+                self._pool.release(conn)
+            self._breaker.record_failure()
+            raise
+        self._breaker.record_success()
+        return conn
+
+    def release(self, conn):
+        """Return a connection obtained from acquire() to the pool."""
+        self._pool.release(conn)
 
-    def _check_connection_age(self):
-        if time.time() - self._last_connection_time > self._connection_timeout:
-            self._refresh_connections()
+    def pool_stats(self):
+        """Checkout counters and wait-time percentiles for this worker"""
+        return self._pool.stats()
 
-    def _refresh_connections(self):
-        for conn in self._connections:
+    def breaker_stats(self):
+        """Circuit breaker state and counters for this worker"""
+        return self._breaker.snapshot()
+
+    def check_ready(self):
+        """Ping the primary through the circuit breaker.
+
+        Returns ``(ready, details)``. While the breaker is open this fails
+        without contacting the database; once it has cooled down the check
+        itself is the probe, so an instance taken out of rotation recovers
+        without needing live traffic.
+        """
+        try:
+            conn = self.acquire()
             try:
-                if conn.is_connected():
-                    conn.close()
-            except:
-                pass
-        self._connections.clear()
-        self._pool = None
-        self._create_connection_pool()
+                conn.ping()
+            except Exception:
+                self._breaker.record_failure()
+                raise
+            finally:
+                self.release(conn)
+            ready = True
+        except CircuitOpenError:
+            ready = False
+        except Exception as e:
+            logger.warning(f"Readiness check failed: {e}")
+            ready = False
+        return ready, {'database': 'ok' if ready else 'unavailable', 'circuit_breaker': self.breaker_stats()}
+
+    def acquire_replica(self, user_id=None):
+        """Check a replica connection out for a read, or return None to use the primary.
+
+        The primary is used when no replica is configured, when ``user_id``
+        wrote recently (so they read their own writes), when the replica lags
+        past the configured threshold, or when the replica cannot be reached.
+        """
+        if self._replica_pool is None:
+            return None
+        if user_id is not None and self._recent_writes.get(f"write:{user_id}"):
+            self._count('read_your_writes_fallbacks')
+            return None
+        lag = self._current_lag()
+        if lag is None or lag > REPLICA_CONFIG['max_lag']:
+            self._count('lag_fallbacks')
+            return None
+        try:
+            conn = self._replica_pool.acquire()
+        except Exception as e:
+            logger.warning(f"Replica unavailable, reading from primary: {e}")
+            self._count('replica_errors')
+            return None
+        self._count('replica_reads')
+        return conn
+
+    def release_replica(self, conn):
+        """Return a connection obtained from acquire_replica()"""
+        self._replica_pool.release(conn)
+
+    def record_write(self, user_id):
+        """Keep ``user_id``'s reads on the primary for the read-your-writes window"""
+        if self._replica_pool is not None and user_id is not None:
+            self._recent_writes.incr(
+                f"write:{user_id}", REPLICA_CONFIG['read_your_writes_window'], elastic_expiry=True
+            )
+
+    def replica_stats(self):
+        """Replica pool counters, last measured lag and read routing decisions"""
+        if self._replica_pool is None:
+            return None
+        with self._replica_lock:
+            routing = dict(self._routing)
+        return {
+            'pool': self._replica_pool.stats(),
+            'lag_seconds': self._replica_lag,
+            'routing': routing,
+        }
+
+    def _count(self, counter):
+        with self._replica_lock:
+            self._routing[counter] += 1
+
+    def _current_lag(self):
+        """Replica lag in seconds, refreshed by one caller at a time every check interval"""
+        now = time.monotonic()
+        if now - self._lag_checked_at < REPLICA_CONFIG['lag_check_interval']:
+            return self._replica_lag
+        if not self._lag_refresh.acquire(blocking=False):
+            return self._replica_lag
+        try:
+            self._lag_checked_at = now
+            self._replica_lag = self._measure_lag()
+        finally:
+            self._lag_refresh.release()
+        return self._replica_lag
+
+    def _measure_lag(self):
+        """Seconds_Behind_Source from the replica, or None if replication is not running"""
+        try:
+            conn = self._replica_pool.acquire()
+        except Exception as e:
+            logger.warning(f"Could not check replica lag: {e}")
+            return None
+        try:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except mysql.connector.Error:
+                # Servers before 8.0.22 only know the old name
+                cursor.execute("SHOW SLAVE STATUS")
+            status = cursor.fetchone()
+            cursor.close()
+        except mysql.connector.Error as e:
+            logger.warning(f"Could not check replica lag: {e}")
+            return None
+        finally:
+            self._replica_pool.release(conn)
+        if not status:
+            return None
+        lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        return float(lag) if lag is not None else None
+
+    def tunnel_stats(self):
+        """Per-tunnel byte, channel and round-trip counters, or None when connecting directly"""
+        return self._tunnels.snapshot() if self._tunnels else None
 
     @contextmanager
     def get_connection(self):
         try:
-            self._create_ssh_tunnel()
-            self._create_connection_pool()
-            self._check_connection_age()
-
-            conn = self._pool.get_connection()
+            conn = self.acquire()
             cursor = conn.cursor()
-            self._connections.append(conn)
 
             try:
                 yield conn, cursor
             finally:
                 cursor.close()
-                if conn.is_connected():
-                    conn.close()
-                self._connections.remove(conn)
+                self.release(conn)
         except mysql.connector.Error as e:
             logger.error(f"MySQL connection error: {e}")
             raise
@@ -134,21 +336,114 @@ class DatabaseConnectionManager:
             raise
 
     def cleanup(self):
-        if self._tunnel and self._tunnel.is_active:
-            self._tunnel.close()
-        for conn in self._connections:
-            try:
-                if conn.is_connected():
-                    conn.close()
-            except:
-                pass
-        self._connections.clear()
-        self._pool = None
+        self._pool.close()
+        if self._replica_pool is not None:
+            self._replica_pool.close()
+        if self._tunnels:
+            self._tunnels.close()
+        if self._sqlite is not None:
+            self._sqlite.close()
 
 # Usage wrapper
 db_manager = DatabaseConnectionManager()
 
+def _request_user_id():
+    user = g.get('current_user')
+    if user:
+        return user.get('id')
+    if has_request_context():
+        return session.get('user_id')
+    return None
+
 @contextmanager
-def get_db():
-    with db_manager.get_connection() as (conn, cursor):
-        yield conn
+def get_db(readonly=None):
+    """Yield a database connection.
+
+    Inside a Flask app context the connection is checked out lazily on first
+    use, stored on ``g`` and reused by every later get_db() call in the same
+    request; close_db() returns it to the pool on teardown. Outside an app
+    context each call checks out its own connection.
+
+    ``readonly=True`` sends the query to the read replica when one is usable
+    (see DatabaseConnectionManager.acquire_replica). A write request that
+    already holds a primary connection keeps reading from it. When
+    ``readonly`` is not given it defaults to ``g.db_readonly``, which a
+    blueprint can set.
+    """
+    if not has_app_context():
+        conn = db_manager.acquire_replica() if readonly else None
+        if conn is not None:
+            try:
+                yield conn
+            finally:
+                db_manager.release_replica(conn)
+            return
+        with db_manager.get_connection() as (conn, cursor):
+            yield conn
+        return
+
+    if readonly is None:
+        readonly = g.get('db_readonly', False)
+    if readonly:
+        conn = g.get('_db_replica_conn')
+        # A request that may have written keeps reading from the primary
+        may_have_written = (g.get('_db_conn') is not None and has_request_context()
+                            and request.method not in READ_METHODS)
+        if conn is None and not may_have_written:
+            conn = db_manager.acquire_replica(_request_user_id())
+            if conn is not None:
+                g._db_replica_conn = conn
+        if conn is not None:
+            yield conn
+            return
+
+    conn = g.get('_db_conn')
+    if conn is None:
+        conn = db_manager.acquire()
+        g._db_conn = conn
+    yield conn
+
+def release_db():
+    """Return the connections checked out so far to their pools.
+
+    For views about to do slow work without the database, such as hashing a
+    password; a later get_db() in the same request checks out a new one.
+    """
+    replica = g.pop('_db_replica_conn', None)
+    if replica is not None:
+        db_manager.release_replica(replica)
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        # The pool rolls back any transaction left open by the request
+        db_manager.release(conn)
+
+def close_db(exc=None):
+    """Return the request's connections, if any, to their pools."""
+    if g.get('_db_conn') is not None and has_request_context() and request.method not in READ_METHODS:
+        db_manager.record_write(_request_user_id())
+    release_db()
+
+def end_request(exc=None):
+    """Record the request's query stats and return its connections.
+
+    Runs on request teardown, while the request's endpoint and method are
+    still available; Flask unbinds the request before app context teardown.
+    """
+    db_queries.finish_request()
+    close_db(exc)
+
+def init_app(app):
+    """Register the request-scoped connection teardown on a Flask app.
+
+    In debug mode responses also carry the request's query count and
+    database time as X-DB-Query-Count and X-DB-Time-Ms.
+    """
+    app.teardown_request(end_request)
+    # App contexts without a request (CLI commands, scripts)
+    app.teardown_appcontext(close_db)
+
+    @app.after_request
+    def add_query_headers(response):
+        if app.debug:
+            db_queries.add_debug_headers(response)
+        return response
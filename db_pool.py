@@ -0,0 +1,441 @@
+import threading
+import time
+import os
+import logging
+from collections import deque
+from db_queries import InstrumentedCursor
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection could be checked out in time"""
+    pass
+
+
+class CircuitOpenError(PoolTimeoutError):
+    """Raised without contacting the database while the circuit breaker is open"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Stops connection attempts after repeated consecutive failures.
+
+    After ``failure_threshold`` failures in a row the breaker opens and every
+    call fails at once for ``reset_timeout`` seconds. The first call after
+    that goes through as a probe (half-open): success closes the breaker,
+    failure opens it for another ``reset_timeout``. Calls arriving while the
+    probe is in flight fail fast as well.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self.opens = 0
+        self.rejected = 0
+
+    def allow(self):
+        """Return True if this call is the half-open probe, False for a normal call.
+
+        Raises CircuitOpenError instead when the call must fail fast.
+        """
+        if self.state == self.CLOSED:
+            return False
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            remaining = self._opened_at + self._reset_timeout - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+                return True
+            self.rejected += 1
+        raise CircuitOpenError(
+            "Database unavailable; not retrying until the circuit breaker cools down",
+            retry_after=max(remaining, 1.0)
+        )
+
+    def record_success(self):
+        if self.state == self.CLOSED and self._failures == 0:
+            return
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Database reachable again; circuit breaker closed")
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and self._failures >= self._failure_threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.opens += 1
+                logger.warning(
+                    f"Circuit breaker opened after {self._failures} consecutive connection "
+                    f"failures; failing fast for {self._reset_timeout:.0f}s"
+                )
+
+    def snapshot(self):
+        with self._lock:
+            retry_after = None
+            if self.state == self.OPEN:
+                retry_after = round(max(0.0, self._opened_at + self._reset_timeout - time.monotonic()), 3)
+            return {
+                'state': self.state,
+                'consecutive_failures': self._failures,
+                'opens': self.opens,
+                'rejected': self.rejected,
+                'retry_after': retry_after,
+            }
+
+
+class FairCheckoutQueue:
+    """Bounded FIFO gate in front of a fixed number of pool slots.
+
+    A released slot is handed directly to the longest-waiting thread, so a
+    burst of requests is served in arrival order instead of failing as soon
+    as every slot is busy.
+    """
+
+    def __init__(self, size, max_waiters):
+        self._lock = threading.Lock()
+        self._available = size
+        self._max_waiters = max_waiters
+        self._waiters = deque()
+
+    def acquire(self, timeout):
+        """Take a slot, waiting up to ``timeout`` seconds.
+
+        Returns the number of seconds spent waiting.
+        """
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return 0.0
+            if len(self._waiters) >= self._max_waiters:
+                raise PoolTimeoutError(
+                    f"Connection pool wait queue is full ({self._max_waiters} waiting)"
+                )
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+
+        start = time.monotonic()
+        if not waiter.wait(timeout):
+            with self._lock:
+                # The slot may have been handed over between the timeout and
+                # taking the lock; in that case keep it.
+                if not waiter.is_set():
+                    self._waiters.remove(waiter)
+                    raise PoolTimeoutError(
+                        f"Timed out after {timeout:.1f}s waiting for a database connection"
+                    )
+        return time.monotonic() - start
+
+    def release(self):
+        """Give a slot back, handing it to the next waiter if there is one."""
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._available += 1
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+
+class PoolMetrics:
+    """Thread-safe checkout counters and a rolling window of wait times"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._wait_times = deque(maxlen=window)
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.opened = 0
+        self.recycled = 0
+        self.pings = 0
+        self.ping_failures = 0
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def record_checkout(self, waited):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            if waited > 0:
+                self.waits += 1
+            self._wait_times.append(waited)
+
+    def record_release(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            waits = sorted(self._wait_times)
+            stats = {
+                'pid': os.getpid(),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'in_use': self.in_use,
+                'opened': self.opened,
+                'recycled': self.recycled,
+                'pings': self.pings,
+                'ping_failures': self.ping_failures,
+            }
+        stats['wait_ms'] = {
+            'p50': _percentile(waits, 50),
+            'p95': _percentile(waits, 95),
+            'p99': _percentile(waits, 99),
+            'max': round(waits[-1] * 1000, 3) if waits else 0.0,
+        }
+        return stats
+
+
+class PooledConnection:
+    """A driver connection plus the timestamps the pool tracks for it.
+
+    Attribute access falls through to the wrapped connection, so callers use
+    it exactly like a mysql.connector connection. Its cursors are wrapped so
+    every statement is timed (see db_queries).
+    """
+
+    __slots__ = ('_cnx', 'created_at', 'last_used', 'statements', 'tx_depth')
+
+    def __init__(self, cnx):
+        self._cnx = cnx
+        self.created_at = self.last_used = time.monotonic()
+        # Per-connection prepared statement cache, created on first use
+        self.statements = None
+        # Nesting level of open transaction() blocks
+        self.tx_depth = 0
+
+    def __getattr__(self, name):
+        return getattr(self._cnx, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._cnx.cursor(*args, **kwargs))
+
+
+class ConnectionPool:
+    """Fixed-size connection pool with per-connection recycling.
+
+    Each connection is retired once it is older than ``max_lifetime`` or has
+    sat idle longer than ``idle_timeout``. A connection idle for more than
+    ``ping_after`` seconds is pinged before being handed out; fresher ones
+    are returned without a round-trip. A background thread retires aged idle
+    connections and opens their replacements, so requests never wait on a
+    whole-pool rebuild.
+    """
+
+    def __init__(self, connect, size=10, checkout_timeout=5.0, max_waiters=100,
+                 max_lifetime=3600, idle_timeout=600, ping_after=30,
+                 maintenance_interval=30):
+        self._connect = connect
+        self._size = size
+        self._checkout_timeout = checkout_timeout
+        self._max_lifetime = max_lifetime
+        self._idle_timeout = idle_timeout
+        self._ping_after = ping_after
+        self._maintenance_interval = maintenance_interval
+        self._queue = FairCheckoutQueue(size, max_waiters)
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._open_count = 0
+        self._closed = threading.Event()
+        self._maintenance_thread = None
+        self.metrics = PoolMetrics()
+
+    def acquire(self):
+        """Check a connection out, queueing FIFO while the pool is busy"""
+        try:
+            waited = self._queue.acquire(self._checkout_timeout)
+        except PoolTimeoutError:
+            self.metrics.record_timeout()
+            raise
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._queue.release()
+            raise
+
+        self.metrics.record_checkout(waited)
+        self._start_maintenance()
+        return conn
+
+    def release(self, conn):
+        """Return a connection from acquire(), discarding it if it is broken"""
+        try:
+            healthy = self._reset(conn)
+            with self._lock:
+                keep = healthy and not self._closed.is_set() and self._open_count <= self._size
+                if keep:
+                    conn.last_used = time.monotonic()
+                    self._idle.append(conn)
+            if not keep:
+                self._discard(conn)
+        finally:
+            self.metrics.record_release()
+            self._queue.release()
+
+    def stats(self):
+        stats = self.metrics.snapshot()
+        with self._lock:
+            stats['open'] = self._open_count
+            stats['idle'] = len(self._idle)
+        stats['pool_size'] = self._size
+        stats['waiting'] = self._queue.waiting
+        return stats
+
+    def maintain(self):
+        """Retire idle connections past their lifetime or idle timeout.
+
+        Connections retired for age are replaced straight away so the pool
+        stays warm; ones retired for idleness are not, and the pool refills
+        on demand.
+        """
+        now = time.monotonic()
+        aged, stale = [], []
+        with self._lock:
+            keep = deque()
+            for conn in self._idle:
+                if now - conn.created_at >= self._max_lifetime:
+                    aged.append(conn)
+                elif now - conn.last_used >= self._idle_timeout:
+                    stale.append(conn)
+                else:
+                    keep.append(conn)
+            self._idle = keep
+
+        for conn in stale:
+            self._discard(conn)
+        for conn in aged:
+            self._discard(conn)
+            self.metrics.increment('recycled')
+            with self._lock:
+                if self._open_count >= self._size or self._closed.is_set():
+                    continue
+                self._open_count += 1
+            try:
+                replacement = PooledConnection(self._connect())
+            except Exception as e:
+                with self._lock:
+                    self._open_count -= 1
+                logger.warning(f"Could not replace recycled connection: {e}")
+                continue
+            self.metrics.increment('opened')
+            with self._lock:
+                self._idle.append(replacement)
+
+    def close(self):
+        """Close every idle connection and stop background maintenance"""
+        self._closed.set()
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for conn in idle:
+            self._discard(conn)
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._open()
+
+            now = time.monotonic()
+            if now - conn.created_at >= self._max_lifetime:
+                self._discard(conn)
+                self.metrics.increment('recycled')
+                continue
+            if now - conn.last_used >= self._ping_after and not self._ping(conn):
+                self._discard(conn)
+                continue
+            return conn
+
+    def _open(self):
+        with self._lock:
+            self._open_count += 1
+        try:
+            conn = PooledConnection(self._connect())
+        except Exception:
+            with self._lock:
+                self._open_count -= 1
+            raise
+        self.metrics.increment('opened')
+        return conn
+
+    def _ping(self, conn):
+        self.metrics.increment('pings')
+        try:
+            conn.ping()
+            return True
+        except Exception as e:
+            self.metrics.increment('ping_failures')
+            logger.info(f"Discarding dead pooled connection: {e}")
+            return False
+
+    def _reset(self, conn):
+        try:
+            if not conn.is_connected():
+                return False
+            if conn.in_transaction:
+                conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding connection that failed to reset: {e}")
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._open_count -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _start_maintenance(self):
+        if self._maintenance_thread is not None:
+            return
+        with self._lock:
+            if self._maintenance_thread is not None:
+                return
+            self._maintenance_thread = threading.Thread(
+                target=self._maintenance_loop, name="db-pool-maintenance", daemon=True
+            )
+        self._maintenance_thread.start()
+
+    def _maintenance_loop(self):
+        while not self._closed.wait(self._maintenance_interval):
+            try:
+                self.maintain()
+            except Exception as e:
+                logger.error(f"Connection pool maintenance failed: {e}")
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list, in milliseconds"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, int(round(pct / 100.0 * len(sorted_values))) - 1)
+    return round(sorted_values[rank] * 1000, 3)
@@ -0,0 +1,272 @@
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+from flask import g, has_app_context, has_request_context, request
+
+logger = logging.getLogger(__name__)
+# Separate logger so slow queries can be routed to their own file
+slow_query_logger = logging.getLogger('slow_queries')
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Collapse a statement to one line with every literal and parameter as ``?``.
+
+    Statements that differ only in their values normalize to the same text,
+    so they are counted together.
+    """
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def redact_params(params):
+    """Describe query parameters by type only, so logs never carry their values"""
+    if params is None:
+        return '()'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f"{key}: {type(value).__name__}" for key, value in params.items()) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in params) + ')'
+
+
+class QueryStats:
+    """Per-statement and per-endpoint query counters for this worker.
+
+    Statements are keyed by their normalized text. Once ``max_statements``
+    distinct statements are tracked, further new ones are counted under a
+    single ``(other)`` entry so dynamically built SQL cannot grow the table.
+    """
+
+    OTHER = '(other)'
+
+    def __init__(self, slow_query_ms=200, max_statements=500):
+        self.slow_query_seconds = slow_query_ms / 1000.0
+        self._max_statements = max_statements
+        self._lock = threading.Lock()
+        # normalized sql -> [count, total seconds, max seconds, rows]
+        self._statements = {}
+        # endpoint -> [requests, queries, total seconds, max queries in one request]
+        self._endpoints = {}
+
+    def record_statement(self, sql, params, seconds, rows, endpoint=None):
+        normalized = normalize_sql(sql)
+        with self._lock:
+            entry = self._statements.get(normalized)
+            if entry is None:
+                if len(self._statements) >= self._max_statements:
+                    normalized = self.OTHER
+                entry = self._statements.setdefault(normalized, [0, 0.0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3] += rows
+
+        if seconds >= self.slow_query_seconds:
+            slow_query_logger.warning(
+                f"Slow query ({seconds * 1000:.1f} ms, {rows} rows, endpoint {endpoint}): "
+                f"{normalize_sql(sql)} params={redact_params(params)}"
+            )
+
+    def record_request(self, endpoint, queries, seconds):
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = self._endpoints[endpoint] = [0, 0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += queries
+            entry[2] += seconds
+            entry[3] = max(entry[3], queries)
+
+    def snapshot(self, top=20):
+        """The ``top`` statements by total time, and every endpoint's averages"""
+        with self._lock:
+            statements = sorted(self._statements.items(), key=lambda item: item[1][1], reverse=True)
+            endpoints = {name: list(entry) for name, entry in self._endpoints.items()}
+        return {
+            'slow_query_ms': self.slow_query_seconds * 1000,
+            'statements': [
+                {
+                    'sql': sql,
+                    'count': count,
+                    'total_ms': round(total * 1000, 3),
+                    'avg_ms': round(total * 1000 / count, 3),
+                    'max_ms': round(longest * 1000, 3),
+                    'rows': rows,
+                }
+                for sql, (count, total, longest, rows) in statements[:top]
+            ],
+            'endpoints': {
+                name: {
+                    'requests': requests,
+                    'queries': queries,
+                    'avg_queries': round(queries / requests, 2),
+                    'max_queries': most,
+                    'db_ms': round(total * 1000, 3),
+                    'avg_db_ms': round(total * 1000 / requests, 3),
+                }
+                for name, (requests, queries, total, most) in endpoints.items()
+            },
+        }
+
+
+_stats = QueryStats()
+
+
+def configure(slow_query_ms=200, max_statements=500):
+    """Replace this worker's query stats with freshly configured ones"""
+    global _stats
+    _stats = QueryStats(slow_query_ms, max_statements)
+
+
+def query_stats():
+    """Statement and endpoint timings for this worker"""
+    return _stats.snapshot()
+
+
+class RequestQueries:
+    """Query count and database time for the current request"""
+
+    __slots__ = ('count', 'seconds', 'pending')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        # Cursors whose last statement has not been recorded yet
+        self.pending = set()
+
+
+def current_request_queries(create=False):
+    """The app context's RequestQueries, or None outside one"""
+    if not has_app_context():
+        return None
+    queries = g.get('_db_queries')
+    if queries is None and create:
+        queries = g._db_queries = RequestQueries()
+    return queries
+
+
+def _endpoint():
+    return request.endpoint if has_request_context() else None
+
+
+def record_query(sql, params, seconds, rows):
+    """Record a statement that was timed outside an InstrumentedCursor"""
+    queries = current_request_queries(create=True)
+    if queries is not None:
+        queries.count += 1
+        queries.seconds += seconds
+    _stats.record_statement(sql, params, seconds, rows, _endpoint())
+
+
+def finish_request():
+    """Record cursors left open and add the request's totals to its endpoint"""
+    queries = g.pop('_db_queries', None)
+    if queries is None:
+        return
+    for cursor in list(queries.pending):
+        cursor._finish()
+    endpoint = _endpoint()
+    if endpoint is not None:
+        _stats.record_request(endpoint, queries.count, queries.seconds)
+
+
+def add_debug_headers(response):
+    """Expose the request's query count and database time while debugging"""
+    queries = current_request_queries()
+    response.headers['X-DB-Query-Count'] = str(queries.count if queries else 0)
+    response.headers['X-DB-Time-Ms'] = f"{queries.seconds * 1000 if queries else 0.0:.3f}"
+    return response
+
+
+class InstrumentedCursor:
+    """Driver cursor wrapper that times each statement and counts its rows.
+
+    A statement's time covers execute() and the fetches that follow it, so an
+    unbuffered read is also charged for reading its rows. The statement is
+    recorded when the cursor runs its next one or is closed, or at the end of
+    the request for cursors that are never closed. Everything else falls
+    through to the wrapped cursor.
+    """
+
+    __slots__ = ('_cursor', '_sql', '_params', '_seconds', '_queries')
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._sql = None
+        self._params = None
+        self._seconds = 0.0
+        self._queries = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def execute(self, operation, params=None, multi=False):
+        if self._sql is not None:
+            self._finish()
+        queries = current_request_queries(create=True)
+        if queries is not None:
+            queries.count += 1
+            queries.pending.add(self)
+        self._sql, self._params, self._seconds, self._queries = operation, params, 0.0, queries
+        start = time.perf_counter()
+        try:
+            if multi:
+                return self._cursor.execute(operation, params, multi=True)
+            return self._cursor.execute(operation, params)
+        finally:
+            self._add_time(time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return self._cursor.fetchone()
+        finally:
+            self._add_time(time.perf_counter() - start)
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        try:
+            return self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        finally:
+            self._add_time(time.perf_counter() - start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return self._cursor.fetchall()
+        finally:
+            self._add_time(time.perf_counter() - start)
+
+    def close(self):
+        if self._sql is not None:
+            self._finish()
+        return self._cursor.close()
+
+    def _add_time(self, seconds):
+        self._seconds += seconds
+        if self._queries is not None:
+            self._queries.seconds += seconds
+
+    def _finish(self):
+        sql, self._sql = self._sql, None
+        if sql is None:
+            return
+        if self._queries is not None:
+            self._queries.pending.discard(self)
+            self._queries = None
+        rowcount = getattr(self._cursor, 'rowcount', -1)
+        _stats.record_statement(sql, self._params, self._seconds,
+                                rowcount if rowcount and rowcount > 0 else 0, _endpoint())
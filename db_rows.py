@@ -0,0 +1,173 @@
+import json
+import logging
+from datetime import datetime
+from json.encoder import encode_basestring_ascii
+from flask import current_app, stream_with_context
+from werkzeug.http import http_date
+
+logger = logging.getLogger(__name__)
+
+_DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+           'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+class RowSet:
+    """Query rows kept as the driver's tuples plus one shared column index.
+
+    Avoids building a dict with its own copy of every key per row, and
+    to_json() writes the same document jsonify() would produce for the
+    equivalent list of dicts, encoding column by column.
+    """
+
+    __slots__ = ('columns', 'rows', 'index')
+
+    def __init__(self, columns, rows):
+        self.columns = tuple(columns)
+        self.rows = rows
+        self.index = {name: pos for pos, name in enumerate(self.columns)}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def value(self, row, column):
+        return row[self.index[column]]
+
+    def as_dicts(self):
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in self.rows]
+
+    def to_json(self):
+        return '[' + _RowEncoder(self.columns).encode(self.rows) + ']'
+
+
+def fetch_rowset(cursor):
+    """Read every remaining row of a tuple cursor into a RowSet"""
+    return RowSet(cursor.column_names, cursor.fetchall())
+
+
+def rowset_response(rowset, status=200):
+    """JSON response for a RowSet, as jsonify(rowset.as_dicts()) would send it"""
+    return current_app.response_class(
+        rowset.to_json() + '\n',
+        status=status,
+        mimetype=current_app.config['JSONIFY_MIMETYPE']
+    )
+
+
+def encode_rows(columns, rows):
+    """Each row as its own JSON object, encoded as RowSet.to_json() would"""
+    return _RowEncoder(columns).encode_each(rows)
+
+
+def json_array_response(encoded, status=200):
+    """JSON response for a list of already encoded JSON values"""
+    return current_app.response_class(
+        '[' + ','.join(encoded) + ']\n',
+        status=status,
+        mimetype=current_app.config['JSONIFY_MIMETYPE']
+    )
+
+
+def stream_rows_response(cursor, converters=None, chunk_size=500):
+    """Stream the rest of an unbuffered tuple cursor as a JSON array.
+
+    Rows are read ``chunk_size`` at a time while earlier chunks are being
+    sent, so memory stays flat however large the result is. ``converters``
+    maps column names to functions applied to that column's values first.
+
+    The connection stays checked out until the last row is sent: the
+    response keeps the request context alive and the usual teardown returns
+    the connection afterwards. The cursor is closed when streaming ends.
+    """
+    encoder = _RowEncoder(cursor.column_names, converters)
+
+    def generate():
+        try:
+            yield '['
+            separator = ''
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield separator + encoder.encode(rows)
+                separator = ','
+            yield ']\n'
+        except Exception as e:
+            # Headers are already sent; all we can do is cut the body short
+            logger.error(f"Streaming query results failed: {e}")
+            raise
+        finally:
+            cursor.close()
+
+    return current_app.response_class(
+        stream_with_context(generate()),
+        mimetype=current_app.config['JSONIFY_MIMETYPE']
+    )
+
+
+class _RowEncoder:
+    """Encodes batches of row tuples as comma-separated JSON objects"""
+
+    def __init__(self, columns, converters=None):
+        order = list(range(len(columns)))
+        if current_app.config.get('JSON_SORT_KEYS', True):
+            order.sort(key=lambda pos: columns[pos])
+        self._order = order
+        self._template = '{' + ','.join(
+            encode_basestring_ascii(columns[pos]) + ':%s' for pos in order
+        ) + '}'
+        converters = converters or {}
+        self._converters = {pos: converters[name] for pos, name in enumerate(columns)
+                            if name in converters}
+
+    def encode(self, rows):
+        return ','.join(self.encode_each(rows))
+
+    def encode_each(self, rows):
+        if not rows:
+            return []
+        by_column = list(zip(*rows))
+        for pos, convert in self._converters.items():
+            by_column[pos] = tuple(map(convert, by_column[pos]))
+        encoded = [map(_column_encoder(by_column[pos]), by_column[pos]) for pos in self._order]
+        return [self._template % values for values in zip(*encoded)]
+
+
+def _column_encoder(values):
+    """Pick the cheapest encoder that handles every value in a column"""
+    types = set(map(type, values))
+    if types == {str}:
+        return encode_basestring_ascii
+    if types == {int}:
+        return int.__repr__
+    if types == {datetime}:
+        return _encode_datetime
+    return _encode_value
+
+
+def _encode_datetime(value):
+    # Same text as Flask's encoder (werkzeug http_date) for the naive UTC
+    # datetimes MySQL returns, without going through email.utils
+    if value.tzinfo is not None:
+        return '"' + http_date(value) + '"'
+    return '"%s, %02d %s %04d %02d:%02d:%02d GMT"' % (
+        _DAYS[value.weekday()], value.day, _MONTHS[value.month - 1], value.year,
+        value.hour, value.minute, value.second
+    )
+
+
+def _encode_value(value):
+    if value is None:
+        return 'null'
+    kind = type(value)
+    if kind is str:
+        return encode_basestring_ascii(value)
+    if kind is int:
+        return int.__repr__(value)
+    if kind is datetime:
+        return _encode_datetime(value)
+    return json.dumps(value, cls=current_app.json_encoder)
@@ -0,0 +1,403 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from mysql.connector import errors as mysql_errors
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+
+# Store values the way MySQL returns them, and read declared column types back
+# into the same Python types mysql.connector produces.
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter('datetime', lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter('timestamp', lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter('date', lambda value: date.fromisoformat(value.decode()[:10]))
+sqlite3.register_converter('decimal', lambda value: Decimal(value.decode()))
+
+_TOKEN = re.compile(r"""'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.)*"|`[^`]*`|%\(\w+\)s|%s|\w+|\s+|.""", re.S)
+_INTERVAL = re.compile(r"^INTERVAL\s+(.+?)\s+(\w+)$", re.I | re.S)
+_ISO_DATETIME = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}")
+
+_NOW = "datetime('now', 'localtime')"
+_TODAY = "date('now', 'localtime')"
+
+# Interval units as SQLite date modifiers: (modifier, multiplier)
+_UNITS = {
+    'SECOND': ('seconds', 1),
+    'MINUTE': ('minutes', 1),
+    'HOUR': ('hours', 1),
+    'DAY': ('days', 1),
+    'WEEK': ('days', 7),
+    'MONTH': ('months', 1),
+    'YEAR': ('years', 1),
+}
+
+# TIMESTAMPDIFF units measured in days: julianday() difference times this
+_DAY_FRACTIONS = {'SECOND': 86400, 'MINUTE': 1440, 'HOUR': 24, 'DAY': 1, 'WEEK': 1 / 7}
+
+# MySQL DATE_FORMAT specifiers that strftime() understands
+_FORMAT_SPECIFIERS = {
+    '%Y': '%Y', '%m': '%m', '%d': '%d', '%H': '%H', '%i': '%M',
+    '%s': '%S', '%S': '%S', '%j': '%j', '%w': '%w', '%%': '%%',
+}
+
+
+def _interval(expr, interval, sign):
+    match = _INTERVAL.match(interval)
+    if not match:
+        raise ValueError(f"Unsupported interval {interval!r}")
+    amount, unit = match.group(1), match.group(2).upper()
+    modifier, multiplier = _UNITS[unit]
+    if multiplier != 1:
+        amount = f"({amount}) * {multiplier}"
+    # Date arithmetic on a date stays a date, as in MySQL
+    func = 'date' if expr.startswith('date(') and modifier in ('days', 'months', 'years') else 'datetime'
+    return f"{func}({expr}, {sign}({amount}) || ' {modifier}')"
+
+
+def _timestampdiff(unit, start, end):
+    unit = unit.upper()
+    if unit in _DAY_FRACTIONS:
+        return f"CAST((julianday({end}) - julianday({start})) * {_DAY_FRACTIONS[unit]} AS INTEGER)"
+    if unit in ('MONTH', 'YEAR'):
+        months = (f"((strftime('%Y', {end}) - strftime('%Y', {start})) * 12"
+                  f" + strftime('%m', {end}) - strftime('%m', {start})"
+                  f" - (strftime('%d%H%M%S', {end}) < strftime('%d%H%M%S', {start})))")
+        return months if unit == 'MONTH' else f"({months} / 12)"
+    raise ValueError(f"Unsupported TIMESTAMPDIFF unit {unit!r}")
+
+
+def _date_format(expr, fmt):
+    if not (fmt.startswith("'") and fmt.endswith("'")):
+        raise ValueError("DATE_FORMAT needs a literal format string on SQLite")
+
+    def specifier(match):
+        try:
+            return _FORMAT_SPECIFIERS[match.group(0)]
+        except KeyError:
+            raise ValueError(f"DATE_FORMAT specifier {match.group(0)} is not supported on SQLite")
+
+    return f"strftime({re.sub(r'%.', specifier, fmt)}, {expr})"
+
+
+# MySQL functions the routes use, as SQLite expressions built from the
+# already translated arguments
+_FUNCTIONS = {
+    'NOW': lambda args: _NOW,
+    'CURDATE': lambda args: _TODAY,
+    'DATE_ADD': lambda args: _interval(args[0], args[1], ''),
+    'DATE_SUB': lambda args: _interval(args[0], args[1], '-'),
+    'TIMESTAMPDIFF': lambda args: _timestampdiff(*args),
+    'DATE_FORMAT': lambda args: _date_format(*args),
+    'YEAR': lambda args: f"CAST(strftime('%Y', {args[0]}) AS INTEGER)",
+    'MONTH': lambda args: f"CAST(strftime('%m', {args[0]}) AS INTEGER)",
+    'CONCAT': lambda args: '(' + ' || '.join(args) + ')',
+}
+
+
+def _render(tokens, pos, stop):
+    """Translate tokens from ``pos`` up to the first unnested token in ``stop``"""
+    parts = []
+    while pos < len(tokens):
+        token = tokens[pos]
+        if token in stop:
+            break
+        if token == '(':
+            inner, pos = _render(tokens, pos + 1, (')',))
+            parts.append('(' + inner + ')')
+            pos += 1
+            continue
+        if token == '%s':
+            parts.append('?')
+        elif token.startswith('%('):
+            parts.append(':' + token[2:-2])
+        elif token.upper() in _FUNCTIONS:
+            after = pos + 1
+            while after < len(tokens) and tokens[after].isspace():
+                after += 1
+            if after < len(tokens) and tokens[after] == '(':
+                args, pos = [], after + 1
+                while True:
+                    arg, pos = _render(tokens, pos, (',', ')'))
+                    args.append(arg.strip())
+                    if pos >= len(tokens) or tokens[pos] == ')':
+                        break
+                    pos += 1
+                parts.append(_FUNCTIONS[token.upper()](args))
+                pos += 1
+                continue
+            parts.append(token)
+        else:
+            parts.append(token)
+        pos += 1
+    return ''.join(parts), pos
+
+
+@lru_cache(maxsize=1024)
+def translate_sql(sql):
+    """Rewrite a MySQL statement as used by the routes into SQLite.
+
+    Handles %s / %(name)s placeholders, NOW(), CURDATE(), DATE_ADD/DATE_SUB
+    with INTERVAL, TIMESTAMPDIFF, DATE_FORMAT, YEAR, MONTH, CONCAT and
+    ON DUPLICATE KEY UPDATE. String literals are left untouched.
+    """
+    translated, _ = _render(_TOKEN.findall(sql), 0, ())
+    return re.sub(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", 'ON CONFLICT DO UPDATE SET', translated, flags=re.I)
+
+
+def translate_schema(ddl):
+    """Turn a mysqldump-style schema into SQLite CREATE TABLE/INDEX statements"""
+    ddl = re.sub(r"/\*!.*?\*/", '', ddl, flags=re.S)
+    statements = []
+    for statement in ddl.split(';'):
+        statement = statement.strip()
+        match = re.match(r"CREATE TABLE\s+`?(\w+)`?\s*\((.*)\)", statement, re.S | re.I)
+        if not match:
+            continue
+        table, body = match.groups()
+        lines = [line.strip().rstrip(',') for line in body.strip().splitlines() if line.strip()]
+        primary = [line for line in lines if line.upper().startswith('PRIMARY KEY')]
+        primary_columns = re.findall(r"`(\w+)`", primary[0]) if primary else []
+        columns, indexes = [], []
+        for line in lines:
+            upper = line.upper()
+            if upper.startswith('PRIMARY KEY'):
+                if not any('AUTO_INCREMENT' in c.upper() for c in lines):
+                    columns.append(line)
+            elif upper.startswith('UNIQUE KEY'):
+                columns.append('UNIQUE ' + line[line.index('('):])
+            elif upper.startswith('KEY') or upper.startswith('INDEX'):
+                name, cols = re.match(r"\w+\s+`?(\w+)`?\s*(\(.*\))", line).groups()
+                # SQLite index names are global rather than per table
+                if not name.startswith('idx_'):
+                    name = f"idx_{table}_{name}"
+                indexes.append(f"CREATE INDEX `{name}` ON `{table}` {cols}")
+            elif upper.startswith('CONSTRAINT'):
+                columns.append(line)
+            else:
+                columns.append(_column(line, primary_columns))
+        statements.append(f"CREATE TABLE `{table}` (\n  " + ',\n  '.join(columns) + "\n)")
+        statements.extend(indexes)
+    return statements
+
+
+def _column(line, primary_columns):
+    name = re.match(r"`?(\w+)`?", line).group(1)
+    line = re.sub(r"\s+(CHARACTER SET|COLLATE)\s+\w+", '', line, flags=re.I)
+    line = re.sub(r"\s+ON UPDATE CURRENT_TIMESTAMP", '', line, flags=re.I)
+    line = re.sub(r"DEFAULT CURRENT_TIMESTAMP", f"DEFAULT ({_NOW})", line, flags=re.I)
+    if 'AUTO_INCREMENT' in line.upper() and primary_columns == [name]:
+        return f"`{name}` INTEGER PRIMARY KEY AUTOINCREMENT"
+    enum = re.search(r"\benum\((.*?)\)", line, re.I)
+    if enum:
+        line = line[:enum.start()] + 'text' + line[enum.end():] + f" CHECK (`{name}` IN ({enum.group(1)}))"
+    return line
+
+
+def _adapt_param(value):
+    # MySQL stores '2025-01-31T18:00' as a DATETIME; keep the canonical form
+    # so SQLite's text comparisons and the converters above still work
+    if isinstance(value, str) and _ISO_DATETIME.match(value):
+        return value.replace('T', ' ', 1)
+    return value
+
+
+def _adapt_params(params):
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return {key: _adapt_param(value) for key, value in params.items()}
+    return tuple(_adapt_param(value) for value in params)
+
+
+def _translate_error(e):
+    """Raise the mysql.connector error the routes would have seen from MySQL"""
+    message = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        if 'UNIQUE' in message:
+            errno = 1062
+        elif 'FOREIGN KEY' in message:
+            errno = 1452
+        elif 'CHECK' in message:
+            errno = 3819
+        else:
+            errno = 1048
+        return mysql_errors.IntegrityError(msg=message, errno=errno)
+    if isinstance(e, sqlite3.OperationalError) and ('locked' in message or 'busy' in message):
+        # Treated like a lock wait timeout, so run_transaction() retries it
+        return mysql_errors.DatabaseError(msg=message, errno=1205)
+    if isinstance(e, sqlite3.OperationalError):
+        return mysql_errors.ProgrammingError(msg=message)
+    return mysql_errors.DatabaseError(msg=message)
+
+
+class SQLiteCursor:
+    """sqlite3 cursor with the mysql.connector cursor interface the routes use"""
+
+    def __init__(self, cnx, dictionary=False):
+        self._cursor = cnx.cursor()
+        self._dictionary = dictionary
+        self._rowcount = -1
+        self.column_names = ()
+
+    @property
+    def rowcount(self):
+        return self._rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, operation, params=None, multi=False):
+        try:
+            self._cursor.execute(translate_sql(operation), _adapt_params(params))
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+        description = self._cursor.description
+        self.column_names = tuple(column[0] for column in description) if description else ()
+        # Like an unbuffered MySQL cursor: rows are counted as they are fetched
+        self._rowcount = 0 if description else self._cursor.rowcount
+
+    def _rows(self, rows):
+        self._rowcount += len(rows)
+        if self._dictionary:
+            columns = self.column_names
+            return [dict(zip(columns, row)) for row in rows]
+        return rows
+
+    def fetchone(self):
+        rows = self._rows(self._cursor.fetchmany(1))
+        return rows[0] if rows else None
+
+    def fetchmany(self, size=1):
+        return self._rows(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return self._rows(self._cursor.fetchall())
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """sqlite3 connection with the mysql.connector connection interface.
+
+    Runs in autocommit mode like the MySQL pool; start_transaction() opens an
+    explicit transaction that commit()/rollback() end.
+    """
+
+    def __init__(self, cnx):
+        self._cnx = cnx
+        self._closed = False
+
+    @property
+    def in_transaction(self):
+        return self._cnx.in_transaction
+
+    def cursor(self, buffered=None, raw=None, prepared=None, cursor_class=None,
+               dictionary=None, named_tuple=None):
+        # sqlite3 keeps its own cache of compiled statements, so prepared
+        # cursors are plain cursors here
+        return SQLiteCursor(self._cnx, dictionary=bool(dictionary))
+
+    def start_transaction(self, consistent_snapshot=False, isolation_level=None, readonly=None):
+        # Take the write lock up front instead of failing on upgrade later
+        self._cnx.execute('BEGIN IMMEDIATE')
+
+    def commit(self):
+        if self._cnx.in_transaction:
+            self._cnx.execute('COMMIT')
+
+    def rollback(self):
+        if self._cnx.in_transaction:
+            self._cnx.execute('ROLLBACK')
+
+    def is_connected(self):
+        return not self._closed
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        try:
+            self._cnx.execute('SELECT 1')
+        except sqlite3.Error as e:
+            raise mysql_errors.InterfaceError(msg=str(e)) from e
+
+    def close(self):
+        self._closed = True
+        self._cnx.close()
+
+
+class SQLiteDatabase:
+    """An embedded SQLite database standing in for the MySQL server.
+
+    The schema is loaded from schema.sql the first time a fresh database file
+    is opened. ``path=':memory:'`` keeps the database in shared memory for as
+    long as this object lives.
+    """
+
+    def __init__(self, path, schema_path=SCHEMA_PATH):
+        self._schema_path = schema_path
+        self._lock = threading.Lock()
+        self._ready = False
+        # Holds a shared in-memory database open between pooled connections
+        self._anchor = None
+        if path == ':memory:':
+            self._target, self._uri = f"file:gym-{id(self)}?mode=memory&cache=shared", True
+        else:
+            self._target, self._uri = path, False
+
+    def connect(self):
+        with self._lock:
+            if not self._ready:
+                cnx = self._open()
+                self._load_schema(cnx)
+                if self._uri:
+                    self._anchor = cnx
+                else:
+                    cnx.close()
+                self._ready = True
+        return SQLiteConnection(self._open())
+
+    def close(self):
+        if self._anchor is not None:
+            self._anchor.close()
+            self._anchor = None
+
+    def _open(self):
+        cnx = sqlite3.connect(
+            self._target,
+            uri=self._uri,
+            timeout=10,
+            isolation_level=None,
+            check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES
+        )
+        cnx.execute('PRAGMA foreign_keys = ON')
+        return cnx
+
+    def _load_schema(self, cnx):
+        if cnx.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]:
+            return
+        if not self._uri:
+            cnx.execute('PRAGMA journal_mode = WAL')
+        with open(self._schema_path) as f:
+            statements = translate_schema(f.read())
+        cnx.execute('BEGIN')
+        for statement in statements:
+            cnx.execute(statement)
+        cnx.execute('COMMIT')
+        logger.info(f"Loaded {len(statements)} schema statements into SQLite")
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+from mysql.connector.connection import MySQLConnection
+from mysql.connector.cursor import MySQLCursorPrepared
+from config import DB_POOL_CONFIG
+from db_pool import PooledConnection
+from db_queries import record_query
+
+
+class ReusablePreparedCursor(MySQLCursorPrepared):
+    """Prepared cursor that re-executes its statement in a single round trip.
+
+    Connector/Python sends COM_STMT_RESET before every execution. A reset is
+    only needed after sending long data or opening a server-side cursor, and
+    this cursor does neither, so repeat executions skip it.
+    """
+
+    def execute(self, operation, params=None, multi=False):
+        if self._prepared is None or operation != self._executed:
+            return super().execute(operation, params)
+        result = self._connection.cmd_stmt_execute(
+            self._prepared['statement_id'],
+            data=params or (),
+            parameters=self._prepared['parameters']
+        )
+        self._handle_result(result)
+
+
+class StatementCache:
+    """LRU of prepared cursors for one connection, keyed by SQL text.
+
+    The cache lives on the PooledConnection, so it is dropped together with
+    its statements whenever the pool closes or recycles the connection.
+    """
+
+    def __init__(self, cnx, maxsize):
+        self._cnx = cnx
+        self._maxsize = maxsize
+        self._cursors = OrderedDict()
+        # Skipping the reset relies on the pure-Python protocol classes. The C
+        # extension's connection (and the SQLite stand-in) get their own
+        # prepared cursor, which still prepares each statement only once.
+        if isinstance(cnx, MySQLConnection):
+            self._cursor_options = {'cursor_class': ReusablePreparedCursor}
+        else:
+            self._cursor_options = {'prepared': True}
+
+    def cursor(self, sql):
+        cursor = self._cursors.get(sql)
+        if cursor is not None:
+            self._cursors.move_to_end(sql)
+            _stats.record(hit=True)
+            return cursor
+        _stats.record(hit=False)
+        cursor = self._cnx.cursor(**self._cursor_options)
+        self._cursors[sql] = cursor
+        if len(self._cursors) > self._maxsize:
+            _, evicted = self._cursors.popitem(last=False)
+            evicted.close()
+        return cursor
+
+    def __len__(self):
+        return len(self._cursors)
+
+
+class _StatementStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.prepares = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.prepares += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {'hits': self.hits, 'prepares': self.prepares}
+
+
+_stats = _StatementStats()
+
+
+def statement_stats():
+    """Prepared statement cache hits and prepares in this worker"""
+    return _stats.snapshot()
+
+
+def query_prepared(conn, sql, params=(), dictionary=False):
+    """Run ``sql`` as a server-side prepared statement and return every row.
+
+    The statement is prepared once per pooled connection and reused on later
+    calls, so MySQL skips parsing it. Use it for hot statements with a fixed
+    SQL text. Rows come back fully read, as tuples, or as dicts when
+    ``dictionary`` is set. The binary protocol returns DECIMAL values as
+    strings, so keep money columns on ordinary cursors.
+    """
+    start = time.perf_counter()
+    if isinstance(conn, PooledConnection):
+        if conn.statements is None:
+            conn.statements = StatementCache(conn._cnx, DB_POOL_CONFIG['statement_cache_size'])
+        cursor = conn.statements.cursor(sql)
+        cursor.execute(sql, tuple(params))
+        rows = cursor.fetchall()
+    else:
+        cursor = conn.cursor(prepared=True)
+        try:
+            cursor.execute(sql, tuple(params))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    record_query(sql, params, time.perf_counter() - start, len(rows))
+
+    if dictionary:
+        columns = cursor.column_names
+        return [dict(zip(columns, row)) for row in rows]
+    return rows
@@ -0,0 +1,118 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+import mysql.connector
+from config import TRANSACTION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# MySQL errors after which rerunning the whole transaction can succeed
+RETRYABLE_ERRORS = {
+    1213: 'deadlocks',
+    1205: 'lock_wait_timeouts',
+}
+
+
+class _TransactionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {
+            'committed': 0,
+            'rolled_back': 0,
+            'retries': 0,
+            'deadlocks': 0,
+            'lock_wait_timeouts': 0,
+            'retries_exhausted': 0,
+        }
+
+    def increment(self, counter):
+        with self._lock:
+            self.counts[counter] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+_stats = _TransactionStats()
+
+
+def transaction_stats():
+    """Commit, rollback and retry counters for this worker"""
+    return _stats.snapshot()
+
+
+@contextmanager
+def transaction(conn, dictionary=False):
+    """Run the block in an explicit transaction and yield a cursor.
+
+    Pooled connections run in autocommit mode, so statements outside this
+    block commit one at a time. Inside it they commit together when the block
+    exits, or are rolled back if it raises. Nested blocks on the same
+    connection become savepoints, so an inner failure only undoes the inner
+    block's statements.
+    """
+    depth = getattr(conn, 'tx_depth', 0)
+    cursor = conn.cursor(dictionary=dictionary)
+    savepoint = f"sp_{depth}"
+    if depth == 0:
+        conn.start_transaction()
+    else:
+        cursor.execute(f"SAVEPOINT {savepoint}")
+    conn.tx_depth = depth + 1
+    try:
+        yield cursor
+        conn.tx_depth = depth
+        if depth == 0:
+            conn.commit()
+            _stats.increment('committed')
+        else:
+            cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+    except BaseException:
+        conn.tx_depth = depth
+        try:
+            if depth == 0:
+                conn.rollback()
+                _stats.increment('rolled_back')
+            else:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+        except mysql.connector.Error as e:
+            # A deadlock has already rolled back the whole transaction,
+            # taking its savepoints with it
+            logger.debug(f"Rollback after failed transaction block: {e}")
+        raise
+    finally:
+        cursor.close()
+
+
+def run_transaction(conn, work, dictionary=False):
+    """Call ``work(cursor)`` in a transaction and return its result.
+
+    On a deadlock or lock wait timeout the transaction is rolled back and
+    ``work`` is run again from the start, after a jittered exponential
+    backoff, up to TRANSACTION_CONFIG['max_retries'] times. ``work`` must
+    therefore only change state through the cursor. Inside an enclosing
+    transaction the error is re-raised instead, so the outermost
+    run_transaction retries the whole unit.
+    """
+    attempt = 0
+    while True:
+        try:
+            with transaction(conn, dictionary=dictionary) as cursor:
+                return work(cursor)
+        except mysql.connector.Error as e:
+            if e.errno not in RETRYABLE_ERRORS or getattr(conn, 'tx_depth', 0) > 0:
+                raise
+            _stats.increment(RETRYABLE_ERRORS[e.errno])
+            if attempt >= TRANSACTION_CONFIG['max_retries']:
+                _stats.increment('retries_exhausted')
+                raise
+            attempt += 1
+            _stats.increment('retries')
+            backoff = min(TRANSACTION_CONFIG['max_backoff'],
+                          TRANSACTION_CONFIG['base_backoff'] * 2 ** (attempt - 1))
+            delay = random.uniform(backoff / 2, backoff)
+            logger.warning(f"Transaction failed with MySQL error {e.errno}; retry {attempt} in {delay:.3f}s")
+            time.sleep(delay)
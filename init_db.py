@@ -121,6 +121,10 @@ def create_class_bookings(cursor, member_id):
             INSERT INTO class_bookings (member_id, class_id)
             VALUES (%s, %s)
         """, (member_id, class_id))
+        cursor.execute(
+            "UPDATE classes SET booked_count = booked_count + 1 WHERE id = %s",
+            (class_id,)
+        )
     
     if cursor.rowcount > 0:
         print(f"✅ Created new class bookings for user ID: {member_id}")
@@ -1,19 +1,38 @@
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, g
 import jwt
-from config import SECRET_KEY
+from config import SECRET_KEY, USER_CACHE_CONFIG, TOKEN_CACHE_CONFIG
 from functools import wraps
-from db import get_db
+from db import get_db, PoolTimeoutError, query_prepared
 import time
+import hashlib
 import logging
 from datetime import datetime, timedelta, timezone
 import mysql.connector
+from collections import namedtuple
+from cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# User records looked up on every authenticated request, keyed by user id.
+# Endpoints that change a user's role, membership or account must call
+# invalidate_user() so a stale record is never served past the change.
+user_cache = TTLCache(maxsize=USER_CACHE_CONFIG['max_size'], ttl=USER_CACHE_CONFIG['ttl'])
+
+# Claims of tokens whose signature has already been checked, keyed by the
+# SHA-256 digest of the token and kept until the token's own expiry.
+token_cache = TTLCache(maxsize=TOKEN_CACHE_CONFIG['max_size'])
+
 class AuthenticationError(Exception):
     """Custom exception for authentication errors"""
     pass
 
+# Access levels an endpoint can declare
+PUBLIC = 'public'
+AUTHENTICATED = 'authenticated'
+ROLE_RESTRICTED = 'role'
+
+AccessPolicy = namedtuple('AccessPolicy', ['level', 'roles'])
+
 def create_token(user_data, expiry_hours=24):
     """Create a JWT token with basic claims"""
     try:
@@ -74,6 +93,26 @@ def create_refresh_token(user_data, expiry_days=7):
         logger.error(f"Refresh token creation failed: {str(e)}")
         raise AuthenticationError(f"Failed to create refresh token: {str(e)}")
 
+def decode_token(token):
+    """Decode a JWT, verifying its signature at most once per worker.
+
+    Raises the same jwt exceptions as jwt.decode. A cached token is still
+    rejected once its exp claim has passed.
+    """
+    key = hashlib.sha256(token.encode('utf-8')).digest()
+    now = time.time()
+    claims = token_cache.get(key)
+    if claims is not None:
+        if claims['exp'] <= now:
+            token_cache.delete(key)
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        return dict(claims)
+
+    claims = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    if isinstance(claims.get('exp'), (int, float)):
+        token_cache.set(key, claims, ttl=claims['exp'] - now)
+    return dict(claims)
+
 def verify_token(token):
     """Verify and decode JWT token"""
     try:
@@ -81,11 +120,7 @@ def verify_token(token):
             raise AuthenticationError("No token provided")
 
         # Decode and verify the token
-        decoded = jwt.decode(
-            token,
-            SECRET_KEY,
-            algorithms=["HS256"]
-        )
+        decoded = decode_token(token)
 
         # Validate token structure
         required_fields = ['user_id', 'email', 'role', 'exp', 'iat']
@@ -94,9 +129,7 @@ def verify_token(token):
             raise AuthenticationError(f"Invalid token structure: missing {', '.join(missing_fields)}")
 
         # Check expiration
-        exp_timestamp = decoded['exp']
-        current_timestamp = int(datetime.now(timezone.utc).timestamp())
-        if exp_timestamp < current_timestamp:
+        if decoded['exp'] < int(time.time()):
             raise AuthenticationError("Token has expired")
 
         return decoded
@@ -109,20 +142,72 @@ def verify_token(token):
         logger.error(f"Token verification failed: {str(e)}")
         raise AuthenticationError(f"Token verification failed: {str(e)}")
 
+# Prepared once per connection; runs on every user cache miss
+USER_QUERY = """
+    SELECT id, email, role, membership_expiry, auto_payment
+    FROM users
+    WHERE id = %s
+"""
+
 def get_user_data(user_id):
-    with get_db() as conn:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id, email, role, membership_expiry, auto_payment
-            FROM users
-            WHERE id = %s
-        """, (user_id,))
-        user = cursor.fetchone()
-        cursor.close()
-        return user
+    user = user_cache.get(user_id)
+    if user is None:
+        with get_db() as conn:
+            rows = query_prepared(conn, USER_QUERY, (user_id,), dictionary=True)
+        user = rows[0] if rows else None
+        if user is None:
+            return None
+        user_cache.set(user_id, user)
+    # Callers may modify the record, so never hand out the cached dict itself
+    return dict(user)
 
+def invalidate_user(user_id):
+    """Drop a user's cached record after their row in users changes"""
+    user_cache.delete(user_id)
 
-# [Previous functions: create_token, create_refresh_token, verify_token, get_user_data unchanged]
+
+def public(f):
+    """Mark a view as reachable without authentication"""
+    f.access_policy = PUBLIC
+    return f
+
+def require_roles(*roles):
+    """Record the roles a view is restricted to in its access policy.
+
+    Role decorators such as admin_required apply this to their wrapper;
+    functools.wraps then carries the attribute up through authenticate.
+    """
+    def mark(f):
+        f.access_roles = frozenset(roles)
+        return f
+    return mark
+
+def compile_access_policies(app):
+    """Resolve every registered endpoint to its AccessPolicy.
+
+    Views marked @public are public, views carrying role restrictions are
+    role-restricted, and everything else requires authentication.
+    """
+    policies = {}
+    for endpoint, view in app.view_functions.items():
+        roles = getattr(view, 'access_roles', None)
+        if endpoint == 'static' or getattr(view, 'access_policy', None) == PUBLIC:
+            policies[endpoint] = AccessPolicy(PUBLIC, None)
+        elif roles:
+            policies[endpoint] = AccessPolicy(ROLE_RESTRICTED, roles)
+        else:
+            policies[endpoint] = AccessPolicy(AUTHENTICATED, None)
+    return policies
+
+def access_policy_report(policies):
+    """Render the compiled policy table, one endpoint per line"""
+    width = max((len(endpoint) for endpoint in policies), default=0)
+    lines = []
+    for endpoint in sorted(policies):
+        policy = policies[endpoint]
+        roles = f" ({', '.join(sorted(policy.roles))})" if policy.roles else ''
+        lines.append(f"{endpoint.ljust(width)}  {policy.level}{roles}")
+    return "\n".join(lines)
 
 def authenticate(f):
     @wraps(f)
@@ -139,12 +224,19 @@ def authenticate(f):
             token = request.cookies.get('token')
         if not token:
             return jsonify({'error': 'Authentication token is missing'}), 401
+
+        # before_request already verified this token and loaded its user
+        if token == g.get('auth_token') and g.get('current_user'):
+            kwargs['user'] = dict(g.current_user)
+            return f(*args, **kwargs)
+
         try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+            data = decode_token(token)
             user_id = data['user_id']
             user_data = get_user_data(user_id)
             if not user_data:
                 return jsonify({'error': 'Authentication failed: User not found'}), 401
+            g.current_user = user_data
             # Pass user_data as a keyword argument
             kwargs['user'] = user_data
             return f(*args, **kwargs)
@@ -152,12 +244,17 @@ def authenticate(f):
             return jsonify({'error': 'Authentication failed: Token has expired'}), 401
         except jwt.InvalidTokenError as e:
             return jsonify({'error': f'Authentication failed: Invalid token: {str(e)}'}), 401
+        except PoolTimeoutError:
+            # A busy pool is not an authentication failure; let the 503 handler answer
+            raise
         except Exception as e:
             return jsonify({'error': f'Authentication failed: {str(e)}'}), 401
+    decorated.access_policy = AUTHENTICATED
     return decorated
 
 
 def admin_required(f):
+    @require_roles('admin')
     @wraps(f)
     def wrapper(*args, **kwargs):
         user_data = kwargs.get('user')
@@ -170,6 +267,7 @@ def admin_required(f):
     return wrapper
 
 def member_required(f):
+    @require_roles('member', 'admin')
     @wraps(f)
     def wrapper(user, *args, **kwargs):
         if not user:
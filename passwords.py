@@ -0,0 +1,48 @@
+import bcrypt
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from config import PASSWORD_HASH_CONFIG
+
+logger = logging.getLogger(__name__)
+
+ROUNDS = PASSWORD_HASH_CONFIG['rounds']
+
+# bcrypt releases the GIL, so a small pool of threads keeps hashing off the
+# request threads while the cap stops a login storm from taking every core.
+_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_CONFIG['max_concurrency'],
+    thread_name_prefix='bcrypt'
+)
+_slots = threading.BoundedSemaphore(
+    PASSWORD_HASH_CONFIG['max_concurrency'] + PASSWORD_HASH_CONFIG['max_queue']
+)
+
+class PasswordHashingBusyError(Exception):
+    """Raised when too many hash operations are already queued"""
+    pass
+
+def _run(func, *args):
+    if not _slots.acquire(timeout=PASSWORD_HASH_CONFIG['queue_timeout']):
+        raise PasswordHashingBusyError("Too many password operations in progress")
+    try:
+        return _executor.submit(func, *args).result()
+    finally:
+        _slots.release()
+
+def hash_password(password):
+    """Hash a password with the configured bcrypt cost, returning a str"""
+    hashed = _run(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(rounds=ROUNDS))
+    return hashed.decode('utf-8')
+
+def check_password(password, hashed):
+    """Check a password against a stored bcrypt hash"""
+    return _run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+def needs_rehash(hashed):
+    """True if a stored hash was made with a different cost than configured"""
+    try:
+        return int(hashed.split('$')[2]) != ROUNDS
+    except (IndexError, ValueError):
+        logger.warning("Stored password hash has an unrecognised format")
+        return False
@@ -0,0 +1,148 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from limits.storage import Storage
+
+try:
+    import fcntl
+except ImportError:  # Windows: counters are shared between threads only
+    fcntl = None
+
+# One slot per counter: key hash, window expiry (epoch seconds), count
+_SLOT = struct.Struct('<QdQ')
+# Slots examined per lookup; a full window evicts the counter expiring soonest
+_PROBE = 8
+
+
+class SharedMemoryStorage(Storage):
+    """Fixed-window rate limit counters in a memory-mapped file.
+
+    Every worker process on the host maps the same file, so limits hold across
+    gunicorn workers without a network round-trip. Updates take a process-wide
+    flock on the file, which keeps a hit to a few microseconds. The table has a
+    fixed number of slots; when the slots a key hashes to are all live, the one
+    closest to expiry is reused.
+
+    Configured with ``storage_uri="shm:///path/to/file"``. Only the fixed
+    window strategy is supported.
+    """
+
+    STORAGE_SCHEME = ['shm']
+
+    def __init__(self, uri=None, slots=65536, **options):
+        super().__init__(uri, **options)
+        path = urlparse(uri).path if uri else ''
+        self._path = path or os.path.join(tempfile.gettempdir(), 'gym-rate-limits')
+        self._slots = int(slots)
+        self._pid = None
+        self._fd = None
+        self._map = None
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        h = _hash(key)
+        now = time.time()
+        with self._locked() as mm:
+            offset, count, expires_at = self._find(mm, h)
+            if count is None or expires_at <= now:
+                count, expires_at = 0, now + expiry
+            count += amount
+            if elastic_expiry:
+                expires_at = now + expiry
+            _SLOT.pack_into(mm, offset, h, expires_at, count)
+            return count
+
+    def get(self, key):
+        h = _hash(key)
+        now = time.time()
+        with self._locked() as mm:
+            _, count, expires_at = self._find(mm, h)
+            return count if count is not None and expires_at > now else 0
+
+    def get_expiry(self, key):
+        h = _hash(key)
+        now = time.time()
+        with self._locked() as mm:
+            _, count, expires_at = self._find(mm, h)
+            return expires_at if count is not None and expires_at > now else now
+
+    def check(self):
+        try:
+            self._mapped()
+            return True
+        except OSError:
+            return False
+
+    def reset(self):
+        with self._locked() as mm:
+            mm[:] = bytes(len(mm))
+        return None
+
+    def clear(self, key):
+        with self._locked() as mm:
+            offset, count, _ = self._find(mm, _hash(key))
+            if count is not None:
+                _SLOT.pack_into(mm, offset, 0, 0.0, 0)
+
+    def _find(self, mm, h):
+        """Locate the slot for key hash ``h``.
+
+        Returns ``(offset, count, expiry)`` for an existing counter, or the
+        offset of a slot to reuse with ``count`` set to None.
+        """
+        start = h % self._slots
+        victim, victim_expiry = None, None
+        for i in range(_PROBE):
+            offset = ((start + i) % self._slots) * _SLOT.size
+            slot_hash, expires_at, count = _SLOT.unpack_from(mm, offset)
+            if slot_hash == h:
+                return offset, count, expires_at
+            if victim is None or expires_at < victim_expiry:
+                victim, victim_expiry = offset, expires_at
+        return victim, None, 0.0
+
+    @contextmanager
+    def _locked(self):
+        mm = self._mapped()
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield mm
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _mapped(self):
+        # A descriptor inherited across fork shares its flock with the parent,
+        # so each worker opens the file for itself.
+        if self._pid == os.getpid():
+            return self._map
+        with self._open_lock:
+            if self._pid != os.getpid():
+                size = self._slots * _SLOT.size
+                fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                self._fd = fd
+                self._map = mmap.mmap(fd, size)
+                self._lock = threading.Lock()
+                self._pid = os.getpid()
+        return self._map
+
+
+def _hash(key):
+    # Python's hash() is salted per process, so use a stable digest instead
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
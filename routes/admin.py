@@ -1,10 +1,19 @@
-from flask import Blueprint, jsonify, request, current_app
-from db import get_db
-from middleware import authenticate, admin_required
+from flask import Blueprint, jsonify, request, current_app, g
+from db import get_db, db_manager, statement_stats, transaction_stats, query_stats
+from db_rows import fetch_rowset, rowset_response, stream_rows_response
+from middleware import authenticate, admin_required, invalidate_user, user_cache, token_cache
+from schedule_index import schedule_index
+from routes.classes import class_listing_args, encode_cursor
 from datetime import datetime, timedelta
 
 admin_bp = Blueprint("admin", __name__)
 
+@admin_bp.before_request
+def read_from_replica():
+    """Admin pages are reports and lists; send their reads to the replica"""
+    if request.method == 'GET':
+        g.db_readonly = True
+
 # 🔹 Get system overview
 @admin_bp.route("/admin/overview", methods=["GET"])
 @authenticate
@@ -71,25 +80,62 @@ def get_system_overview(user):
 @admin_required
 def manage_classes(user):
     with get_db() as conn:
-        cursor = conn.cursor(dictionary=True)
-        
         if request.method == "GET":
-            # Get all classes with trainer info and booking counts
-            cursor.execute("""
+            try:
+                listing = class_listing_args(request.args)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+            conditions, params = [], []
+            if listing.start:
+                conditions.append("c.schedule_time >= %s")
+                params.append(listing.start)
+            if listing.end:
+                conditions.append("c.schedule_time < %s")
+                params.append(listing.end)
+            if listing.trainer_id:
+                conditions.append("c.trainer_id = %s")
+                params.append(listing.trainer_id)
+            if listing.after:
+                # Keyset page: a range scan on (schedule_time, id) from the
+                # cursor, however deep into the list it is
+                after_time, after_id = listing.after
+                conditions.append("(c.schedule_time > %s OR (c.schedule_time = %s AND c.id > %s))")
+                params.extend([after_time, after_time, after_id])
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            limit = ""
+            if listing.limit:
+                # One extra row tells whether there is a next page
+                limit = "LIMIT %s"
+                params.append(listing.limit + 1)
+
+            cursor = conn.cursor()
+            # Classes with trainer info and booking counts
+            cursor.execute(f"""
                 SELECT c.*, 
                        t.name as trainer_name,
-                       COUNT(cb.id) as current_bookings
+                       c.booked_count as current_bookings
                 FROM classes c
                 LEFT JOIN users t ON c.trainer_id = t.id
-                LEFT JOIN class_bookings cb ON c.id = cb.class_id
-                GROUP BY c.id
-                ORDER BY c.schedule_time ASC
-            """)
-            classes = cursor.fetchall()
+                {where}
+                ORDER BY c.schedule_time ASC, c.id ASC
+                {limit}
+            """, params)
+            classes = fetch_rowset(cursor)
             cursor.close()
-            return jsonify(classes)
+
+            next_cursor = None
+            if listing.limit and len(classes.rows) > listing.limit:
+                classes.rows = classes.rows[:listing.limit]
+                last = classes.rows[-1]
+                next_cursor = encode_cursor(classes.value(last, 'schedule_time'), classes.value(last, 'id'))
+            response = rowset_response(classes)
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+            return response
             
         else:  # POST
+            cursor = conn.cursor(dictionary=True)
             data = request.json
             required_fields = ["class_name", "trainer_id", "schedule_time", "capacity"]
             
@@ -105,6 +151,7 @@ def manage_classes(user):
             
             conn.commit()
             cursor.close()
+            schedule_index.classes_changed()
             return jsonify({"message": "Class created successfully"})
 
 # 🔹 Get class roster
@@ -132,16 +179,14 @@ def get_class_roster(user, class_id):
 @admin_required
 def get_users(user):
     with get_db() as conn:
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
         cursor.execute("""
             SELECT id, name, email, role, membership_expiry, auto_payment
             FROM users
             WHERE role IN ('member', 'non_member')
             ORDER BY name
         """)
-        users = cursor.fetchall()
-        cursor.close()
-        return jsonify(users)
+        return stream_rows_response(cursor)
 
 # 🔹 Update user role
 @admin_bp.route("/admin/users/<int:user_id>/role", methods=["PUT"])
@@ -177,6 +222,7 @@ def update_user_role(user, user_id):
         
         conn.commit()
         cursor.close()
+        invalidate_user(user_id)
         return jsonify({"message": f"Role updated successfully to {new_role}", "old_role": current_role, "new_role": new_role})
 
 # 🔹 Delete user
@@ -199,6 +245,7 @@ def delete_user(user, user_id):
         cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
         conn.commit()
         cursor.close()
+        invalidate_user(user_id)
         
         return jsonify({"message": "User deleted successfully"})
 
@@ -275,15 +322,14 @@ def get_payment_report(user):
 @admin_required
 def get_equipment_reports(user):
     with get_db() as conn:
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
         cursor.execute("""
             SELECT er.id, er.equipment_name, er.issue_description, er.reported_at, u.name AS reporter_name
             FROM equipment_reports er
             JOIN users u ON er.user_id = u.id
             ORDER BY er.reported_at DESC
         """)
-        reports = cursor.fetchall()
-        return jsonify(reports)
+        return stream_rows_response(cursor)
 
 # Get membership statistics
 @admin_bp.route("/admin/membership-stats", methods=["GET"])
@@ -405,6 +451,7 @@ def update_employee_role(user, employee_id):
         
         conn.commit()
         cursor.close()
+        invalidate_user(employee_id)
         return jsonify({"message": f"Role updated successfully to {new_role}", "old_role": current_role, "new_role": new_role})
 
 # Delete employee
@@ -427,5 +474,23 @@ def delete_employee(user, employee_id):
         cursor.execute("DELETE FROM users WHERE id = %s", (employee_id,))
         conn.commit()
         cursor.close()
+        invalidate_user(employee_id)
         return jsonify({"message": "Employee deleted successfully"})
 
+# Connection pool and cache statistics for this worker
+@admin_bp.route("/admin/db-stats", methods=["GET"])
+@authenticate
+@admin_required
+def get_db_stats(user):
+    return jsonify({
+        "pool": db_manager.pool_stats(),
+        "circuit_breaker": db_manager.breaker_stats(),
+        "replica": db_manager.replica_stats(),
+        "tunnels": db_manager.tunnel_stats(),
+        "prepared_statements": statement_stats(),
+        "transactions": transaction_stats(),
+        "queries": query_stats(),
+        "user_cache": user_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "schedule_index": schedule_index.stats()
+    })
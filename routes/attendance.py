@@ -1,10 +1,16 @@
 from flask import Blueprint, jsonify, request
 from middleware import authenticate
-from db import get_db
+from db import get_db, query_prepared
 from datetime import datetime, timedelta
 
 attendance_bp = Blueprint("attendance", __name__)
 
+# Prepared once per connection; runs on every check-in
+OPEN_CHECK_IN_QUERY = """
+    SELECT id FROM attendance
+    WHERE member_id = %s AND check_out_time IS NULL
+"""
+
 @attendance_bp.route("/attendance/current", methods=["GET"])
 @authenticate
 def get_current_attendance(user):
@@ -52,11 +58,7 @@ def check_in(user):
     with get_db() as conn:
         cursor = conn.cursor()
         # Check if user is already checked in
-        cursor.execute("""
-            SELECT id FROM attendance 
-            WHERE member_id = %s AND check_out_time IS NULL
-        """, (user["id"],))
-        if cursor.fetchone():
+        if query_prepared(conn, OPEN_CHECK_IN_QUERY, (user["id"],)):
             return jsonify({"error": "Already checked in"}), 400
 
         # Insert new check-in
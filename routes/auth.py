@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify, current_app
-from db import get_db
-import bcrypt
+from db import get_db, release_db, run_transaction
+from passwords import hash_password, check_password, needs_rehash, PasswordHashingBusyError
+from throttle import LoginThrottle
+from config import LOGIN_THROTTLE_CONFIG
 from datetime import datetime
 import jwt
-from middleware import create_token, authenticate, AuthenticationError, refresh_token as refresh_token_func
+from middleware import create_token, authenticate, invalidate_user, public, AuthenticationError, refresh_token as refresh_token_func
 import logging
 import re
 
@@ -11,6 +13,19 @@ logger = logging.getLogger(__name__)
 
 auth_bp = Blueprint("auth", __name__)
 
+def _login_throttle(attempts_per_minute):
+    return LoginThrottle(
+        capacity=attempts_per_minute,
+        refill_per_second=attempts_per_minute / 60.0,
+        free_failures=LOGIN_THROTTLE_CONFIG['free_failures'],
+        base_backoff=LOGIN_THROTTLE_CONFIG['base_backoff'],
+        max_backoff=LOGIN_THROTTLE_CONFIG['max_backoff']
+    )
+
+# Checked before any database or bcrypt work so abusive traffic is cheap to reject
+email_throttle = _login_throttle(LOGIN_THROTTLE_CONFIG['email_attempts_per_minute'])
+ip_throttle = _login_throttle(LOGIN_THROTTLE_CONFIG['ip_attempts_per_minute'])
+
 def validate_email(email):
     """Validate email format"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -29,6 +44,7 @@ def validate_password(password):
     return True, None
 
 @auth_bp.route("/register", methods=["POST"])
+@public
 def register_user():
     try:
         data = request.json
@@ -49,90 +65,101 @@ def register_user():
             
             # Check if email already exists
             cursor.execute("SELECT id FROM users WHERE email = %s", (data['email'],))
-            if cursor.fetchone():
-                return jsonify({"error": "Email already registered"}), 400
+            existing_user = cursor.fetchone()
+            cursor.close()
 
-            # Hash password
-            hashed_password = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt())
-            
-            # Insert new user
-            cursor.execute("""
-                INSERT INTO users (email, password, role, name, dob, address, city, state, zipcode, auto_payment)
-                VALUES (%s, %s, 'non_member', %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                data['email'],
-                hashed_password.decode('utf-8'),
-                data.get('name'),
-                data.get('dob'),
-                data.get('address'),
-                data.get('city'),
-                data.get('state'),
-                data.get('zipcode'),
-                data.get('auto_payment', True)
-            ))
-            
-            user_id = cursor.lastrowid
+        if existing_user:
+            return jsonify({"error": "Email already registered"}), 400
+
+        # Hash password without holding a pooled connection
+        release_db()
+        hashed_password = hash_password(data['password'])
 
-            # If payment information is provided, add payment method
-            if data.get('card_number') and data.get('exp') and data.get('cvv'):
+        with get_db() as conn:
+            def create_account(cursor):
+                # Insert new user
                 cursor.execute("""
-                    INSERT INTO payment_methods (user_id, card_number, exp, cvv, card_holder_name, saved)
-                    VALUES (%s, %s, %s, %s, %s, %s)
+                    INSERT INTO users (email, password, role, name, dob, address, city, state, zipcode, auto_payment)
+                    VALUES (%s, %s, 'non_member', %s, %s, %s, %s, %s, %s, %s)
                 """, (
-                    user_id,
-                    data['card_number'],
-                    data['exp'],
-                    data['cvv'],
-                    data['card_holder_name'],
-                    True
+                    data['email'],
+                    hashed_password,
+                    data.get('name'),
+                    data.get('dob'),
+                    data.get('address'),
+                    data.get('city'),
+                    data.get('state'),
+                    data.get('zipcode'),
+                    data.get('auto_payment', True)
                 ))
-                payment_method_id = cursor.lastrowid
-            else:
-                payment_method_id = None
-
-            # Handle membership creation based on membership_type
-            if data.get('membership_type'):
-                # Determine membership duration based on type
-                membership_duration = 1  # Default to 1 month
-                if data['membership_type'] == 'annual':
-                    membership_duration = 12
-                
-                # Calculate membership amount based on type
-                amount = 30.00  # Default monthly price
-                if data['membership_type'] == 'annual':
-                    amount = 300.00
-                elif data['membership_type'] == 'student':
-                    amount = 20.00
-
-                # Set start and expiry dates
-                from datetime import datetime, timedelta
-                start_date = datetime.now().date()
-                if data['membership_type'] == 'annual':
-                    # Use actual year calculation for annual membership (365 days)
-                    expiry_date = start_date.replace(year=start_date.year + 1)
+            
+                user_id = cursor.lastrowid
+
+                # If payment information is provided, add payment method
+                if data.get('card_number') and data.get('exp') and data.get('cvv'):
+                    cursor.execute("""
+                        INSERT INTO payment_methods (user_id, card_number, exp, cvv, card_holder_name, saved)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                    """, (
+                        user_id,
+                        data['card_number'],
+                        data['exp'],
+                        data['cvv'],
+                        data['card_holder_name'],
+                        True
+                    ))
+                    payment_method_id = cursor.lastrowid
                 else:
-                    # For other membership types, use 30 days per month
-                    expiry_date = start_date + timedelta(days=30 * membership_duration)
+                    payment_method_id = None
+
+                # Handle membership creation based on membership_type
+                if data.get('membership_type'):
+                    # Determine membership duration based on type
+                    membership_duration = 1  # Default to 1 month
+                    if data['membership_type'] == 'annual':
+                        membership_duration = 12
                 
-                # Insert new membership
-                cursor.execute("""
-                    INSERT INTO memberships (member_id, start_date, expiry_date, status)
-                    VALUES (%s, %s, %s, 'active')
-                """, (user_id, start_date, expiry_date))
+                    # Calculate membership amount based on type
+                    amount = 30.00  # Default monthly price
+                    if data['membership_type'] == 'annual':
+                        amount = 300.00
+                    elif data['membership_type'] == 'student':
+                        amount = 20.00
+
+                    # Set start and expiry dates
+                    from datetime import datetime, timedelta
+                    start_date = datetime.now().date()
+                    if data['membership_type'] == 'annual':
+                        # Use actual year calculation for annual membership (365 days)
+                        expiry_date = start_date.replace(year=start_date.year + 1)
+                    else:
+                        # For other membership types, use 30 days per month
+                        expiry_date = start_date + timedelta(days=30 * membership_duration)
+                
+                    # Insert new membership
+                    cursor.execute("""
+                        INSERT INTO memberships (member_id, start_date, expiry_date, status)
+                        VALUES (%s, %s, %s, 'active')
+                    """, (user_id, start_date, expiry_date))
 
-                # Create payment record
-                cursor.execute("""
-                    INSERT INTO payments (user_id, amount, status, payment_method_id, 
-                                         membership_duration, membership_expiry)
-                    VALUES (%s, %s, 'Completed', %s, %s, %s)
-                """, (user_id, amount, payment_method_id, membership_duration, expiry_date))
+                    # Create payment record
+                    cursor.execute("""
+                        INSERT INTO payments (user_id, amount, status, payment_method_id, 
+                                             membership_duration, membership_expiry)
+                        VALUES (%s, %s, 'Completed', %s, %s, %s)
+                    """, (user_id, amount, payment_method_id, membership_duration, expiry_date))
 
-                # Update user role to member and set membership_expiry
-                cursor.execute("""
-                    UPDATE users SET role = 'member', membership_expiry = %s WHERE id = %s
-                """, (expiry_date, user_id))
+                    # Update user role to member and set membership_expiry
+                    cursor.execute("""
+                        UPDATE users SET role = 'member', membership_expiry = %s WHERE id = %s
+                    """, (expiry_date, user_id))
+
+                return user_id
+
+            # The user row and any membership/payment rows commit together
+            user_id = run_transaction(conn, create_account, dictionary=True)
 
-            conn.commit()
+            cursor = conn.cursor(dictionary=True)
 
             # Get the newly created user
             cursor.execute("""
@@ -164,17 +191,29 @@ def register_user():
                 }
             }), 201
 
+    except PasswordHashingBusyError:
+        return jsonify({"error": "Server is busy. Please try again shortly."}), 503
     except Exception as e:
         logger.error(f"Registration error: {str(e)}")
         return jsonify({"error": "Registration failed. Please try again."}), 500
 
 @auth_bp.route("/login", methods=["POST"])
+@public
 def login_user():
     try:
         data = request.json
         if not data.get('email') or not data.get('password'):
             return jsonify({"error": "Email and password are required"}), 400
 
+        email_key = data['email'].strip().lower()
+        ip_key = request.remote_addr
+        retry_after = max(ip_throttle.check(ip_key), email_throttle.check(email_key))
+        if retry_after:
+            logger.warning(f"Login throttled for {data['email']} from {ip_key}")
+            response = jsonify({"error": "Too many login attempts. Please try again later."})
+            response.headers['Retry-After'] = str(int(retry_after) + 1)
+            return response, 429
+
         with get_db() as conn:
             cursor = conn.cursor(dictionary=True)
             
@@ -184,52 +223,79 @@ def login_user():
                 FROM users WHERE email = %s
             """, (data['email'],))
             user = cursor.fetchone()
-
-            if not user:
-                logger.warning(f"Login attempt with non-existent email: {data['email']}")
-                return jsonify({"error": "Invalid email or password"}), 401
-
-            # Verify password
-            if not bcrypt.checkpw(data['password'].encode('utf-8'), user['password'].encode('utf-8')):
-                logger.warning(f"Failed login attempt for user: {data['email']}")
-                return jsonify({"error": "Invalid email or password"}), 401
-
-            # Check membership expiry
-            if user['role'] == 'member' and user['membership_expiry']:
-                if user['membership_expiry'] < datetime.now():
+            cursor.close()
+
+        if not user:
+            logger.warning(f"Login attempt with non-existent email: {data['email']}")
+            email_throttle.record_failure(email_key)
+            ip_throttle.record_failure(ip_key)
+            return jsonify({"error": "Invalid email or password"}), 401
+
+        # Verify password without holding a pooled connection
+        release_db()
+        if not check_password(data['password'], user['password']):
+            logger.warning(f"Failed login attempt for user: {data['email']}")
+            email_throttle.record_failure(email_key)
+            ip_throttle.record_failure(ip_key)
+            return jsonify({"error": "Invalid email or password"}), 401
+
+        email_throttle.record_success(email_key)
+
+        # Upgrade the stored hash if the configured bcrypt cost has changed
+        new_hash = hash_password(data['password']) if needs_rehash(user['password']) else None
+
+        # Check membership expiry
+        membership_expired = (user['role'] == 'member' and user['membership_expiry']
+                              and user['membership_expiry'] < datetime.now())
+
+        if new_hash or membership_expired:
+            with get_db() as conn:
+                cursor = conn.cursor()
+                if new_hash:
+                    cursor.execute(
+                        "UPDATE users SET password = %s WHERE id = %s",
+                        (new_hash, user['id'])
+                    )
+                if membership_expired:
                     cursor.execute(
                         "UPDATE users SET role = 'non_member' WHERE id = %s",
                         (user['id'],)
                     )
-                    conn.commit()
-                    user['role'] = 'non_member'
+                conn.commit()
+                cursor.close()
 
-            # Create token
-            token = create_token(user)
-            
-            # Clear any existing session data first
-            from flask import session
-            session.clear()
-            
-            # Set session data
-            session['user_id'] = user['id']
-            session['email'] = user['email']
-            session['role'] = user['role']
-            session.permanent = True
-            
-            logger.info(f"User {data['email']} logged in successfully")
-            return jsonify({
-                "message": "Login successful",
-                "token": token,
-                "access_token": token,
-                "role": user['role'],
-                "user": {
-                    "id": user['id'],
-                    "email": user['email'],
-                    "role": user['role']
-                }
-            }), 200
+            if membership_expired:
+                invalidate_user(user['id'])
+                user['role'] = 'non_member'
 
+        # Create token
+        token = create_token(user)
+        
+        # Clear any existing session data first
+        from flask import session
+        session.clear()
+        
+        # Set session data
+        session['user_id'] = user['id']
+        session['email'] = user['email']
+        session['role'] = user['role']
+        session.permanent = True
+        
+        logger.info(f"User {data['email']} logged in successfully")
+        return jsonify({
+            "message": "Login successful",
+            "token": token,
+            "access_token": token,
+            "role": user['role'],
+            "user": {
+                "id": user['id'],
+                "email": user['email'],
+                "role": user['role']
+            }
+        }), 200
+
+    except PasswordHashingBusyError:
+        return jsonify({"error": "Server is busy. Please try again shortly."}), 503
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         return jsonify({"error": "Login failed. Please try again."}), 500
@@ -277,6 +343,7 @@ def logout_user(user):
         return jsonify({"error": "Logout failed. Please try again."}), 500
 
 @auth_bp.route("/refresh-token", methods=["POST"])
+@public
 def refresh_token_endpoint():
     try:
         refresh_token = request.json.get('refresh_token')
@@ -1,74 +1,164 @@
 from flask import Blueprint, jsonify, request
-from db import get_db
+from mysql.connector import IntegrityError, errorcode
+from db import get_db, run_transaction
+from db_rows import json_array_response
 from middleware import authenticate
+from schedule_index import schedule_index
 from datetime import datetime
+from collections import namedtuple
+import logging
+import time
 
 class_schedule_bp = Blueprint("class_schedule", __name__)
+logger = logging.getLogger(__name__)
 
-# Get all upcoming classes
+# Largest page a class listing returns for ?limit=
+MAX_PAGE_SIZE = 500
+
+ClassListing = namedtuple('ClassListing', 'start end trainer_id limit after')
+
+
+def _parse_time(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid '{name}': expected an ISO date or date and time")
+    # schedule_time is stored as server-local time without a zone
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def encode_cursor(schedule_time, class_id):
+    """The X-Next-Cursor value for a page ending with this class"""
+    return f"{schedule_time.isoformat()}_{class_id}"
+
+
+def class_listing_args(args):
+    """Window, trainer filter and page a class listing was asked for.
+
+    ``from`` and ``to`` bound schedule_time (``to`` exclusive), ``trainer_id``
+    keeps one trainer's classes, and ``limit`` caps the page. The response of
+    a capped page carries X-Next-Cursor; passing it back as ``after`` returns
+    the classes that follow, in (schedule_time, id) order. Raises ValueError
+    with a message for the client.
+    """
+    start, end = _parse_time(args, 'from'), _parse_time(args, 'to')
+    trainer_id = limit = after = None
+    if args.get('trainer_id'):
+        try:
+            trainer_id = int(args['trainer_id'])
+        except ValueError:
+            raise ValueError("Invalid 'trainer_id'")
+    if args.get('limit'):
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            raise ValueError("Invalid 'limit'")
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"'limit' must be between 1 and {MAX_PAGE_SIZE}")
+    if args.get('after'):
+        time_part, _, id_part = args['after'].rpartition('_')
+        try:
+            after = (datetime.fromisoformat(time_part), int(id_part))
+        except ValueError:
+            raise ValueError("Invalid 'after' cursor")
+    return ClassListing(start, end, trainer_id, limit, after)
+
+
+# Get upcoming classes, optionally one window, trainer or page at a time
 @class_schedule_bp.route("/classes", methods=["GET"])
 @authenticate
 def get_classes(user):
-    with get_db() as conn:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT c.id, 
-                   c.class_name, 
-                   c.trainer_id, 
-                   u.name AS trainer_name, 
-                   c.schedule_time, 
-                   c.capacity,
-                   COUNT(cb.id) AS current_bookings
-            FROM classes c
-            LEFT JOIN users u ON c.trainer_id = u.id
-            LEFT JOIN class_bookings cb ON c.id = cb.class_id
-            WHERE c.schedule_time >= NOW()
-            GROUP BY c.id
-            ORDER BY c.schedule_time
-        """)
-        return jsonify(cursor.fetchall())
+    try:
+        listing = class_listing_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Served from this worker's in-memory schedule, without a query. It only
+    # holds upcoming classes, so an earlier 'from' starts at now.
+    now = datetime.now()
+    start = max(listing.start, now) if listing.start else now
+    encoded, last = schedule_index.lookup(start, listing.end, listing.trainer_id,
+                                          after=listing.after, limit=listing.limit)
+    response = json_array_response(encoded)
+    if last is not None:
+        response.headers['X-Next-Cursor'] = encode_cursor(*last)
+    return response
+
+# Per-day totals for a month of the calendar; the classes of a day are
+# listed with GET /classes?from=&to= when it is opened
+@class_schedule_bp.route("/classes/calendar", methods=["GET"])
+@authenticate
+def get_calendar_summary(user):
+    month = request.args.get('month') or datetime.now().strftime('%Y-%m')
+    try:
+        first = datetime.strptime(month, '%Y-%m')
+    except ValueError:
+        return jsonify({"error": "Invalid 'month': expected YYYY-MM"}), 400
+    following = first.replace(year=first.year + first.month // 12, month=first.month % 12 + 1)
+    trainer_id = request.args.get('trainer_id')
+    if trainer_id:
+        try:
+            trainer_id = int(trainer_id)
+        except ValueError:
+            return jsonify({"error": "Invalid 'trainer_id'"}), 400
+
+    # Only upcoming classes are held in the schedule index, as listed above
+    summary = schedule_index.day_summary(
+        max(first, datetime.now()), following,
+        trainer_id=trainer_id or None,
+        class_name=request.args.get('class_name') or None,
+        hourly=request.args.get('hourly', '').lower() in ('1', 'true')
+    )
+    summary['month'] = month
+    return jsonify(summary)
 
 # Book a class
 @class_schedule_bp.route("/classes/<int:class_id>/book", methods=["POST"])
 @authenticate
 def book_class(class_id, user=None):
+    def reserve_seat(cursor):
+        # Row-locks the class, so concurrent bookings for it queue here and
+        # booked_count can never pass capacity
+        cursor.execute("""
+            UPDATE classes SET booked_count = booked_count + 1
+            WHERE id = %s AND booked_count < capacity
+        """, (class_id,))
+        if cursor.rowcount == 0:
+            cursor.execute("SELECT id FROM classes WHERE id = %s", (class_id,))
+            return "full" if cursor.fetchone() else "not_found"
+
+        # A repeat booking hits the unique (member_id, class_id) key and
+        # rolls the seat back with the rest of the transaction
+        cursor.execute("""
+            INSERT INTO class_bookings (member_id, class_id, booking_date) 
+            VALUES (%s, %s, NOW())
+        """, (user["id"], class_id))
+        return "booked"
+
     try:
         if not user or "id" not in user:
             return jsonify({"error": "Unauthorized user"}), 401
 
+        started = time.monotonic()
         with get_db() as conn:
-            cursor = conn.cursor()
-
-            # Check for existing booking
-            cursor.execute("""
-                SELECT COUNT(*) FROM class_bookings 
-                WHERE member_id = %s AND class_id = %s
-            """, (user["id"], class_id))
-            already_booked = cursor.fetchone()[0]
-            if already_booked > 0:
-                return jsonify({"error": "You already booked this class"}), 400
-
-            # Check if class exists and has space
-            cursor.execute("SELECT capacity FROM classes WHERE id = %s", (class_id,))
-            result = cursor.fetchone()
-            if not result:
-                return jsonify({"error": "Class not found"}), 404
-
-            capacity = result[0]
-            cursor.execute("SELECT COUNT(*) FROM class_bookings WHERE class_id = %s", (class_id,))
-            booked = cursor.fetchone()[0]
-            if booked >= capacity:
-                return jsonify({"error": "Class is full"}), 400
-
-            # Insert booking
-            cursor.execute("""
-                INSERT INTO class_bookings (member_id, class_id, booking_date) 
-                VALUES (%s, %s, NOW())
-            """, (user["id"], class_id))
+            result = run_transaction(conn, reserve_seat)
 
-            conn.commit()
-            return jsonify({"message": "Class booked successfully!"}), 200
+        if result == "not_found":
+            return jsonify({"error": "Class not found"}), 404
+        if result == "full":
+            return jsonify({"error": "Class is full"}), 400
+        schedule_index.booking_changed(class_id, 1, started)
+        return jsonify({"message": "Class booked successfully!"}), 200
 
+    except IntegrityError as e:
+        if e.errno == errorcode.ER_DUP_ENTRY:
+            return jsonify({"error": "You already booked this class"}), 400
+        return jsonify({"error": f"Booking failed: {str(e)}"}), 500
     except Exception as e:
         return jsonify({"error": f"Booking failed: {str(e)}"}), 500
 
@@ -76,6 +166,19 @@ def book_class(class_id, user=None):
 @class_schedule_bp.route("/classes/<int:class_id>/cancel", methods=["DELETE", "POST"])
 @authenticate
 def cancel_class_booking(user, class_id):
+    def release_seat(cursor):
+        cursor.execute("""
+            DELETE FROM class_bookings 
+            WHERE member_id = %s AND class_id = %s
+        """, (user["id"], class_id))
+        if cursor.rowcount == 0:
+            return False
+        cursor.execute("""
+            UPDATE classes SET booked_count = booked_count - 1
+            WHERE id = %s AND booked_count > 0
+        """, (class_id,))
+        return True
+
     try:
         with get_db() as conn:
             cursor = conn.cursor(dictionary=True)
@@ -95,17 +198,54 @@ def cancel_class_booking(user, class_id):
             if class_info["schedule_time"] <= datetime.now():
                 return jsonify({"error": "Cannot cancel a class that has already started"}), 400
             
-            # Cancel the booking
-            cursor.execute("""
-                DELETE FROM class_bookings 
-                WHERE member_id = %s AND class_id = %s
-            """, (user["id"], class_id))
-            
-            if cursor.rowcount == 0:
+            # Cancel the booking and give its seat back together
+            started = time.monotonic()
+            if not run_transaction(conn, release_seat):
                 return jsonify({"error": "No booking was cancelled"}), 404
-                
-            conn.commit()
+            schedule_index.booking_changed(class_id, -1, started)
+
             return jsonify({"message": "Class booking cancelled successfully"})
     except Exception as e:
-        print(f"Error cancelling class booking: {str(e)}")
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        logger.error(f"Error cancelling class booking: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+def _recount_bookings(cursor, class_id):
+    # The UPDATE holds the class row lock while counting, so bookings made
+    # since the drift scan are included
+    cursor.execute("""
+        UPDATE classes
+        SET booked_count = (SELECT COUNT(*) FROM class_bookings WHERE class_id = %s)
+        WHERE id = %s
+    """, (class_id, class_id))
+    cursor.execute("SELECT booked_count FROM classes WHERE id = %s", (class_id,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def reconcile_booked_counts(conn):
+    """Reset booked_count wherever it no longer matches the class's bookings.
+
+    Meant to run periodically (``flask reconcile-bookings``). Returns
+    ``(class_id, old_count, new_count)`` for every class it repaired.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT c.id, c.booked_count
+        FROM classes c
+        LEFT JOIN class_bookings cb ON c.id = cb.class_id
+        GROUP BY c.id, c.booked_count
+        HAVING c.booked_count <> COUNT(cb.id)
+    """)
+    drifted = cursor.fetchall()
+    cursor.close()
+
+    repaired = []
+    for class_id, old_count in drifted:
+        new_count = run_transaction(conn, lambda cursor: _recount_bookings(cursor, class_id))
+        if new_count is not None and new_count != old_count:
+            logger.warning(f"Repaired booked_count for class {class_id}: {old_count} -> {new_count}")
+            repaired.append((class_id, old_count, new_count))
+    if repaired:
+        schedule_index.bookings_changed()
+    return repaired
@@ -1,9 +1,20 @@
 from flask import Blueprint, jsonify, request, current_app
-from db import get_db
+from db import get_db, query_prepared
 from middleware import authenticate
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
+# Prepared once per connection; runs on every dashboard load
+UPCOMING_CLASSES_QUERY = """
+    SELECT c.id, c.class_name, c.schedule_time, t.name as trainer_name
+    FROM class_bookings cb
+    JOIN classes c ON cb.class_id = c.id
+    JOIN users t ON c.trainer_id = t.id
+    WHERE cb.member_id = %s AND c.schedule_time > NOW()
+    ORDER BY c.schedule_time ASC
+    LIMIT 5
+"""
+
 # 🔹 Get user's dashboard data
 @dashboard_bp.route("/dashboard/summary", methods=["GET"])
 @authenticate
@@ -34,17 +45,7 @@ def get_dashboard_summary(user):
         membership = cursor.fetchone()
 
         # Get upcoming classes
-        cursor.execute("""
-            SELECT c.id, c.class_name, c.schedule_time, t.name as trainer_name
-            FROM class_bookings cb
-            JOIN classes c ON cb.class_id = c.id
-            JOIN users t ON c.trainer_id = t.id
-            WHERE cb.member_id = %s AND c.schedule_time > NOW()
-            ORDER BY c.schedule_time ASC
-            LIMIT 5
-        """, (user["id"],))
-
-        upcoming_classes = cursor.fetchall()
+        upcoming_classes = query_prepared(conn, UPCOMING_CLASSES_QUERY, (user["id"],), dictionary=True)
 
         cursor.close()
 
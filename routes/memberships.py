@@ -1,6 +1,8 @@
 from flask import Blueprint, jsonify, request, current_app
-from db import get_db
-from middleware import authenticate, admin_required
+from db import get_db, run_transaction
+from db_rows import stream_rows_response
+from middleware import authenticate, admin_required, invalidate_user
+from schedule_index import schedule_index
 from datetime import datetime, timedelta
 import logging
 
@@ -98,69 +100,63 @@ def purchase_membership(user):
         # For other membership types, use 30 days per month
         expiry_date = now + timedelta(days=30 * membership_info['duration'])
     
+    def purchase(cursor):
+        # Create payment record
+        cursor.execute("""
+            INSERT INTO payments (user_id, amount, status, payment_method_id, 
+                                membership_duration, membership_expiry)
+            VALUES (%s, %s, 'Completed', %s, %s, %s)
+        """, (user["id"], membership_info["price"], payment_method_id, 
+              membership_info["duration"], expiry_date))
+        
+        # Update or create membership
+        cursor.execute("""
+            INSERT INTO memberships (member_id, start_date, expiry_date, status)
+            VALUES (%s, NOW(), %s, 'active')
+            ON DUPLICATE KEY UPDATE 
+                expiry_date = %s,
+                status = 'active'
+        """, (user["id"], expiry_date, expiry_date))
+        
+        # Update user role to member and set membership_expiry
+        cursor.execute("""
+            UPDATE users 
+            SET role = 'member', membership_expiry = %s, auto_payment = 1
+            WHERE id = %s
+        """, (expiry_date, user["id"]))
+
     with get_db() as conn:
-        cursor = conn.cursor()
         try:
-            # Start transaction
-            conn.start_transaction()
-            
-            # Create payment record
-            cursor.execute("""
-                INSERT INTO payments (user_id, amount, status, payment_method_id, 
-                                    membership_duration, membership_expiry)
-                VALUES (%s, %s, 'Completed', %s, %s, %s)
-            """, (user["id"], membership_info["price"], payment_method_id, 
-                  membership_info["duration"], expiry_date))
-            
-            # Update or create membership
-            cursor.execute("""
-                INSERT INTO memberships (member_id, start_date, expiry_date, status)
-                VALUES (%s, NOW(), %s, 'active')
-                ON DUPLICATE KEY UPDATE 
-                    expiry_date = %s,
-                    status = 'active'
-            """, (user["id"], expiry_date, expiry_date))
-            
-            # Update user role to member and set membership_expiry
-            cursor.execute("""
-                UPDATE users 
-                SET role = 'member', membership_expiry = %s, auto_payment = 1
-                WHERE id = %s
-            """, (expiry_date, user["id"]))
-            
-            conn.commit()
-            cursor.close()
-            
-            logger.info(f"Membership purchased successfully for user {user['id']}: {membership_type} until {expiry_date}")
-            
-            return jsonify({
-                "message": "Membership purchased successfully!",
-                "expiry_date": expiry_date.strftime("%Y-%m-%d"),
-                "amount_paid": membership_info["price"]
-            })
-            
+            # All three writes commit together, retried on deadlock
+            run_transaction(conn, purchase)
         except Exception as e:
-            conn.rollback()
             logger.error(f"Membership purchase failed: {str(e)}")
             return jsonify({"error": "Failed to process membership purchase"}), 500
 
+    invalidate_user(user["id"])
+    logger.info(f"Membership purchased successfully for user {user['id']}: {membership_type} until {expiry_date}")
+    
+    return jsonify({
+        "message": "Membership purchased successfully!",
+        "expiry_date": expiry_date.strftime("%Y-%m-%d"),
+        "amount_paid": membership_info["price"]
+    })
+
 # 🔹 Admin: Get all memberships
 @memberships_bp.route("/admin/memberships", methods=["GET"])
 @authenticate
 @admin_required
 def get_all_memberships(user):
     try:
-        db = get_db()
-        cursor = db.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT m.*, u.name, u.email, u.role
-            FROM memberships m
-            JOIN users u ON m.member_id = u.id
-            ORDER BY m.start_date DESC
-        """)
-        memberships = cursor.fetchall()
-        cursor.close()
-        return jsonify(memberships)
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT m.*, u.name, u.email, u.role
+                FROM memberships m
+                JOIN users u ON m.member_id = u.id
+                ORDER BY m.start_date DESC
+            """)
+            return stream_rows_response(cursor)
 
     except Exception as e:
         logger.error(f"Error in get_all_memberships: {str(e)}")
@@ -187,11 +183,14 @@ def update_membership_status(user, membership_id):
         
         if new_status != "active":
             cursor.execute("""
-                UPDATE users u
-                JOIN memberships m ON u.id = m.member_id
-                SET u.role = 'non_member'
-                WHERE m.id = %s
+                UPDATE users
+                SET role = 'non_member'
+                WHERE id = (SELECT member_id FROM memberships WHERE id = %s)
             """, (membership_id,))
+            cursor.execute("SELECT member_id FROM memberships WHERE id = %s", (membership_id,))
+            member = cursor.fetchone()
+            if member:
+                invalidate_user(member[0])
             
         conn.commit()
         cursor.close()
@@ -318,47 +317,54 @@ def delete_membership(user, membership_id):
 @memberships_bp.route("/memberships/cancel", methods=["POST"])
 @authenticate
 def cancel_and_delete_user(user):
-    try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-
-            # 🛠 1. Delete class bookings
-            cursor.execute("""
-                DELETE FROM class_bookings
-                WHERE member_id = %s
-            """, (user["id"],))
+    def delete_account(cursor):
+        # 🛠 1. Give back booked seats, then delete class bookings
+        cursor.execute("""
+            UPDATE classes SET booked_count = booked_count - 1
+            WHERE id IN (SELECT class_id FROM class_bookings WHERE member_id = %s)
+            AND booked_count > 0
+        """, (user["id"],))
+        cursor.execute("""
+            DELETE FROM class_bookings
+            WHERE member_id = %s
+        """, (user["id"],))
 
-            # 🛠 2. Delete attendance records
-            cursor.execute("""
-                DELETE FROM attendance
-                WHERE member_id = %s
-            """, (user["id"],))
+        # 🛠 2. Delete attendance records
+        cursor.execute("""
+            DELETE FROM attendance
+            WHERE member_id = %s
+        """, (user["id"],))
 
-            # 🛠 3. Delete payments (FIRST, before payment methods)
-            cursor.execute("""
-                DELETE FROM payments
-                WHERE user_id = %s
-            """, (user["id"],))
+        # 🛠 3. Delete payments (FIRST, before payment methods)
+        cursor.execute("""
+            DELETE FROM payments
+            WHERE user_id = %s
+        """, (user["id"],))
 
-            # 🛠 4. Delete payment methods (now safe)
-            cursor.execute("""
-                DELETE FROM payment_methods
-                WHERE user_id = %s
-            """, (user["id"],))
+        # 🛠 4. Delete payment methods (now safe)
+        cursor.execute("""
+            DELETE FROM payment_methods
+            WHERE user_id = %s
+        """, (user["id"],))
 
-            # 🛠 5. Delete memberships
-            cursor.execute("""
-                DELETE FROM memberships
-                WHERE member_id = %s
-            """, (user["id"],))
+        # 🛠 5. Delete memberships
+        cursor.execute("""
+            DELETE FROM memberships
+            WHERE member_id = %s
+        """, (user["id"],))
 
-            # 🛠 6. Delete user account
-            cursor.execute("""
-                DELETE FROM users
-                WHERE id = %s
-            """, (user["id"],))
+        # 🛠 6. Delete user account
+        cursor.execute("""
+            DELETE FROM users
+            WHERE id = %s
+        """, (user["id"],))
 
-            conn.commit()
+    try:
+        with get_db() as conn:
+            # Either every row goes or none does
+            run_transaction(conn, delete_account)
+            invalidate_user(user["id"])
+            schedule_index.bookings_changed()
 
             return jsonify({"message": "Membership and user account deleted successfully."})
 
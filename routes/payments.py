@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from db import get_db, get_db_connection
-from middleware import authenticate
+from db_rows import stream_rows_response
+from middleware import authenticate, invalidate_user
 from datetime import datetime, timedelta
 import logging
 
@@ -101,6 +102,7 @@ def process_payment(user):
             """, (user["id"],))
 
             conn.commit()
+            invalidate_user(user["id"])
             
             logger.info(f"Payment processed for user {user['id']}: ${amount}")
             
@@ -174,7 +176,7 @@ def delete_payment_method(user, method_id):
 def get_payment_history(user):
     try:
         with get_db() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             # Get payment history with payment method details
             cursor.execute("""
@@ -186,15 +188,11 @@ def get_payment_history(user):
                 ORDER BY p.transaction_date DESC
             """, (user["id"],))
             
-            payments = cursor.fetchall()
-            cursor.close()
-            
-            # Format dates and amounts
-            for payment in payments:
-                payment["transaction_date"] = payment["transaction_date"].strftime("%Y-%m-%d")
-                payment["amount"] = float(payment["amount"])
-            
-            return jsonify(payments)
+            # Format dates and amounts as each chunk is sent
+            return stream_rows_response(cursor, converters={
+                "transaction_date": lambda value: value.strftime("%Y-%m-%d"),
+                "amount": float
+            })
             
     except Exception as e:
         logger.error(f"Error getting payment history: {str(e)}")
@@ -1,12 +1,14 @@
 from flask import Blueprint, jsonify, request, current_app
-from db import get_db
-from middleware import authenticate
+from db import get_db, run_transaction
+from middleware import authenticate, require_roles
+from schedule_index import schedule_index
 from datetime import datetime, timedelta
 from functools import wraps
 
 trainer_bp = Blueprint("trainer", __name__)
 
 def trainer_required(f):
+    @require_roles('trainer')
     @wraps(f)
     def wrapper(*args, **kwargs):
         if not kwargs.get('user') or kwargs['user'].get('role') != 'trainer':
@@ -23,12 +25,10 @@ def get_trainer_classes(user):
         cursor = conn.cursor(dictionary=True)
         cursor.execute("""
             SELECT c.*, 
-                   COUNT(cb.id) as current_bookings,
-                   c.capacity - COUNT(cb.id) as available_spots
+                   c.booked_count as current_bookings,
+                   c.capacity - c.booked_count as available_spots
             FROM classes c
-            LEFT JOIN class_bookings cb ON c.id = cb.class_id
             WHERE c.trainer_id = %s AND c.schedule_time >= NOW()
-            GROUP BY c.id
             ORDER BY c.schedule_time ASC
         """, (user["id"],))
         
@@ -71,6 +71,7 @@ def create_class(user):
         
         conn.commit()
         cursor.close()
+        schedule_index.classes_changed()
         return jsonify({"message": "Class created successfully"})
 
 # 🔹 Update a class
@@ -124,6 +125,7 @@ def update_class(user, class_id):
         
         conn.commit()
         cursor.close()
+        schedule_index.classes_changed()
         return jsonify({"message": "Class updated successfully"})
 
 # 🔹 Delete a class
@@ -131,6 +133,17 @@ def update_class(user, class_id):
 @authenticate
 @trainer_required
 def delete_class(user, class_id):
+    def remove_class(cursor):
+        # Zeroing the counter takes the class row lock first, like a
+        # booking does, so no booking can land between the two deletes
+        cursor.execute("UPDATE classes SET booked_count = 0 WHERE id = %s", (class_id,))
+
+        # Delete class bookings first
+        cursor.execute("DELETE FROM class_bookings WHERE class_id = %s", (class_id,))
+
+        # Delete the class
+        cursor.execute("DELETE FROM classes WHERE id = %s", (class_id,))
+
     with get_db() as conn:
         cursor = conn.cursor()
         
@@ -148,14 +161,9 @@ def delete_class(user, class_id):
                 "error": "Class not found, not authorized, or already started"
             }), 404
         
-        # Delete class bookings first
-        cursor.execute("DELETE FROM class_bookings WHERE class_id = %s", (class_id,))
-        
-        # Delete the class
-        cursor.execute("DELETE FROM classes WHERE id = %s", (class_id,))
-        
-        conn.commit()
         cursor.close()
+        run_transaction(conn, remove_class)
+        schedule_index.classes_changed()
         return jsonify({"message": "Class deleted successfully"})
 
 # 🔹 Get class roster
@@ -205,13 +213,12 @@ def get_schedule(user):
         
         cursor.execute("""
             SELECT c.*, 
-                   COUNT(cb.id) as current_bookings,
-                   c.capacity - COUNT(cb.id) as available_spots
+                   c.booked_count as current_bookings,
+                   c.capacity - c.booked_count as available_spots
             FROM classes c
-            LEFT JOIN class_bookings cb ON c.id = cb.class_id
             WHERE c.trainer_id = %s 
-            AND DATE(c.schedule_time) BETWEEN %s AND %s
-            GROUP BY c.id
+            AND c.schedule_time >= %s
+            AND c.schedule_time < DATE_ADD(%s, INTERVAL 1 DAY)
             ORDER BY c.schedule_time ASC
         """, (user["id"], start_date, end_date))
         
@@ -239,12 +246,10 @@ def get_class_by_id(user, class_id):
         # Verify trainer owns the class
         cursor.execute("""
             SELECT c.*, 
-                   COUNT(cb.id) as current_bookings,
-                   c.capacity - COUNT(cb.id) as available_spots
+                   c.booked_count as current_bookings,
+                   c.capacity - c.booked_count as available_spots
             FROM classes c
-            LEFT JOIN class_bookings cb ON c.id = cb.class_id
             WHERE c.id = %s AND c.trainer_id = %s
-            GROUP BY c.id
         """, (class_id, user["id"]))
         
         class_info = cursor.fetchone()
@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
 from db import get_db
-from middleware import authenticate, admin_required
+from middleware import authenticate, admin_required, invalidate_user
 
 users_bp = Blueprint("users", __name__)
 
@@ -30,4 +30,5 @@ def update_user_role(user, user_id):
         cursor.execute("UPDATE users SET role = %s WHERE id = %s", (new_role, user_id))
         conn.commit()
         cursor.close()
+        invalidate_user(user_id)
         return jsonify({"message": f"User {user_id} role updated to {new_role}."})
\ No newline at end of file
@@ -0,0 +1,283 @@
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from config import SCHEDULE_INDEX_CONFIG
+from db import get_db
+from db_rows import encode_rows
+from rate_limit import SharedMemoryStorage
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('id', 'class_name', 'trainer_id', 'trainer_name', 'schedule_time', 'capacity', 'current_bookings')
+_BOOKINGS_COLUMN = COLUMNS.index('current_bookings')
+
+# Version counters in the shared file
+_CLASSES = 'schedule:classes'
+_BOOKINGS = 'schedule:bookings'
+# The shared counters are fixed-window rate limit slots; make the window
+# long enough that they never reset
+_FOREVER = 100 * 365 * 86400
+
+_EPOCH = datetime(1970, 1, 1)
+_NO_TIMES = array('d')
+
+
+def _seconds(value):
+    # Naive datetimes as they come from the database, without a timezone lookup
+    return (value - _EPOCH).total_seconds()
+
+
+def _totals(**key):
+    return dict(key, classes=0, seats=0, seats_remaining=0)
+
+
+def _add_class(totals, capacity, remaining):
+    totals['classes'] += 1
+    totals['seats'] += capacity
+    totals['seats_remaining'] += remaining
+
+
+class _Snapshot:
+    """One load of the upcoming classes, in (schedule_time, id) order"""
+
+    __slots__ = ('times', 'rows', 'encoded', 'positions', 'by_trainer',
+                 'classes_version', 'bookings_version', 'loaded_at')
+
+    def __init__(self, rows, classes_version, bookings_version):
+        self.rows = rows
+        self.encoded = encode_rows(COLUMNS, rows)
+        self.times = array('d', (_seconds(row[4]) for row in rows))
+        self.positions = {row[0]: pos for pos, row in enumerate(rows)}
+        # trainer_id -> (that trainer's times, their positions in rows)
+        by_trainer = {}
+        for pos, row in enumerate(rows):
+            times, positions = by_trainer.setdefault(row[2], (array('d'), array('l')))
+            times.append(self.times[pos])
+            positions.append(pos)
+        self.by_trainer = by_trainer
+        self.classes_version = classes_version
+        self.bookings_version = bookings_version
+        self.loaded_at = time.monotonic()
+
+
+class ScheduleIndex:
+    """Upcoming classes held in memory, sorted by schedule_time.
+
+    Start times are kept in flat arrays, overall and per trainer, so a time
+    window is two bisects, and each class's JSON is encoded once per load.
+
+    Workers on the host share two version counters through a memory-mapped
+    file. A class being created, changed or deleted bumps the first, and every
+    worker reloads before its next read. A booking bumps the second; other
+    workers keep showing their seat counts for up to ``refresh_interval``
+    seconds before reloading, while the worker that took the booking updates
+    its own copy in place. The booking itself is always decided by the
+    database, so a stale count can only change what a listing shows. A
+    snapshot older than ``max_age`` is reloaded regardless, which picks up
+    changes made from other hosts or directly in the database.
+    """
+
+    def __init__(self, load_rows, version_path, refresh_interval=1.0, max_age=60.0):
+        self._load_rows = load_rows
+        self._versions = SharedMemoryStorage(f"shm://{version_path}", slots=16)
+        self._refresh_interval = refresh_interval
+        self._max_age = max_age
+        self._reload_lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._snapshot = None
+        # After a failed reload, the loaded schedule is served until then
+        self._retry_at = 0.0
+        self.reloads = 0
+        self.reload_errors = 0
+
+    def lookup(self, start=None, end=None, trainer_id=None, after=None, limit=None):
+        """Encoded classes with ``start <= schedule_time < end``, in (schedule_time, id) order.
+
+        ``after`` is the (schedule_time, id) of the last class on the previous
+        page and ``limit`` caps this page. Returns the encoded classes and the
+        (schedule_time, id) to continue after, or None on the last page.
+        """
+        snapshot = self._current()
+        if trainer_id is None:
+            times, positions = snapshot.times, None
+        else:
+            times, positions = snapshot.by_trainer.get(trainer_id, (_NO_TIMES, None))
+        rows = snapshot.rows
+        lo = bisect_left(times, _seconds(start)) if start is not None else 0
+        hi = bisect_left(times, _seconds(end)) if end is not None else len(times)
+        if after is not None:
+            after_time, after_id = after
+            after_seconds = _seconds(after_time)
+            pos = bisect_left(times, after_seconds)
+            # Classes sharing the cursor's start time are ordered by id
+            while pos < len(times) and times[pos] == after_seconds and \
+                    rows[pos if positions is None else positions[pos]][0] <= after_id:
+                pos += 1
+            lo = max(lo, pos)
+        last = None
+        if limit is not None and lo + limit < hi:
+            hi = lo + limit
+            row = rows[hi - 1 if positions is None else positions[hi - 1]]
+            last = (row[4], row[0])
+        encoded = snapshot.encoded
+        if positions is None:
+            return encoded[lo:hi], last
+        return [encoded[pos] for pos in positions[lo:hi]], last
+
+    def day_summary(self, start, end, trainer_id=None, class_name=None, hourly=False):
+        """Classes, seats and seats remaining per day with ``start <= schedule_time < end``.
+
+        Returns the days that have classes, in date order, each with a list
+        of the same totals per hour when ``hourly`` is set, and the trainers
+        and class names found in the whole window so a client can offer them
+        as filters.
+        """
+        snapshot = self._current()
+        times = snapshot.times
+        lo, hi = bisect_left(times, _seconds(start)), bisect_left(times, _seconds(end))
+        days, trainers, class_names = {}, {}, set()
+        for row in snapshot.rows[lo:hi]:
+            class_id, name, row_trainer_id, trainer_name, when, capacity, booked = row
+            trainers.setdefault(row_trainer_id, trainer_name)
+            class_names.add(name)
+            if (trainer_id is not None and row_trainer_id != trainer_id) or \
+                    (class_name is not None and name != class_name):
+                continue
+            capacity = capacity or 0
+            remaining = max(capacity - booked, 0)
+            day = days.get(when.date())
+            if day is None:
+                day = days[when.date()] = _totals(date=when.date().isoformat())
+                if hourly:
+                    day['hours'] = []
+            _add_class(day, capacity, remaining)
+            if hourly:
+                # Rows are in time order, so a new hour is always the last one
+                if not day['hours'] or day['hours'][-1]['hour'] != when.hour:
+                    day['hours'].append(_totals(hour=when.hour))
+                _add_class(day['hours'][-1], capacity, remaining)
+        return {
+            'days': list(days.values()),
+            'trainers': [{'id': key, 'name': value} for key, value in trainers.items() if key is not None],
+            'class_names': sorted(class_names)
+        }
+
+    def load(self):
+        """Load the schedule now, e.g. at startup, instead of on the first read"""
+        with self._reload_lock:
+            self._snapshot = self._load()
+
+    def classes_changed(self):
+        """Make every worker on the host reload before its next read"""
+        self._versions.incr(_CLASSES, _FOREVER)
+
+    def bookings_changed(self):
+        """Announce booking count changes that were not applied locally"""
+        self._versions.incr(_BOOKINGS, _FOREVER)
+
+    def booking_changed(self, class_id, delta, since):
+        """Apply a committed booking (+1) or cancellation (-1) made by this worker.
+
+        ``since`` is time.monotonic() from before the booking's transaction
+        began. A snapshot loaded after that may already include the booking,
+        so it is left to reload instead.
+        """
+        version = self._versions.incr(_BOOKINGS, _FOREVER)
+        with self._update_lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.loaded_at >= since:
+                return
+            pos = snapshot.positions.get(class_id)
+            if pos is not None:
+                row = snapshot.rows[pos]
+                row = row[:_BOOKINGS_COLUMN] + (row[_BOOKINGS_COLUMN] + delta,) + row[_BOOKINGS_COLUMN + 1:]
+                snapshot.rows[pos] = row
+                snapshot.encoded[pos] = encode_rows(COLUMNS, [row])[0]
+            # Only if no other worker's booking came in between is the copy
+            # now as current as the counter says
+            if version == snapshot.bookings_version + 1:
+                snapshot.bookings_version = version
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'classes': len(snapshot.rows) if snapshot else 0,
+            'age_seconds': round(time.monotonic() - snapshot.loaded_at, 3) if snapshot else None,
+            'reloads': self.reloads,
+            'reload_errors': self.reload_errors,
+        }
+
+    def _stale(self, snapshot):
+        age = time.monotonic() - snapshot.loaded_at
+        if age >= self._max_age or self._versions.get(_CLASSES) != snapshot.classes_version:
+            return True
+        return age >= self._refresh_interval and self._versions.get(_BOOKINGS) != snapshot.bookings_version
+
+    def _current(self):
+        snapshot = self._snapshot
+        if snapshot is not None and (time.monotonic() < self._retry_at or not self._stale(snapshot)):
+            return snapshot
+        # With a schedule already loaded, one thread reloads while the others
+        # keep serving it instead of queueing behind the query, unless a class
+        # has changed: then everyone waits, so a change is never read stale
+        blocking = snapshot is None or self._versions.get(_CLASSES) != snapshot.classes_version
+        if not self._reload_lock.acquire(blocking=blocking):
+            return snapshot
+        try:
+            current = self._snapshot
+            if current is not None and current is not snapshot and not self._stale(current):
+                return current
+            try:
+                self._snapshot = self._load()
+            except Exception as e:
+                if current is None:
+                    raise
+                self.reload_errors += 1
+                self._retry_at = time.monotonic() + self._refresh_interval
+                logger.warning(f"Schedule reload failed, serving the loaded schedule: {e}")
+                return current
+            return self._snapshot
+        finally:
+            self._reload_lock.release()
+
+    def _load(self):
+        # Read the versions first: a change committed during the query then
+        # leaves the snapshot behind and it is reloaded again
+        classes_version = self._versions.get(_CLASSES)
+        bookings_version = self._versions.get(_BOOKINGS)
+        rows = self._load_rows()
+        self.reloads += 1
+        return _Snapshot(rows, classes_version, bookings_version)
+
+
+def load_upcoming_classes():
+    """Every class from now on with its trainer's name, as ScheduleIndex rows"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT c.id,
+                   c.class_name,
+                   c.trainer_id,
+                   u.name AS trainer_name,
+                   c.schedule_time,
+                   c.capacity,
+                   c.booked_count AS current_bookings
+            FROM classes c
+            LEFT JOIN users u ON c.trainer_id = u.id
+            WHERE c.schedule_time >= NOW()
+            ORDER BY c.schedule_time, c.id
+        """)
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+
+schedule_index = ScheduleIndex(
+    load_upcoming_classes,
+    SCHEDULE_INDEX_CONFIG['version_path'],
+    refresh_interval=SCHEDULE_INDEX_CONFIG['refresh_interval'],
+    max_age=SCHEDULE_INDEX_CONFIG['max_age']
+)
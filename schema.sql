@@ -16,7 +16,7 @@ CREATE TABLE `class_bookings` (
   `class_id` int NOT NULL,
   `booking_date` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`),
-  KEY `idx_class_bookings_member_id` (`member_id`),
+  UNIQUE KEY `uq_class_bookings_member_class` (`member_id`,`class_id`),
   KEY `idx_class_bookings_class_id` (`class_id`),
   CONSTRAINT `class_bookings_ibfk_1` FOREIGN KEY (`member_id`) REFERENCES `users` (`id`),
   CONSTRAINT `class_bookings_ibfk_2` FOREIGN KEY (`class_id`) REFERENCES `classes` (`id`)
@@ -24,15 +24,28 @@ CREATE TABLE `class_bookings` (
 
 CREATE TABLE `classes` (
   `id` int NOT NULL AUTO_INCREMENT,
-  `name` varchar(255) NOT NULL,
+  `class_name` varchar(255) NOT NULL,
   `description` text,
-  `instructor_id` int DEFAULT NULL,
-  `schedule` datetime DEFAULT NULL,
+  `trainer_id` int DEFAULT NULL,
+  `schedule_time` datetime DEFAULT NULL,
   `capacity` int DEFAULT NULL,
+  `booked_count` int NOT NULL DEFAULT '0',
   `created_at` datetime DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`),
-  KEY `instructor_id` (`instructor_id`),
-  CONSTRAINT `classes_ibfk_1` FOREIGN KEY (`instructor_id`) REFERENCES `users` (`id`)
+  KEY `idx_classes_schedule` (`schedule_time`,`id`),
+  KEY `idx_classes_trainer_schedule` (`trainer_id`,`schedule_time`,`id`),
+  CONSTRAINT `classes_ibfk_1` FOREIGN KEY (`trainer_id`) REFERENCES `users` (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+CREATE TABLE `equipment_reports` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `user_id` int NOT NULL,
+  `equipment_name` varchar(255) NOT NULL,
+  `issue_description` text NOT NULL,
+  `reported_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  KEY `idx_equipment_reports_user_id` (`user_id`),
+  CONSTRAINT `equipment_reports_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 CREATE TABLE `memberships` (
@@ -80,7 +93,7 @@ CREATE TABLE `users` (
   `name` varchar(255) NOT NULL,
   `email` varchar(255) NOT NULL,
   `password` varchar(255) NOT NULL,
-  `role` enum('admin','member','non_member') DEFAULT 'non_member',
+  `role` enum('admin','trainer','member','non_member') DEFAULT 'non_member',
   `dob` date DEFAULT NULL,
   `address` varchar(255) DEFAULT NULL,
   `city` varchar(255) DEFAULT NULL,
@@ -1,3 +1,59 @@
+function dateKey(date) {
+    return `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}-${String(date.getDate()).padStart(2, '0')}`;
+}
+
+// Day open in the class modal (YYYY-MM-DD)
+let openDate = null;
+
+function getToken() {
+    let token = localStorage.getItem("token");
+    if (!token) {
+        const urlParams = new URLSearchParams(window.location.search);
+        token = urlParams.get('token');
+        if (token) localStorage.setItem("token", token);
+    }
+    return token;
+}
+
+async function fetchJson(url, fallback) {
+    const token = getToken();
+    if (!token) return fallback;
+
+    try {
+        const response = await fetch(url, {
+            method: 'GET',
+            headers: {
+                'Authorization': `Bearer ${token}`
+            }
+        });
+        if (!response.ok) return fallback;
+        return await response.json();
+    } catch (error) {
+        console.error(`Error fetching ${url}:`, error);
+        return fallback;
+    }
+}
+
+// Per-day class counts and seats for one month (Date of any day in it)
+function fetchMonthSummary(date, trainerId, className) {
+    const params = new URLSearchParams({ month: dateKey(date).slice(0, 7) });
+    if (trainerId) params.set('trainer_id', trainerId);
+    if (className) params.set('class_name', className);
+    return fetchJson(`/api/classes/calendar?${params}`, { days: [], trainers: [], class_names: [] });
+}
+
+// Full details of one day's classes, matching the current filters
+async function loadDay(dateString) {
+    const [year, month, day] = dateString.split('-').map(Number);
+    const trainerId = document.getElementById("trainer-filter").value;
+    const className = document.getElementById("class-filter").value;
+    const params = new URLSearchParams({ from: dateString, to: dateKey(new Date(year, month - 1, day + 1)) });
+    if (trainerId) params.set('trainer_id', trainerId);
+
+    const classes = await fetchJson(`/api/classes?${params}`, []);
+    showClassesForDay(dateString, classes.filter(cls => !className || cls.class_name === className));
+}
+
 document.addEventListener('DOMContentLoaded', async () => {
     const calendarContainer = document.getElementById("calendar");
     const trainerFilter = document.getElementById("trainer-filter");
@@ -7,41 +63,21 @@ document.addEventListener('DOMContentLoaded', async () => {
     const nextBtn = document.getElementById("next-month");
 
     let currentDate = new Date();
-    let allClasses = [];
-
-    async function fetchClasses() {
-        let token = localStorage.getItem("token");
-        if (!token) {
-            const urlParams = new URLSearchParams(window.location.search);
-            token = urlParams.get('token');
-            if (token) localStorage.setItem("token", token);
-        }
-        if (!token) return [];
-
-        try {
-            const response = await fetch('/api/classes', {
-                method: 'GET',
-                headers: {
-                    'Authorization': `Bearer ${token}`
-                }
-            });
-            if (!response.ok) return [];
-            const data = await response.json();
-            console.log("Raw API Classes Data:", data);
-            return data;
-        } catch (error) {
-            console.error("Error fetching classes:", error);
-            return [];
-        }
+
+    // Only the month on screen is summarised, again whenever it or a filter changes
+    async function loadMonth() {
+        const summary = await fetchMonthSummary(currentDate, trainerFilter.value, classFilter.value);
+        populateFilters(summary);
+        renderCalendar(summary.days);
     }
 
-    function renderCalendar(classData) {
-        console.log("Rendering calendar with data:", classData);
+    function renderCalendar(days) {
         const year = currentDate.getFullYear();
         const month = currentDate.getMonth();
         const firstDay = new Date(year, month, 1).getDay();
         const totalDays = new Date(year, month + 1, 0).getDate();
         const weekdays = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'];
+        const daySummaries = new Map(days.map(summary => [summary.date, summary]));
 
         calendarContainer.innerHTML = '';
         monthHeader.textContent = `${currentDate.toLocaleString('default', { month: 'long' })} ${year}`;
@@ -65,114 +101,60 @@ document.addEventListener('DOMContentLoaded', async () => {
             dayBox.classList.add('day');
             dayBox.innerHTML = `<strong>${day}</strong>`;
 
-            const classesToday = classData.filter(cls => {
-                // Parse the date string from the DB
-                const classDate = new Date(cls.schedule_time);
-                
-                // Debug log for specific days
-                if (day === 5 || day === 6) {
-                    console.log(`Checking class for day ${day}:`, {
-                        className: cls.class_name,
-                        dbDate: cls.schedule_time,
-                        parsedDate: classDate.toISOString(),
-                        classYear: classDate.getFullYear(),
-                        classMonth: classDate.getMonth(),
-                        classDay: classDate.getDate(),
-                        targetYear: year,
-                        targetMonth: month,
-                        targetDay: day
-                    });
-                }
-
-                // Compare date components directly
-                const classYear = classDate.getFullYear();
-                const classMonth = classDate.getMonth();
-                const classDay = classDate.getDate();
-
-                // Create a date string for comparison (YYYY-MM-DD)
-                const classDateStr = `${classYear}-${String(classMonth + 1).padStart(2, '0')}-${String(classDay).padStart(2, '0')}`;
-                const targetDateStr = `${year}-${String(month + 1).padStart(2, '0')}-${String(day).padStart(2, '0')}`;
-
-                const isMatch = classDateStr === targetDateStr;
-
-                if (isMatch && (day === 5 || day === 6)) {
-                    console.log(`Match found for ${cls.class_name} on day ${day}`);
-                }
-
-                return isMatch;
-            });
-
-            if (classesToday.length > 0) {
-                console.log(`Found ${classesToday.length} classes for day ${day}:`, classesToday.map(c => c.class_name));
+            const summary = daySummaries.get(dateString);
+            if (summary) {
                 const dot = document.createElement('div');
                 dot.classList.add('dot');
+                dot.title = `${summary.classes} class${summary.classes === 1 ? '' : 'es'}, ` +
+                    `${summary.seats_remaining} of ${summary.seats} spots available`;
                 dayBox.appendChild(dot);
 
-                dayBox.addEventListener('click', () => showClassesForDay(dateString, classesToday));
+                dayBox.addEventListener('click', () => loadDay(dateString));
             }
 
             calendarContainer.appendChild(dayBox);
         }
     }
 
-    function populateFilters(classes) {
-        const trainers = [...new Set(classes.map(c => c.trainer_name))];
-        const types = [...new Set(classes.map(c => c.class_name))];
-
-        trainers.forEach(name => {
-            const opt = document.createElement('option');
-            opt.value = name;
-            opt.textContent = name;
-            trainerFilter.appendChild(opt);
-        });
-
-        types.forEach(name => {
-            const opt = document.createElement('option');
-            opt.value = name;
-            opt.textContent = name;
-            classFilter.appendChild(opt);
+    function populateFilters(summary) {
+        // Add options for trainers and classes not seen in earlier months
+        const options = [
+            [trainerFilter, summary.trainers.map(trainer => [String(trainer.id), trainer.name])],
+            [classFilter, summary.class_names.map(name => [name, name])]
+        ];
+        options.forEach(([filter, entries]) => {
+            const known = new Set([...filter.options].map(opt => opt.value));
+            entries.filter(([value]) => !known.has(value)).forEach(([value, label]) => {
+                const opt = document.createElement('option');
+                opt.value = value;
+                opt.textContent = label;
+                filter.appendChild(opt);
+            });
         });
     }
 
-    function filterClasses() {
-        const trainer = trainerFilter.value;
-        const type = classFilter.value;
-
-        return allClasses.filter(cls =>
-            (!trainer || cls.trainer_name === trainer) &&
-            (!type || cls.class_name === type)
-        );
-    }
-
-    allClasses = await fetchClasses();
-    renderCalendar(allClasses);
-    populateFilters(allClasses);
+    await loadMonth();
 
     [trainerFilter, classFilter].forEach(filter => {
         filter.addEventListener('change', () => {
-            renderCalendar(filterClasses());
+            loadMonth();
         });
     });
 
     prevBtn.addEventListener('click', () => {
         currentDate.setMonth(currentDate.getMonth() - 1);
-        renderCalendar(filterClasses());
+        loadMonth();
     });
 
     nextBtn.addEventListener('click', () => {
         currentDate.setMonth(currentDate.getMonth() + 1);
-        renderCalendar(filterClasses());
+        loadMonth();
     });
 });
 
 // For booking class from modal
 window.bookClass = async (classId, button) => {
-    let token = localStorage.getItem('token');
-    if (!token) {
-        const urlParams = new URLSearchParams(window.location.search);
-        token = urlParams.get('token');
-        if (token) localStorage.setItem("token", token);
-    }
+    const token = getToken();
     if (!token) {
         showError("Please sign in first.");
         return;
@@ -193,42 +175,9 @@ window.bookClass = async (classId, button) => {
 
         if (res.ok) {
             showSuccess("Class booked successfully!");
-            // Refresh the class list after 1.5 seconds
+            // Refresh the open day's classes after 1.5 seconds
             setTimeout(() => {
-                const currentDateStr = document.getElementById("modal-date").textContent;
-                console.log("Current date text:", currentDateStr);
-                
-                // Parse the date string with more reliable Date.parse
-                const date = new Date(currentDateStr);
-                console.log("Parsed date:", date);
-                
-                // Extract just year, month, day (ignore time)
-                const year = date.getFullYear();
-                const month = date.getMonth(); // 0-indexed
-                const day = date.getDate();
-                
-                console.log("Looking for classes on:", year, month + 1, day);
-                
-                fetchClasses().then(classes => {
-                    console.log("Classes after booking:", classes);
-                    
-                    const classesForDay = classes.filter(cls => {
-                        const classDate = new Date(cls.schedule_time);
-                        
-                        // Extract just the date portions for comparison
-                        const classYear = classDate.getFullYear();
-                        const classMonth = classDate.getMonth();
-                        const classDay = classDate.getDate();
-                        
-                        return classYear === year && classMonth === month && classDay === day;
-                    });
-                    
-                    console.log("Filtered classes after booking:", classesForDay);
-                    
-                    // Generate the dateString for showClassesForDay (yyyy-mm-dd)
-                    const dateString = `${year}-${String(month + 1).padStart(2, '0')}-${String(day).padStart(2, '0')}`;
-                    showClassesForDay(dateString, classesForDay);
-                });
+                if (openDate) loadDay(openDate);
             }, 1500);
         } else {
             showError(data.error || "Booking failed due to an unexpected error.");
@@ -268,9 +217,8 @@ function showError(message) {
 
 // For modal display of day classes
 function showClassesForDay(date, classes) {
-    console.log("Showing classes for date:", date);
-    console.log("Classes provided:", classes);
-    
+    openDate = date;
+
     // Create a Date object from the date string (yyyy-mm-dd)
     const displayDate = new Date(date);
     
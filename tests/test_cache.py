@@ -0,0 +1,47 @@
+import unittest
+import time
+from cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_get_returns_stored_value(self):
+        """Test a stored value is returned and counted as a hit"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set(1, {'id': 1})
+        self.assertEqual(cache.get(1), {'id': 1})
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_entries_expire(self):
+        """Test entries are not served after their TTL"""
+        cache = TTLCache(maxsize=2, ttl=0.01)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl=60)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(len(cache), 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test the cache never grows past maxsize"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_delete_invalidates_entry(self):
+        """Test delete removes an entry"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.delete('a')
+        cache.delete('missing')
+        self.assertIsNone(cache.get('a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
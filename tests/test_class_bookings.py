@@ -0,0 +1,110 @@
+import unittest
+from datetime import datetime, timedelta
+from flask import Flask, g
+from db_pool import PooledConnection
+from db_sqlite import SQLiteDatabase
+from middleware import create_token, user_cache
+from routes.classes import class_schedule_bp, reconcile_booked_counts
+
+
+class TestClassBookings(unittest.TestCase):
+    """Booking routes against the SQLite backend"""
+
+    def setUp(self):
+        self.db = SQLiteDatabase(':memory:')
+        self.conn = PooledConnection(self.db.connect())
+        app = Flask(__name__)
+        app.register_blueprint(class_schedule_bp, url_prefix='/api')
+        self.client = app.test_client()
+        # Requests run inside this app context, so every get_db() in them
+        # reuses the test database's connection
+        self.context = app.app_context()
+        self.context.push()
+        g._db_conn = self.conn
+        user_cache.clear()
+        self.cursor = self.conn.cursor()
+
+    def tearDown(self):
+        self.cursor.close()
+        self.context.pop()
+        self.conn.close()
+        self.db.close()
+
+    def add_member(self, email):
+        self.cursor.execute(
+            "INSERT INTO users (name, email, password, role, created_at) VALUES (%s, %s, %s, 'member', NOW())",
+            (email.split('@')[0], email, 'x')
+        )
+        token = create_token({'id': self.cursor.lastrowid, 'email': email, 'role': 'member'})
+        return {'Authorization': f'Bearer {token}'}
+
+    def add_class(self, capacity):
+        self.cursor.execute(
+            "INSERT INTO classes (class_name, schedule_time, capacity) VALUES ('Spin', %s, %s)",
+            (datetime.now() + timedelta(days=1), capacity)
+        )
+        return self.cursor.lastrowid
+
+    def seats(self, class_id):
+        self.cursor.execute("SELECT booked_count FROM classes WHERE id = %s", (class_id,))
+        booked_count = self.cursor.fetchone()[0]
+        self.cursor.execute("SELECT COUNT(*) FROM class_bookings WHERE class_id = %s", (class_id,))
+        return booked_count, self.cursor.fetchone()[0]
+
+    def book(self, class_id, member):
+        return self.client.post(f'/api/classes/{class_id}/book', headers=member)
+
+    def test_bookings_stop_at_capacity(self):
+        class_id = self.add_class(capacity=2)
+        members = [self.add_member(f'm{n}@gym.com') for n in range(3)]
+        self.assertEqual(self.book(class_id, members[0]).status_code, 200)
+        self.assertEqual(self.book(class_id, members[1]).status_code, 200)
+        response = self.book(class_id, members[2])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {'error': 'Class is full'})
+        self.assertEqual(self.seats(class_id), (2, 2))
+
+    def test_unknown_class(self):
+        response = self.book(999, self.add_member('m@gym.com'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_repeat_booking_gives_its_seat_back(self):
+        class_id = self.add_class(capacity=5)
+        member = self.add_member('m@gym.com')
+        self.assertEqual(self.book(class_id, member).status_code, 200)
+        response = self.book(class_id, member)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {'error': 'You already booked this class'})
+        self.assertEqual(self.seats(class_id), (1, 1))
+
+    def test_cancel_frees_the_seat(self):
+        class_id = self.add_class(capacity=1)
+        member, other = self.add_member('m@gym.com'), self.add_member('o@gym.com')
+        self.book(class_id, member)
+        response = self.client.delete(f'/api/classes/{class_id}/cancel', headers=member)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.seats(class_id), (0, 0))
+        response = self.client.delete(f'/api/classes/{class_id}/cancel', headers=member)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.seats(class_id), (0, 0))
+        self.assertEqual(self.book(class_id, other).status_code, 200)
+
+    def test_reconcile_repairs_drifted_counts(self):
+        booked, drifted, emptied = (self.add_class(capacity=5) for _ in range(3))
+        members = [self.add_member(f'm{n}@gym.com') for n in range(2)]
+        for member in members:
+            self.book(booked, member)
+            self.book(drifted, member)
+        self.cursor.execute("UPDATE classes SET booked_count = 5 WHERE id = %s", (drifted,))
+        self.cursor.execute("UPDATE classes SET booked_count = 3 WHERE id = %s", (emptied,))
+
+        with self.assertLogs('routes.classes', level='WARNING'):
+            repaired = reconcile_booked_counts(self.conn)
+        self.assertEqual(sorted(repaired), [(drifted, 5, 2), (emptied, 3, 0)])
+        self.assertEqual([self.seats(class_id) for class_id in (booked, drifted, emptied)],
+                         [(2, 2), (2, 2), (0, 0)])
+        self.assertEqual(reconcile_booked_counts(self.conn), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
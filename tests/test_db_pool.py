@@ -0,0 +1,232 @@
+import unittest
+import threading
+import time
+from db_pool import (FairCheckoutQueue, PoolMetrics, PoolTimeoutError, ConnectionPool,
+                     CircuitBreaker, CircuitOpenError)
+
+
+class TestFairCheckoutQueue(unittest.TestCase):
+    def test_acquire_without_contention_does_not_wait(self):
+        """Test free slots are handed out immediately"""
+        queue = FairCheckoutQueue(size=2, max_waiters=5)
+        self.assertEqual(queue.acquire(timeout=0.1), 0.0)
+        self.assertEqual(queue.acquire(timeout=0.1), 0.0)
+
+    def test_acquire_times_out_when_pool_busy(self):
+        """Test a waiter gives up after the checkout timeout"""
+        queue = FairCheckoutQueue(size=1, max_waiters=5)
+        queue.acquire(timeout=0.1)
+        start = time.monotonic()
+        with self.assertRaises(PoolTimeoutError):
+            queue.acquire(timeout=0.05)
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+        self.assertEqual(queue.waiting, 0)
+
+    def test_full_wait_queue_rejects_immediately(self):
+        """Test the wait queue is bounded"""
+        queue = FairCheckoutQueue(size=1, max_waiters=0)
+        queue.acquire(timeout=0.1)
+        with self.assertRaises(PoolTimeoutError):
+            queue.acquire(timeout=5)
+
+    def test_waiters_are_served_in_arrival_order(self):
+        """Test released slots go to the longest-waiting thread"""
+        queue = FairCheckoutQueue(size=1, max_waiters=10)
+        queue.acquire(timeout=0.1)
+        order = []
+
+        def worker(n):
+            queue.acquire(timeout=2)
+            order.append(n)
+            queue.release()
+
+        threads = []
+        for n in range(5):
+            t = threading.Thread(target=worker, args=(n,))
+            t.start()
+            threads.append(t)
+            # Make sure each thread is queued before starting the next
+            while queue.waiting < n + 1:
+                time.sleep(0.001)
+
+        queue.release()
+        for t in threads:
+            t.join(timeout=2)
+        self.assertEqual(order, [0, 1, 2, 3, 4])
+
+
+class TestPoolMetrics(unittest.TestCase):
+    def test_snapshot_counts_and_percentiles(self):
+        """Test counters and wait-time percentiles"""
+        metrics = PoolMetrics()
+        for waited in [0.0] * 90 + [0.01] * 9 + [0.5]:
+            metrics.record_checkout(waited)
+        metrics.record_release()
+        metrics.record_timeout()
+
+        stats = metrics.snapshot()
+        self.assertEqual(stats['checkouts'], 100)
+        self.assertEqual(stats['waits'], 10)
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['in_use'], 99)
+        self.assertEqual(stats['wait_ms']['p50'], 0.0)
+        self.assertEqual(stats['wait_ms']['p95'], 10.0)
+        self.assertEqual(stats['wait_ms']['max'], 500.0)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        """Test the breaker fails fast once the failure threshold is reached"""
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        start = time.monotonic()
+        with self.assertRaises(CircuitOpenError) as caught:
+            breaker.allow()
+        self.assertLess(time.monotonic() - start, 0.005)
+        self.assertGreater(caught.exception.retry_after, 29)
+        self.assertIsInstance(caught.exception, PoolTimeoutError)
+        self.assertEqual(breaker.snapshot()['rejected'], 1)
+
+    def test_single_probe_after_cool_down(self):
+        """Test only one call is let through half-open, and its success closes the breaker"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        with self.assertRaises(CircuitOpenError):
+            breaker.allow()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertFalse(breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        """Test a failed probe starts a new cool-down"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.allow()
+        self.assertEqual(breaker.snapshot()['opens'], 2)
+
+
+class FakeConnection:
+    """Stand-in for a mysql.connector connection"""
+
+    def __init__(self):
+        self.connected = True
+        self.in_transaction = False
+        self.pings = 0
+        self.rolled_back = False
+
+    def is_connected(self):
+        return self.connected
+
+    def ping(self):
+        self.pings += 1
+        if not self.connected:
+            raise ConnectionError("gone away")
+
+    def rollback(self):
+        self.rolled_back = True
+        self.in_transaction = False
+
+    def close(self):
+        self.connected = False
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+    def make_pool(self, **kwargs):
+        kwargs.setdefault('size', 2)
+        kwargs.setdefault('checkout_timeout', 0.05)
+        kwargs.setdefault('maintenance_interval', 3600)
+        pool = ConnectionPool(self.connect, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_connections_are_reused(self):
+        """Test a released connection is handed out again without reconnecting"""
+        pool = self.make_pool()
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire()._cnx, conn._cnx)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_pool_size_is_enforced(self):
+        """Test checkout blocks and times out once every connection is in use"""
+        pool = self.make_pool(size=1)
+        pool.acquire()
+        with self.assertRaises(PoolTimeoutError):
+            pool.acquire()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_open_transaction_is_rolled_back_on_release(self):
+        """Test a connection is returned to the pool without a pending transaction"""
+        pool = self.make_pool()
+        conn = pool.acquire()
+        conn._cnx.in_transaction = True
+        pool.release(conn)
+        self.assertTrue(conn._cnx.rolled_back)
+
+    def test_recently_used_connection_is_not_pinged(self):
+        """Test the liveness ping only happens after the idle threshold"""
+        pool = self.make_pool(ping_after=60)
+        conn = pool.acquire()
+        pool.release(conn)
+        pool.acquire()
+        self.assertEqual(conn.pings, 0)
+
+    def test_dead_idle_connection_is_replaced_on_checkout(self):
+        """Test a connection that fails its ping is discarded"""
+        pool = self.make_pool(ping_after=0)
+        conn = pool.acquire()
+        pool.release(conn)
+        conn._cnx.connected = False
+        fresh = pool.acquire()
+        self.assertIsNot(fresh._cnx, conn._cnx)
+        self.assertEqual(pool.stats()['ping_failures'], 1)
+        self.assertEqual(pool.stats()['open'], 1)
+
+    def test_maintain_replaces_aged_connections(self):
+        """Test connections past max_lifetime are swapped in the background"""
+        pool = self.make_pool(max_lifetime=0.01)
+        conn = pool.acquire()
+        pool.release(conn)
+        time.sleep(0.02)
+        pool.maintain()
+
+        stats = pool.stats()
+        self.assertFalse(conn._cnx.connected)
+        self.assertEqual(stats['recycled'], 1)
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(stats['open'], 1)
+
+    def test_maintain_closes_idle_connections(self):
+        """Test connections unused past idle_timeout are closed"""
+        pool = self.make_pool(idle_timeout=0.01)
+        conn = pool.acquire()
+        pool.release(conn)
+        time.sleep(0.02)
+        pool.maintain()
+        self.assertFalse(conn._cnx.connected)
+        self.assertEqual(pool.stats()['open'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+from flask import Flask
+import db_queries
+from db_queries import InstrumentedCursor, QueryStats, normalize_sql, redact_params
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.rowcount = -1
+        self.closed = False
+        self.lastrowid = 7
+
+    def execute(self, operation, params=None, multi=False):
+        self.rowcount = 0
+
+    def fetchone(self):
+        if not self.rows:
+            return None
+        self.rowcount += 1
+        return self.rows.pop(0)
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        self.rowcount += len(rows)
+        return rows
+
+    def close(self):
+        self.closed = True
+
+
+class TestNormalizeSql(unittest.TestCase):
+    def test_literals_and_placeholders_collapse(self):
+        self.assertEqual(
+            normalize_sql("SELECT *\n  FROM users\n  WHERE id = %s AND role = 'admin' LIMIT 10"),
+            "SELECT * FROM users WHERE id = ? AND role = ? LIMIT ?"
+        )
+
+    def test_in_lists_collapse(self):
+        self.assertEqual(normalize_sql("DELETE FROM t WHERE id IN (%s, %s, %s)"),
+                         "DELETE FROM t WHERE id IN (...)")
+        self.assertEqual(normalize_sql("DELETE FROM t WHERE id IN (1,2)"),
+                         "DELETE FROM t WHERE id IN (...)")
+
+    def test_identifiers_with_digits_are_kept(self):
+        self.assertEqual(normalize_sql("SAVEPOINT sp_1"), "SAVEPOINT sp_1")
+
+    def test_redaction_keeps_only_types(self):
+        self.assertEqual(redact_params(('a@b.c', 5, None)), '(str, int, NoneType)')
+        self.assertEqual(redact_params({'email': 'a@b.c'}), '{email: str}')
+        self.assertNotIn('a@b.c', redact_params(['a@b.c']))
+
+
+class TestQueryStats(unittest.TestCase):
+    def test_statements_aggregate_by_normalized_text(self):
+        stats = QueryStats(slow_query_ms=1000)
+        stats.record_statement("SELECT * FROM users WHERE id = %s", (1,), 0.002, 1)
+        stats.record_statement("SELECT *  FROM users WHERE id = 5", None, 0.004, 1)
+        [entry] = stats.snapshot()['statements']
+        self.assertEqual(entry['sql'], "SELECT * FROM users WHERE id = ?")
+        self.assertEqual(entry['count'], 2)
+        self.assertEqual(entry['rows'], 2)
+        self.assertEqual(entry['max_ms'], 4.0)
+
+    def test_distinct_statements_are_bounded(self):
+        stats = QueryStats(slow_query_ms=1000, max_statements=2)
+        for table in ('a', 'b', 'c', 'd'):
+            stats.record_statement(f"SELECT * FROM {table}", None, 0.001, 0)
+        sql = sorted(entry['sql'] for entry in stats.snapshot()['statements'])
+        self.assertEqual(sql, ['(other)', 'SELECT * FROM a', 'SELECT * FROM b'])
+
+    def test_slow_statements_are_logged_without_values(self):
+        stats = QueryStats(slow_query_ms=10)
+        with self.assertLogs('slow_queries', level='WARNING') as logs:
+            stats.record_statement("SELECT * FROM users WHERE email = %s", ('a@b.c',), 0.05, 1)
+        [message] = logs.output
+        self.assertIn("WHERE email = ?", message)
+        self.assertIn("params=(str)", message)
+        self.assertNotIn('a@b.c', message)
+
+    def test_endpoint_totals(self):
+        stats = QueryStats()
+        stats.record_request('admin.get_users', 3, 0.003)
+        stats.record_request('admin.get_users', 5, 0.005)
+        endpoint = stats.snapshot()['endpoints']['admin.get_users']
+        self.assertEqual(endpoint['requests'], 2)
+        self.assertEqual(endpoint['avg_queries'], 4)
+        self.assertEqual(endpoint['max_queries'], 5)
+
+
+class TestInstrumentedCursor(unittest.TestCase):
+    def setUp(self):
+        db_queries.configure(slow_query_ms=1000)
+        self.app = Flask(__name__)
+
+    def test_statement_is_recorded_with_fetched_rows(self):
+        cursor = InstrumentedCursor(FakeCursor([(1,), (2,), (3,)]))
+        cursor.execute("SELECT id FROM users WHERE role = %s", ('member',))
+        self.assertEqual(len(cursor.fetchall()), 3)
+        self.assertEqual(cursor.lastrowid, 7)
+        cursor.close()
+        [entry] = db_queries.query_stats()['statements']
+        self.assertEqual(entry['rows'], 3)
+        self.assertTrue(cursor._cursor.closed)
+
+    def test_iteration_fetches_through_the_wrapper(self):
+        cursor = InstrumentedCursor(FakeCursor([(1,), (2,)]))
+        cursor.execute("SELECT id FROM users")
+        self.assertEqual(list(cursor), [(1,), (2,)])
+
+    def test_request_counts_and_unclosed_cursors(self):
+        with self.app.test_request_context('/api/admin/users'):
+            cursor = InstrumentedCursor(FakeCursor([(1,)]))
+            cursor.execute("SELECT 1")
+            cursor.execute("SELECT 2")
+            cursor.fetchone()
+            queries = db_queries.current_request_queries()
+            self.assertEqual(queries.count, 2)
+            response = db_queries.add_debug_headers(self.app.response_class())
+            self.assertEqual(response.headers['X-DB-Query-Count'], '2')
+            # The second statement is only recorded when the request ends
+            self.assertEqual(sum(e['count'] for e in db_queries.query_stats()['statements']), 1)
+            db_queries.finish_request()
+        self.assertEqual(sum(e['count'] for e in db_queries.query_stats()['statements']), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import json
+from datetime import datetime, date, timezone
+from flask import Flask, jsonify
+from db_rows import RowSet, rowset_response, stream_rows_response
+
+
+class FakeCursor:
+    column_names = ('id', 'amount')
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.fetches = 0
+        self.closed = False
+
+    def fetchmany(self, size):
+        self.fetches += 1
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+    def close(self):
+        self.closed = True
+
+
+class TestRowSet(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        ctx = self.app.app_context()
+        ctx.push()
+        self.addCleanup(ctx.pop)
+
+    def assertMatchesJsonify(self, columns, rows):
+        rowset = RowSet(columns, rows)
+        expected = jsonify(rowset.as_dicts()).get_data(as_text=True)
+        self.assertEqual(rowset_response(rowset).get_data(as_text=True), expected)
+
+    def test_output_matches_jsonify(self):
+        """Test the fast encoder produces the same document as jsonify"""
+        self.assertMatchesJsonify(
+            ('name', 'id', 'membership_expiry', 'auto_payment'),
+            [('Zoë "Z" Smith', 1, datetime(2025, 3, 9, 14, 5, 7), 1),
+             ('Bob', 2, datetime(2024, 12, 31), 0)]
+        )
+
+    def test_mixed_and_null_columns(self):
+        """Test columns with NULLs, dates, floats and booleans fall back correctly"""
+        self.assertMatchesJsonify(
+            ('a', 'b', 'c', 'd'),
+            [(None, date(2025, 1, 2), 1.5, True),
+             ('x', None, None, False),
+             ('y', date(2025, 1, 3), 2.25, None)]
+        )
+
+    def test_aware_datetime(self):
+        """Test timezone-aware datetimes are converted to GMT like jsonify does"""
+        self.assertMatchesJsonify(('at',), [(datetime(2025, 1, 1, 12, tzinfo=timezone.utc),)])
+
+    def test_empty_result(self):
+        """Test an empty result is an empty JSON list"""
+        self.assertEqual(json.loads(rowset_response(RowSet(('id',), [])).get_data()), [])
+
+    def test_column_lookup(self):
+        """Test values can be read by column name without building dicts"""
+        rowset = RowSet(('id', 'name'), [(1, 'a')])
+        self.assertEqual(rowset.value(rowset.rows[0], 'name'), 'a')
+
+
+class TestStreamRowsResponse(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        ctx = self.app.test_request_context()
+        ctx.push()
+        self.addCleanup(ctx.pop)
+
+    def test_streams_valid_json_in_chunks(self):
+        """Test rows are fetched chunk by chunk and form one JSON array"""
+        cursor = FakeCursor((n, n * 2) for n in range(25))
+        response = stream_rows_response(cursor, chunk_size=10)
+        body = ''.join(response.response)
+        self.assertEqual(json.loads(body), [{'id': n, 'amount': n * 2} for n in range(25)])
+        self.assertEqual(cursor.fetches, 4)
+        self.assertTrue(cursor.closed)
+
+    def test_converters_and_empty_result(self):
+        """Test per-column converters are applied and no rows give an empty array"""
+        response = stream_rows_response(FakeCursor([(1, 5)]), converters={'amount': float})
+        self.assertEqual(json.loads(''.join(response.response)), [{'id': 1, 'amount': 5.0}])
+        response = stream_rows_response(FakeCursor([]))
+        self.assertEqual(json.loads(''.join(response.response)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from datetime import date, datetime
+from decimal import Decimal
+from mysql.connector import errors
+from db_sqlite import SQLiteDatabase, translate_sql
+
+
+class TestTranslateSql(unittest.TestCase):
+    def test_placeholders_outside_literals(self):
+        self.assertEqual(
+            translate_sql("SELECT * FROM t WHERE a = %s AND b = '%s' AND c = %(name)s"),
+            "SELECT * FROM t WHERE a = ? AND b = '%s' AND c = :name"
+        )
+
+    def test_now_and_curdate(self):
+        self.assertEqual(
+            translate_sql("SELECT 1 WHERE x > NOW() AND d = CURDATE()"),
+            "SELECT 1 WHERE x > datetime('now', 'localtime') AND d = date('now', 'localtime')"
+        )
+
+    def test_date_add_keeps_dates_as_dates(self):
+        self.assertEqual(
+            translate_sql("SELECT DATE_ADD(CURDATE(), INTERVAL %s DAY)"),
+            "SELECT date(date('now', 'localtime'), (?) || ' days')"
+        )
+        self.assertEqual(
+            translate_sql("SELECT DATE_SUB(NOW(), INTERVAL 24 HOUR)"),
+            "SELECT datetime(datetime('now', 'localtime'), -(24) || ' hours')"
+        )
+
+    def test_date_format_specifiers(self):
+        self.assertEqual(translate_sql("SELECT DATE_FORMAT(created_at, '%Y-%m %H:%i')"),
+                         "SELECT strftime('%Y-%m %H:%M', created_at)")
+        with self.assertRaises(ValueError):
+            translate_sql("SELECT DATE_FORMAT(created_at, '%W')")
+
+    def test_nested_calls_and_plain_parentheses(self):
+        self.assertEqual(
+            translate_sql("SELECT AVG(TIMESTAMPDIFF(MINUTE, a, b)) FROM t WHERE id IN (%s, %s)"),
+            "SELECT AVG(CAST((julianday(b) - julianday(a)) * 1440 AS INTEGER)) FROM t WHERE id IN (?, ?)"
+        )
+
+
+class TestSQLiteDatabase(unittest.TestCase):
+    def setUp(self):
+        self.db = SQLiteDatabase(':memory:')
+        self.conn = self.db.connect()
+        self.cursor = self.conn.cursor(dictionary=True)
+
+    def tearDown(self):
+        self.conn.close()
+        self.db.close()
+
+    def add_user(self, email='a@gym.com', **columns):
+        self.cursor.execute(
+            "INSERT INTO users (name, email, password, role, created_at) VALUES (%s, %s, %s, %s, %s)",
+            ('A', email, 'x', columns.get('role', 'member'), columns.get('created_at', datetime(2025, 1, 15, 10)))
+        )
+        return self.cursor.lastrowid
+
+    def test_schema_is_loaded_and_types_round_trip(self):
+        user_id = self.add_user(created_at='2025-01-15T10:30')
+        self.cursor.execute("""
+            INSERT INTO payments (user_id, amount, status, membership_duration, membership_expiry)
+            VALUES (%s, %s, 'Completed', 1, %s)
+        """, (user_id, Decimal('30.00'), date(2025, 2, 15)))
+        self.cursor.execute("""
+            SELECT u.created_at, p.amount, p.membership_expiry,
+                   DATE_FORMAT(u.created_at, '%Y-%m') AS month
+            FROM users u JOIN payments p ON p.user_id = u.id
+        """)
+        row = self.cursor.fetchone()
+        self.assertEqual(row['created_at'], datetime(2025, 1, 15, 10, 30))
+        self.assertEqual(row['amount'], Decimal('30.00'))
+        self.assertEqual(row['membership_expiry'], date(2025, 2, 15))
+        self.assertEqual(row['month'], '2025-01')
+        self.assertEqual(self.cursor.rowcount, 1)
+
+    def test_connections_share_the_database(self):
+        self.add_user()
+        other = self.db.connect()
+        cursor = other.cursor()
+        cursor.execute("SELECT email FROM users")
+        self.assertEqual(cursor.fetchall(), [('a@gym.com',)])
+        self.assertEqual(cursor.column_names, ('email',))
+        other.close()
+
+    def test_constraint_errors_use_mysql_types(self):
+        self.add_user()
+        with self.assertRaises(errors.IntegrityError) as caught:
+            self.add_user()
+        self.assertEqual(caught.exception.errno, 1062)
+        with self.assertRaises(errors.IntegrityError):
+            self.add_user('b@gym.com', role='owner')
+
+    def test_explicit_transactions(self):
+        self.conn.start_transaction()
+        self.add_user()
+        self.assertTrue(self.conn.in_transaction)
+        self.conn.rollback()
+        self.cursor.execute("SELECT COUNT(*) AS users FROM users")
+        self.assertEqual(self.cursor.fetchone()['users'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
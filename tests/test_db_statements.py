@@ -0,0 +1,86 @@
+import unittest
+from flask import Flask
+from mysql.connector.connection import MySQLConnection
+from db_pool import PooledConnection
+from db_statements import StatementCache, ReusablePreparedCursor, query_prepared
+
+
+class FakeCursor:
+    def __init__(self, options):
+        self.options = options
+        self.executed = []
+        self.closed = False
+        self.column_names = ('id', 'name')
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return [(1, 'Yoga')]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    """Stands in for a C extension (or SQLite) connection"""
+
+    def __init__(self):
+        self.cursors = []
+
+    def cursor(self, **options):
+        cursor = FakeCursor(options)
+        self.cursors.append(cursor)
+        return cursor
+
+
+class FakePureConnection(FakeConnection, MySQLConnection):
+    """A pure-Python MySQLConnection that never connects"""
+
+    def __init__(self):
+        FakeConnection.__init__(self)
+
+
+class TestStatementCache(unittest.TestCase):
+    def test_hit_reuses_cursor_and_eviction_closes_oldest(self):
+        cnx = FakeConnection()
+        cache = StatementCache(cnx, maxsize=2)
+        first = cache.cursor("SELECT 1")
+        self.assertIs(cache.cursor("SELECT 1"), first)
+        second = cache.cursor("SELECT 2")
+        # SELECT 1 was used more recently than SELECT 2, so SELECT 2 goes
+        cache.cursor("SELECT 1")
+        cache.cursor("SELECT 3")
+        self.assertEqual(len(cache), 2)
+        self.assertTrue(second.closed)
+        self.assertFalse(first.closed)
+        self.assertEqual(len(cnx.cursors), 3)
+
+    def test_cursor_type_follows_connection_class(self):
+        cext = StatementCache(FakeConnection(), maxsize=2).cursor("SELECT 1")
+        self.assertEqual(cext.options, {'prepared': True})
+        pure = StatementCache(FakePureConnection(), maxsize=2).cursor("SELECT 1")
+        self.assertEqual(pure.options, {'cursor_class': ReusablePreparedCursor})
+
+
+class TestQueryPrepared(unittest.TestCase):
+    def setUp(self):
+        self.context = Flask(__name__).app_context()
+        self.context.push()
+
+    def tearDown(self):
+        self.context.pop()
+
+    def test_pooled_connection_keeps_its_statements(self):
+        cnx = FakeConnection()
+        conn = PooledConnection(cnx)
+        sql = "SELECT id, name FROM classes WHERE id = %s"
+        self.assertEqual(query_prepared(conn, sql, (1,), dictionary=True), [{'id': 1, 'name': 'Yoga'}])
+        self.assertEqual(query_prepared(conn, sql, [2]), [(1, 'Yoga')])
+        [cursor] = cnx.cursors
+        self.assertEqual(cursor.executed, [(sql, (1,)), (sql, (2,))])
+        self.assertFalse(cursor.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+from flask import Flask
+from mysql.connector import errors
+from config import TRANSACTION_CONFIG
+from db_pool import PooledConnection
+from db_sqlite import SQLiteDatabase
+from db_transactions import run_transaction, transaction, transaction_stats
+
+
+def deadlock():
+    return errors.DatabaseError(msg="Deadlock found when trying to get lock", errno=1213)
+
+
+class TestRunTransaction(unittest.TestCase):
+    def setUp(self):
+        self.context = Flask(__name__).app_context()
+        self.context.push()
+        self.db = SQLiteDatabase(':memory:')
+        self.conn = PooledConnection(self.db.connect())
+        # Retry without sleeping
+        self.config = dict(TRANSACTION_CONFIG)
+        TRANSACTION_CONFIG.update(base_backoff=0, max_backoff=0)
+
+    def tearDown(self):
+        TRANSACTION_CONFIG.update(self.config)
+        self.conn.close()
+        self.db.close()
+        self.context.pop()
+
+    def add_class(self, cursor, name):
+        cursor.execute("INSERT INTO classes (class_name, capacity) VALUES (%s, 10)", (name,))
+
+    def class_names(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT class_name FROM classes ORDER BY id")
+        names = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        return names
+
+    def test_deadlock_is_retried_from_the_start(self):
+        calls = []
+
+        def work(cursor):
+            calls.append(1)
+            self.add_class(cursor, f"Spin {len(calls)}")
+            if len(calls) == 1:
+                raise deadlock()
+            return "done"
+
+        before = transaction_stats()
+        self.assertEqual(run_transaction(self.conn, work), "done")
+        after = transaction_stats()
+        self.assertEqual(len(calls), 2)
+        # The first attempt's insert was rolled back
+        self.assertEqual(self.class_names(), ["Spin 2"])
+        self.assertEqual(after['deadlocks'] - before['deadlocks'], 1)
+        self.assertEqual(after['retries'] - before['retries'], 1)
+
+    def test_gives_up_after_max_retries(self):
+        calls = []
+
+        def work(cursor):
+            calls.append(1)
+            raise deadlock()
+
+        with self.assertRaises(errors.DatabaseError):
+            run_transaction(self.conn, work)
+        self.assertEqual(len(calls), TRANSACTION_CONFIG['max_retries'] + 1)
+
+    def test_other_errors_are_not_retried(self):
+        calls = []
+
+        def work(cursor):
+            calls.append(1)
+            self.add_class(cursor, "Spin")
+            raise errors.IntegrityError(msg="Duplicate entry", errno=1062)
+
+        with self.assertRaises(errors.IntegrityError):
+            run_transaction(self.conn, work)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.class_names(), [])
+        self.assertEqual(self.conn.tx_depth, 0)
+
+    def test_inner_failure_rolls_back_to_its_savepoint(self):
+        def inner(cursor):
+            self.add_class(cursor, "Rowing")
+            raise ValueError("rowing room closed")
+
+        def outer(cursor):
+            self.add_class(cursor, "Spin")
+            with self.assertRaises(ValueError):
+                run_transaction(self.conn, inner)
+            self.assertEqual(self.conn.tx_depth, 1)
+            self.add_class(cursor, "Yoga")
+
+        before = transaction_stats()
+        run_transaction(self.conn, outer)
+        self.assertEqual(self.class_names(), ["Spin", "Yoga"])
+        self.assertEqual(transaction_stats()['committed'] - before['committed'], 1)
+
+    def test_deadlock_inside_enclosing_transaction_is_left_to_it(self):
+        calls = []
+
+        def inner(cursor):
+            calls.append(1)
+            raise deadlock()
+
+        with self.assertRaises(errors.DatabaseError):
+            with transaction(self.conn) as cursor:
+                self.add_class(cursor, "Spin")
+                run_transaction(self.conn, inner)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.class_names(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
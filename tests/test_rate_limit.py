@@ -0,0 +1,64 @@
+import unittest
+import os
+import time
+import tempfile
+import multiprocessing
+from rate_limit import SharedMemoryStorage
+
+
+def _hit(path, key, times):
+    storage = SharedMemoryStorage(f"shm://{path}", slots=64)
+    for _ in range(times):
+        storage.incr(key, 60)
+
+
+class TestSharedMemoryStorage(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self.storage = SharedMemoryStorage(f"shm://{self.path}", slots=64)
+
+    def test_incr_counts_within_window(self):
+        """Test hits accumulate per key"""
+        self.assertEqual(self.storage.incr('a', 60), 1)
+        self.assertEqual(self.storage.incr('a', 60, amount=2), 3)
+        self.assertEqual(self.storage.get('a'), 3)
+        self.assertEqual(self.storage.get('b'), 0)
+        self.assertAlmostEqual(self.storage.get_expiry('a'), time.time() + 60, delta=1)
+
+    def test_window_expires(self):
+        """Test a counter starts over once its window has passed"""
+        self.storage.incr('a', 0.01)
+        time.sleep(0.02)
+        self.assertEqual(self.storage.get('a'), 0)
+        self.assertEqual(self.storage.incr('a', 60), 1)
+
+    def test_clear_and_reset(self):
+        """Test counters can be cleared individually and all at once"""
+        self.storage.incr('a', 60)
+        self.storage.incr('b', 60)
+        self.storage.clear('a')
+        self.assertEqual(self.storage.get('a'), 0)
+        self.assertEqual(self.storage.get('b'), 1)
+        self.storage.reset()
+        self.assertEqual(self.storage.get('b'), 0)
+
+    def test_full_table_reuses_slots(self):
+        """Test more keys than slots never fails a hit"""
+        for n in range(500):
+            self.assertEqual(self.storage.incr(f"key{n}", 60), 1)
+
+    def test_counters_are_shared_across_processes(self):
+        """Test workers on the same host see each other's hits"""
+        ctx = multiprocessing.get_context('fork')
+        workers = [ctx.Process(target=_hit, args=(self.path, 'shared', 50)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=10)
+        self.assertEqual(self.storage.get('shared'), 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from flask import Flask
+from schedule_index import ScheduleIndex
+
+
+class FakeSchedule:
+    """Stands in for the classes table; counts how often it is loaded"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.loads = 0
+        self.fail = False
+
+    def __call__(self):
+        if self.fail:
+            raise ConnectionError("database unavailable")
+        self.loads += 1
+        return list(self.rows)
+
+
+class TestScheduleIndex(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.context = self.app.app_context()
+        self.context.push()
+        fd, self.version_path = tempfile.mkstemp()
+        os.close(fd)
+        self.start = datetime(2030, 1, 6, 8, 0)
+        self.schedule = FakeSchedule([
+            (n + 1, f"Class {n}", 10 + n % 2, f"Trainer {n % 2}",
+             self.start + timedelta(hours=n), 20, n)
+            for n in range(10)
+        ])
+
+    def tearDown(self):
+        self.context.pop()
+        os.remove(self.version_path)
+
+    def index(self, **options):
+        return ScheduleIndex(self.schedule, self.version_path, **options)
+
+    def ids(self, page):
+        encoded, _ = page
+        return [json.loads(item)['id'] for item in encoded]
+
+    def test_window_and_trainer_lookups(self):
+        index = self.index()
+        self.assertEqual(self.ids(index.lookup()), list(range(1, 11)))
+        window = index.lookup(self.start + timedelta(hours=2), self.start + timedelta(hours=5))
+        self.assertEqual(self.ids(window), [3, 4, 5])
+        self.assertEqual(self.ids(index.lookup(self.start + timedelta(hours=5), trainer_id=11)), [6, 8, 10])
+        self.assertEqual(index.lookup(trainer_id=99), ([], None))
+        self.assertEqual(self.schedule.loads, 1)
+
+    def test_pages_follow_the_cursor(self):
+        # Two classes at the same time are ordered by id
+        self.schedule.rows.append((11, "Class 10", 10, "Trainer 0", self.start + timedelta(hours=4), 20, 0))
+        self.schedule.rows.sort(key=lambda row: (row[4], row[0]))
+        index = self.index()
+        encoded, last = index.lookup(limit=5)
+        self.assertEqual(len(encoded), 5)
+        self.assertEqual(last, (self.start + timedelta(hours=4), 5))
+        self.assertEqual(self.ids(index.lookup(after=last, limit=5)), [11, 6, 7, 8, 9])
+        self.assertEqual(self.ids(index.lookup(after=(self.start + timedelta(hours=4), 11))), [6, 7, 8, 9, 10])
+        self.assertEqual(index.lookup(after=(self.start + timedelta(hours=5), 6), limit=4)[1], None)
+        encoded, last = index.lookup(trainer_id=10, limit=2)
+        self.assertEqual(last, (self.start + timedelta(hours=2), 3))
+        self.assertEqual(self.ids(index.lookup(trainer_id=10, after=last, limit=2)), [5, 11])
+
+    def test_day_summary(self):
+        # Class n is at 08:00 + n hours on 2030-01-06 with n of 20 seats booked
+        self.schedule.rows.append((11, "Late", 10, "Trainer 0", datetime(2030, 1, 7, 9, 30), 5, 5))
+        index = self.index()
+        summary = index.day_summary(self.start, datetime(2030, 2, 1), hourly=True)
+        first, second = summary['days']
+        self.assertEqual((first['date'], first['classes'], first['seats'], first['seats_remaining']),
+                         ('2030-01-06', 10, 200, 155))
+        self.assertEqual(first['hours'][3], {'hour': 11, 'classes': 1, 'seats': 20, 'seats_remaining': 17})
+        self.assertEqual(second, {'date': '2030-01-07', 'classes': 1, 'seats': 5, 'seats_remaining': 0,
+                                  'hours': [{'hour': 9, 'classes': 1, 'seats': 5, 'seats_remaining': 0}]})
+        # Filters narrow the days but not the choices offered for them
+        summary = index.day_summary(self.start, datetime(2030, 1, 7), trainer_id=11, class_name="Class 3")
+        self.assertEqual(summary['days'], [{'date': '2030-01-06', 'classes': 1, 'seats': 20, 'seats_remaining': 17}])
+        self.assertEqual(summary['trainers'], [{'id': 10, 'name': 'Trainer 0'}, {'id': 11, 'name': 'Trainer 1'}])
+        self.assertEqual(len(summary['class_names']), 10)
+
+    def test_class_change_elsewhere_reloads_before_next_read(self):
+        index, other_worker = self.index(), self.index()
+        index.lookup()
+        self.schedule.rows.pop()
+        other_worker.classes_changed()
+        self.assertEqual(len(index.lookup()[0]), 9)
+        self.assertEqual(self.schedule.loads, 2)
+
+    def test_bookings_elsewhere_reload_after_refresh_interval(self):
+        index, other_worker = self.index(refresh_interval=0.05), self.index()
+        index.lookup()
+        other_worker.bookings_changed()
+        index.lookup()
+        self.assertEqual(self.schedule.loads, 1)
+        time.sleep(0.06)
+        index.lookup()
+        self.assertEqual(self.schedule.loads, 2)
+
+    def test_own_booking_is_applied_in_place(self):
+        index = self.index(refresh_interval=0)
+        index.lookup()
+        index.booking_changed(3, 1, time.monotonic())
+        [booked], _ = index.lookup(self.start + timedelta(hours=2), self.start + timedelta(hours=3))
+        self.assertEqual(json.loads(booked)['current_bookings'], 3)
+        self.assertEqual(self.schedule.loads, 1)
+
+    def test_failed_reload_keeps_serving_loaded_schedule(self):
+        index = self.index(max_age=0)
+        index.lookup()
+        self.schedule.fail = True
+        with self.assertLogs('schedule_index', level='WARNING'):
+            self.assertEqual(len(index.lookup()[0]), 10)
+        self.assertEqual(index.stats()['reload_errors'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import time
+from throttle import LoginThrottle
+
+
+class TestLoginThrottle(unittest.TestCase):
+    def test_bucket_allows_capacity_then_rejects(self):
+        """Test a key gets its burst of attempts and then must wait"""
+        throttle = LoginThrottle(capacity=3, refill_per_second=1)
+        self.assertEqual([throttle.check('a') for _ in range(3)], [0, 0, 0])
+        self.assertGreater(throttle.check('a'), 0)
+        self.assertEqual(throttle.check('b'), 0)
+
+    def test_bucket_refills(self):
+        """Test attempts come back at the refill rate"""
+        throttle = LoginThrottle(capacity=1, refill_per_second=100)
+        throttle.check('a')
+        time.sleep(0.02)
+        self.assertEqual(throttle.check('a'), 0)
+
+    def test_failures_back_off_exponentially(self):
+        """Test lockouts double after the free failures are used up"""
+        throttle = LoginThrottle(capacity=100, refill_per_second=1, free_failures=2,
+                                 base_backoff=10, max_backoff=25)
+        throttle.record_failure('a')
+        throttle.record_failure('a')
+        self.assertEqual(throttle.check('a'), 0)
+
+        throttle.record_failure('a')
+        self.assertAlmostEqual(throttle.check('a'), 10, delta=0.5)
+        throttle.record_failure('a')
+        self.assertAlmostEqual(throttle.check('a'), 20, delta=0.5)
+        throttle.record_failure('a')
+        self.assertAlmostEqual(throttle.check('a'), 25, delta=0.5)
+
+    def test_success_clears_failures(self):
+        """Test a successful login resets the key"""
+        throttle = LoginThrottle(capacity=100, refill_per_second=1, free_failures=0)
+        throttle.record_failure('a')
+        throttle.record_success('a')
+        self.assertEqual(throttle.check('a'), 0)
+
+    def test_table_is_bounded_by_evicting_least_recently_used(self):
+        """Test new keys push out the keys that have been idle longest"""
+        throttle = LoginThrottle(capacity=5, refill_per_second=1, max_entries=10)
+        for n in range(10):
+            throttle.check(n)
+        throttle.check(0)
+        for n in range(10, 15):
+            throttle.check(n)
+        self.assertEqual(len(throttle), 10)
+        # Key 0 was used again, so keys 1-5 went first and 0 kept its count
+        throttle.check(0)
+        throttle.check(0)
+        throttle.check(0)
+        self.assertGreater(throttle.check(0), 0)
+        self.assertEqual([throttle.check(1) for _ in range(5)], [0] * 5)
+
+    def test_locked_out_key_survives_a_full_table(self):
+        """Test cycling through junk keys cannot lift a lockout"""
+        throttle = LoginThrottle(capacity=100, refill_per_second=1, free_failures=0,
+                                 base_backoff=60, max_entries=100)
+        throttle.record_failure('victim@gym.com')
+        for n in range(1000):
+            throttle.check(f'junk{n}@gym.com')
+        self.assertGreater(throttle.check('victim@gym.com'), 0)
+        self.assertEqual(len(throttle), 100)
+
+    def test_new_key_on_full_table_stays_fast(self):
+        """Test a full table does not make each new key rescan it"""
+        throttle = LoginThrottle(capacity=5, refill_per_second=0.01, max_entries=10000)
+        for n in range(10000):
+            throttle.check(n)
+        start = time.perf_counter()
+        for n in range(10000, 20000):
+            throttle.check(n)
+        self.assertLess((time.perf_counter() - start) / 10000, 0.0005)
+        self.assertEqual(len(throttle), 10000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from tunnel_manager import TunnelManager, TunnelUnavailableError, TunnelStats
+
+
+class FakeForwarder:
+    def __init__(self, port):
+        self.local_bind_port = port
+        self.is_active = True
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+        self.is_active = False
+
+
+class FakeTunnelManager(TunnelManager):
+    """TunnelManager whose forwarders are fakes and whose monitor never runs"""
+
+    def __init__(self, count, fail=()):
+        super().__init__('ssh.example.com', 'gym', '/nonexistent.pem', ('db', 3306),
+                         count=count, check_interval=3600)
+        self.fail = set(fail)
+        self.opened = 0
+
+    def _open(self, index):
+        if index in self.fail:
+            raise OSError("ssh connect failed")
+        self.opened += 1
+        return FakeForwarder(10000 + index + 100 * self.opened)
+
+
+class TestTunnelManager(unittest.TestCase):
+    def make_manager(self, count=2, fail=()):
+        manager = FakeTunnelManager(count, fail)
+        self.addCleanup(manager.close)
+        return manager
+
+    def test_connections_are_spread_round_robin(self):
+        """Test consecutive endpoints alternate between forwarders"""
+        manager = self.make_manager(count=2)
+        ports = [manager.endpoint()[1] for _ in range(4)]
+        self.assertEqual(len(set(ports)), 2)
+        self.assertEqual(ports[:2], ports[2:])
+
+    def test_dead_forwarder_is_skipped(self):
+        """Test new connections avoid a forwarder that is down"""
+        manager = self.make_manager(count=2)
+        manager.endpoint()
+        manager._forwarders[0].is_active = False
+        live_port = manager._forwarders[1].local_bind_port
+        self.assertEqual({manager.endpoint()[1] for _ in range(4)}, {live_port})
+
+    def test_no_live_forwarder_fails_fast(self):
+        """Test requests do not wait on a reconnect"""
+        manager = self.make_manager(count=1)
+        manager.endpoint()
+        manager._forwarders[0].is_active = False
+        with self.assertRaises(TunnelUnavailableError):
+            manager.endpoint()
+
+    def test_partial_startup_is_tolerated(self):
+        """Test one failed forwarder at startup does not block the others"""
+        manager = self.make_manager(count=2, fail={0})
+        self.assertEqual(manager.endpoint()[0], '127.0.0.1')
+
+    def test_check_replaces_dead_forwarder(self):
+        """Test the monitor swaps in a new forwarder and counts the reconnect"""
+        manager = self.make_manager(count=1)
+        manager.endpoint()
+        old = manager._forwarders[0]
+        old.is_active = False
+        manager._check(0)
+        self.assertIsNot(manager._forwarders[0], old)
+        self.assertTrue(old.stopped)
+        self.assertEqual(manager.snapshot()[0]['reconnects'], 1)
+        self.assertTrue(manager.snapshot()[0]['active'])
+
+
+class TestTunnelStats(unittest.TestCase):
+    def test_snapshot(self):
+        """Test byte, channel and round-trip counters"""
+        stats = TunnelStats()
+        stats.channel_opened()
+        stats.add_bytes(100, 2000)
+        stats.record_rtt(0.004)
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['bytes_out'], 100)
+        self.assertEqual(snapshot['bytes_in'], 2000)
+        self.assertEqual(snapshot['active_channels'], 1)
+        self.assertEqual(snapshot['rtt_ms']['last'], 4.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LoginThrottle:
+    """Per-key token bucket with exponential backoff after repeated failures.
+
+    Each key (an email address or client IP) gets ``capacity`` attempts that
+    refill at ``refill_per_second``. After ``free_failures`` consecutive
+    failed attempts the key is locked out for ``base_backoff`` seconds,
+    doubling with every further failure up to ``max_backoff``. Failures are
+    forgotten after ``failure_window`` seconds without a new one.
+
+    State is one small list per key, kept in least recently used order. Once
+    the table holds ``max_entries`` keys, each new key evicts the least
+    recently used one that is not locked out, so a check is a dict lookup and
+    a little arithmetic under a lock however full the table is.
+    """
+
+    # Indexes into each entry list
+    _TOKENS, _UPDATED, _FAILURES, _BLOCKED_UNTIL, _LAST_FAILURE = range(5)
+
+    # Locked-out keys passed over per eviction before the table may grow instead
+    _EVICTION_SCAN = 8
+
+    def __init__(self, capacity, refill_per_second, free_failures=3, base_backoff=1.0,
+                 max_backoff=300.0, failure_window=900.0, max_entries=100000):
+        self._capacity = capacity
+        self._refill = refill_per_second
+        self._free_failures = free_failures
+        self._base_backoff = base_backoff
+        self._max_backoff = max_backoff
+        self._failure_window = failure_window
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def check(self, key):
+        """Consume one attempt for ``key``.
+
+        Returns 0 if the attempt is allowed, otherwise the number of seconds
+        the caller should wait before retrying.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self._max_entries:
+                    self._evict(now)
+                self._entries[key] = [self._capacity - 1, now, 0, 0.0, 0.0]
+                return 0
+            self._entries.move_to_end(key)
+
+            if entry[self._BLOCKED_UNTIL] > now:
+                return entry[self._BLOCKED_UNTIL] - now
+
+            tokens = min(self._capacity,
+                         entry[self._TOKENS] + (now - entry[self._UPDATED]) * self._refill)
+            entry[self._UPDATED] = now
+            if tokens < 1:
+                entry[self._TOKENS] = tokens
+                return (1 - tokens) / self._refill
+            entry[self._TOKENS] = tokens - 1
+            return 0
+
+    def record_failure(self, key):
+        """Count a failed attempt, locking the key out once past the free allowance"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self._max_entries:
+                    self._evict(now)
+                entry = self._entries[key] = [self._capacity, now, 0, 0.0, 0.0]
+            else:
+                self._entries.move_to_end(key)
+            if now - entry[self._LAST_FAILURE] > self._failure_window:
+                entry[self._FAILURES] = 0
+            entry[self._FAILURES] += 1
+            entry[self._LAST_FAILURE] = now
+
+            excess = entry[self._FAILURES] - self._free_failures
+            if excess > 0:
+                backoff = min(self._max_backoff, self._base_backoff * 2 ** (excess - 1))
+                entry[self._BLOCKED_UNTIL] = now + backoff
+
+    def record_success(self, key):
+        """Forget a key's failures after a successful attempt"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evict(self, now):
+        """Drop the least recently used key that is not locked out.
+
+        A locked-out key is moved to the back instead, so cycling through new
+        keys can never push it out of the table and lift its lockout. If only
+        locked-out keys turn up, nothing is dropped and the table grows past
+        max_entries until their lockouts end.
+        """
+        entries = self._entries
+        for _ in range(min(self._EVICTION_SCAN, len(entries))):
+            key, entry = entries.popitem(last=False)
+            if entry[self._BLOCKED_UNTIL] <= now:
+                return
+            entries[key] = entry
@@ -0,0 +1,240 @@
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from select import select
+
+import paramiko
+from sshtunnel import SSHTunnelForwarder, _ForwardHandler
+
+logger = logging.getLogger(__name__)
+
+# sshtunnel copies 1 KiB per recv, which caps throughput on large result sets
+_BUFFER_SIZE = 64 * 1024
+
+
+class TunnelUnavailableError(ConnectionError):
+    """Raised when no SSH forwarder is up to carry a new connection"""
+    pass
+
+
+class TunnelStats:
+    """Byte, channel and round-trip counters for one forwarder"""
+
+    def __init__(self, window=100):
+        self._lock = threading.Lock()
+        self._rtts = deque(maxlen=window)
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.channels = 0
+        self.active_channels = 0
+        self.reconnects = 0
+
+    def add_bytes(self, sent, received):
+        with self._lock:
+            self.bytes_out += sent
+            self.bytes_in += received
+
+    def channel_opened(self):
+        with self._lock:
+            self.channels += 1
+            self.active_channels += 1
+
+    def channel_closed(self):
+        with self._lock:
+            self.active_channels -= 1
+
+    def record_reconnect(self):
+        with self._lock:
+            self.reconnects += 1
+
+    def record_rtt(self, seconds):
+        with self._lock:
+            self._rtts.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            rtts = sorted(self._rtts)
+            return {
+                'bytes_out': self.bytes_out,
+                'bytes_in': self.bytes_in,
+                'channels': self.channels,
+                'active_channels': self.active_channels,
+                'reconnects': self.reconnects,
+                'rtt_ms': {
+                    'last': round(self._rtts[-1] * 1000, 3) if rtts else None,
+                    'p50': round(rtts[len(rtts) // 2] * 1000, 3) if rtts else None,
+                    'max': round(rtts[-1] * 1000, 3) if rtts else None,
+                },
+            }
+
+
+class _CountingForwardHandler(_ForwardHandler):
+    """sshtunnel's handler with larger buffers and byte counting"""
+
+    stats = None
+
+    def handle(self):
+        self.stats.channel_opened()
+        try:
+            super().handle()
+        finally:
+            self.stats.channel_closed()
+
+    def _redirect(self, chan):
+        while chan.active:
+            rqst, _, _ = select([self.request, chan], [], [], 5)
+            sent = received = 0
+            if self.request in rqst:
+                data = self.request.recv(_BUFFER_SIZE)
+                if not data:
+                    break
+                chan.sendall(data)
+                sent = len(data)
+            if chan in rqst:
+                if not chan.recv_ready():
+                    break
+                data = chan.recv(_BUFFER_SIZE)
+                self.request.sendall(data)
+                received = len(data)
+            self.stats.add_bytes(sent, received)
+
+
+class _CountingForwarder(SSHTunnelForwarder):
+    def __init__(self, *args, stats, **kwargs):
+        self._stats = stats
+        super().__init__(*args, **kwargs)
+
+    def _make_ssh_forward_handler_class(self, remote_address_):
+        base = super()._make_ssh_forward_handler_class(remote_address_)
+        return type('Handler', (_CountingForwardHandler, base), {'stats': self._stats})
+
+
+class TunnelManager:
+    """Several SSH forwarders to the database, used round-robin.
+
+    Each forwarder has its own SSH transport, so pooled connections are spread
+    over several encryption streams instead of one. The private key is loaded
+    once. A background thread sends keepalives, records round-trip times and
+    restarts dead forwarders, so a dropped tunnel is replaced without any
+    request waiting on the SSH handshake; meanwhile new connections use the
+    forwarders that are still up.
+    """
+
+    def __init__(self, ssh_host, ssh_username, key_path, remote_bind_address,
+                 count=2, ssh_port=22, keepalive=15, check_interval=10):
+        self._ssh_address = (ssh_host, ssh_port)
+        self._ssh_username = ssh_username
+        self._key_path = key_path
+        self._remote_bind_address = remote_bind_address
+        self._keepalive = keepalive
+        self._check_interval = check_interval
+        self._key = None
+        self._lock = threading.Lock()
+        self._forwarders = [None] * count
+        self._next = itertools.count()
+        self._started = False
+        self._closed = threading.Event()
+        self.stats = [TunnelStats() for _ in range(count)]
+
+    def endpoint(self):
+        """Return the local (host, port) of the next live forwarder"""
+        if not self._started:
+            self._start()
+        count = len(self._forwarders)
+        for _ in range(count):
+            forwarder = self._forwarders[next(self._next) % count]
+            if forwarder is not None and forwarder.is_active:
+                return '127.0.0.1', forwarder.local_bind_port
+        raise TunnelUnavailableError("No SSH tunnel is currently up; reconnecting in the background")
+
+    def snapshot(self):
+        """Per-forwarder state and counters"""
+        result = []
+        for index, (forwarder, stats) in enumerate(zip(self._forwarders, self.stats)):
+            entry = stats.snapshot()
+            entry['index'] = index
+            entry['active'] = bool(forwarder is not None and forwarder.is_active)
+            entry['local_port'] = forwarder.local_bind_port if entry['active'] else None
+            result.append(entry)
+        return result
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            for index, forwarder in enumerate(self._forwarders):
+                if forwarder is not None:
+                    self._stop(forwarder)
+                    self._forwarders[index] = None
+
+    def _start(self):
+        """Bring every forwarder up on first use; at least one must succeed"""
+        with self._lock:
+            if self._started:
+                return
+            errors = []
+            for index in range(len(self._forwarders)):
+                try:
+                    self._forwarders[index] = self._open(index)
+                except Exception as e:
+                    errors.append(e)
+            if len(errors) == len(self._forwarders):
+                raise errors[0]
+            self._started = True
+        threading.Thread(target=self._monitor_loop, name="ssh-tunnel-monitor", daemon=True).start()
+
+    def _load_key(self):
+        if self._key is None:
+            logger.debug(f"Loading SSH key from {self._key_path}")
+            self._key = paramiko.RSAKey.from_private_key_file(self._key_path)
+        return self._key
+
+    def _open(self, index):
+        forwarder = _CountingForwarder(
+            self._ssh_address,
+            ssh_username=self._ssh_username,
+            ssh_pkey=self._load_key(),
+            remote_bind_address=self._remote_bind_address,
+            local_bind_address=('127.0.0.1', 0),
+            set_keepalive=self._keepalive,
+            allow_agent=False,
+            stats=self.stats[index]
+        )
+        forwarder.start()
+        logger.info(f"SSH tunnel {index} started on local port {forwarder.local_bind_port}")
+        return forwarder
+
+    def _stop(self, forwarder):
+        try:
+            forwarder.stop()
+        except Exception as e:
+            logger.debug(f"Error stopping SSH tunnel: {e}")
+
+    def _monitor_loop(self):
+        while not self._closed.wait(self._check_interval):
+            for index in range(len(self._forwarders)):
+                try:
+                    self._check(index)
+                except Exception as e:
+                    logger.warning(f"SSH tunnel {index} check failed: {e}")
+
+    def _check(self, index):
+        forwarder = self._forwarders[index]
+        if forwarder is not None and forwarder.is_active:
+            start = time.monotonic()
+            # OpenSSH answers unknown global requests, which makes this a cheap ping
+            forwarder._transport.global_request('keepalive@openssh.com', wait=True)
+            self.stats[index].record_rtt(time.monotonic() - start)
+            return
+
+        logger.warning(f"SSH tunnel {index} is down; reconnecting")
+        replacement = self._open(index)
+        with self._lock:
+            if self._closed.is_set():
+                self._stop(replacement)
+                return
+            old, self._forwarders[index] = self._forwarders[index], replacement
+        if old is not None:
+            self._stop(old)
+        self.stats[index].record_reconnect()